@@ -0,0 +1,107 @@
+"""Aggregate generation throughput of the brain with and without batched decoding.
+
+Starts the stub brain (bench/brain_stub_server.py) once with batching off and once with it on,
+and at each concurrency level sends that many sessionless /ask requests at a time. Reports
+completion tokens per second summed over all requests (from the brain's omni_llm_tokens_total
+counter) and the /ask p50/p95. With batching off, concurrent requests queue on the model lock,
+so throughput stays flat. With it on, the sequences share each decode step and throughput
+should grow with concurrency.
+
+The stub's decode step costs the token delay plus BATCH_ROW_COST of it per extra sequence. Real
+llama.cpp scaling depends on the model, quantization and hardware, so compare these numbers
+between commits, not with a real model.
+
+Usage: python3 bench/batch_bench.py [--concurrency 1,2,4,8] [--requests-per-client 4] [--slots 8]
+                                    [--token-delay-ms 5] [--json out.json]
+"""
+import argparse
+import json
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer
+
+from brain_bench import STUB_SERVER, FakeUpstream, brain_metrics, free_port, percentile, post, wait_for_port
+
+QUESTIONS = ("what is a kernel module", "capital of portugal", "what does grep do", "boiling point of ethanol",
+             "who wrote dune", "what is ext4", "speed of sound", "what is a mutex")
+
+def completion_tokens(port):
+    return sum(c["value"] for c in brain_metrics(port).get("counters", [])
+               if c["name"] == "omni_llm_tokens_total" and c["labels"].get("kind") == "completion")
+
+def run_level(port, concurrency, per_client):
+    jobs = [{"endpoint": "/ask", "query": f"{QUESTIONS[i % len(QUESTIONS)]} {i}", "local_context": False}
+            for i in range(concurrency * per_client)]
+    before = completion_tokens(port)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda e: post(port, e), jobs))
+    wall = time.perf_counter() - start
+    tokens = completion_tokens(port) - before
+    samples = [ms for _, ms, _ in results]
+    return {
+        "concurrency": concurrency,
+        "requests": len(jobs),
+        "errors": sum(1 for _, _, ok in results if not ok),
+        "completion_tokens": tokens,
+        "tokens_per_s": round(tokens / wall, 1),
+        "p50_ms": round(percentile(samples, 0.50), 1),
+        "p95_ms": round(percentile(samples, 0.95), 1),
+    }
+
+def run_mode(slots, levels, args, upstream_url):
+    port = free_port()
+    brain = subprocess.Popen(
+        [sys.executable, STUB_SERVER, "--port", str(port), "--upstream", upstream_url,
+         "--token-delay-ms", str(args.token_delay_ms), "--batch-slots", str(slots)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_port(port, brain)
+        post(port, {"endpoint": "/ask", "query": "warm up", "local_context": False})
+        results = [run_level(port, c, args.requests_per_client) for c in levels]
+        batching = {name: m.get("batch") for name, m in brain_metrics(port).get("models", {}).get("loaded", {}).items()}
+    finally:
+        brain.terminate()
+        try: brain.wait(timeout=5)
+        except subprocess.TimeoutExpired: brain.kill()
+    return {"slots": slots, "levels": results, "batching": batching}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", default="1,2,4,8", help="Comma-separated client concurrency levels")
+    parser.add_argument("--requests-per-client", type=int, default=4)
+    parser.add_argument("--slots", type=int, default=8, help="batching.slots for the batched run")
+    parser.add_argument("--token-delay-ms", type=float, default=5.0, help="Stub LLM delay per decode step")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+
+    upstream = ThreadingHTTPServer(("127.0.0.1", free_port()), FakeUpstream)
+    threading.Thread(target=upstream.serve_forever, daemon=True).start()
+    upstream_url = f"http://127.0.0.1:{upstream.server_port}"
+    try:
+        modes = {"off": run_mode(0, levels, args, upstream_url), "on": run_mode(args.slots, levels, args, upstream_url)}
+    finally:
+        upstream.shutdown()
+
+    print(f"/ask x {args.requests_per_client} per client, token delay {args.token_delay_ms} ms, {args.slots} slots")
+    print(f"  {'concurrency':>11} {'off tok/s':>10} {'on tok/s':>10} {'speedup':>8} {'off p95':>9} {'on p95':>9}")
+    for off, on in zip(modes["off"]["levels"], modes["on"]["levels"]):
+        speedup = on["tokens_per_s"] / off["tokens_per_s"] if off["tokens_per_s"] else 0
+        print(f"  {off['concurrency']:>11} {off['tokens_per_s']:>10.1f} {on['tokens_per_s']:>10.1f} {speedup:>7.2f}x "
+              f"{off['p95_ms']:>9.1f} {on['p95_ms']:>9.1f}")
+    print(f"batch engines: {json.dumps(modes['on']['batching'], sort_keys=True)}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(modes, f, indent=2)
+    errors = sum(l["errors"] for mode in modes.values() for l in mode["levels"])
+    if errors:
+        print(f"FAIL: {errors} failed requests")
+    sys.exit(1 if errors else 0)
+
+if __name__ == "__main__":
+    main()
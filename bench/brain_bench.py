@@ -0,0 +1,268 @@
+"""Throughput/latency benchmark for the brain endpoints (/ask, /action, /search, /install_plan).
+
+Starts brain.py through bench/brain_stub_server.py (stub LLM with a fixed per-token delay, stub
+embeddings/LanceDB, synthetic package catalog) plus an in-process fake SearXNG/Wikipedia/
+DuckDuckGo server, then replays a launcher query trace at each requested concurrency level.
+Reports requests/s, p50/p95/p99 per endpoint, the brain's resident memory and the /action
+speculation hit rate. Everything is deterministic and CPU-only, so the numbers are comparable
+between runs on the same box.
+
+Trace lines are JSON objects: {"endpoint": "/action", "query": "..."} (or "app_name" for
+/install_plan). A launcher latency dump (`omni_ctl.py latency-dump`) is accepted as well; its
+search/action/ask timelines are replayed against the matching endpoints.
+
+Usage: python3 bench/brain_bench.py [--concurrency 1,4,8] [--repeat 3] [--token-delay-ms 5]
+                                    [--trace bench/traces/launcher_queries.jsonl] [--json out.json]
+                                    [--update-baseline | --tolerance 0.5]
+"""
+import argparse
+import http.client
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STUB_SERVER = os.path.join(REPO_DIR, "bench", "brain_stub_server.py")
+DEFAULT_TRACE = os.path.join(REPO_DIR, "bench", "traces", "launcher_queries.jsonl")
+BASELINE_PATH = os.path.join(REPO_DIR, "bench", "baselines", "brain_bench.json")
+NOISE_FLOOR_MS = 10 # Absolute slack so millisecond-scale endpoints do not flap
+TIER_ENDPOINTS = {"search": "/search", "action": "/action", "ask": "/ask"} # Launcher latency dumps
+
+class FakeUpstream(BaseHTTPRequestHandler):
+    """SearXNG JSON search, the Wikipedia summary API and DuckDuckGo's HTML results page."""
+    delay = 0.0
+
+    def log_message(self, *args): pass
+
+    def _send(self, body, content_type="application/json"):
+        data = body.encode() if isinstance(body, str) else json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        time.sleep(self.delay)
+        url = urlparse(self.path)
+        if url.path == "/search":
+            q = parse_qs(url.query).get("q", [""])[0]
+            self._send({"results": [{
+                "title": f"{q.title()} result {i}", "url": f"https://example.org/{q.replace(' ', '-')}/{i}",
+                "content": f"Snippet {i} about {q}.", "latitude": 50.06, "longitude": 19.94,
+            } for i in range(5)]})
+        elif url.path.startswith("/wiki/"):
+            name = url.path[6:]
+            self._send({"type": "standard", "title": name.replace("_", " "), "extract": f"{name} summary.",
+                        "content_urls": {"desktop": {"page": f"https://example.org/wiki/{name}"}}})
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        time.sleep(self.delay)
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self._send('<a rel="nofollow" class="result__a" href="https://example.org/app">App</a>', "text/html")
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def load_trace(path):
+    entries = []
+    with open(path) as f:
+        for line in f:
+            if not line.strip(): continue
+            item = json.loads(line)
+            if "endpoint" in item:
+                entries.append(item)
+            elif item.get("tier") in TIER_ENDPOINTS and item.get("query"):
+                entries.append({"endpoint": TIER_ENDPOINTS[item["tier"]], "query": item["query"]})
+    if not entries:
+        raise SystemExit(f"No replayable requests in {path}")
+    return entries
+
+def memory_kb(pid):
+    """(VmRSS, VmHWM) of a process in kB, from /proc."""
+    values = {}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                if key in ("VmRSS", "VmHWM"): values[key] = int(rest.split()[0])
+    except OSError:
+        pass
+    return values.get("VmRSS"), values.get("VmHWM")
+
+def post(port, entry):
+    body = {k: v for k, v in entry.items() if k != "endpoint"}
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+    start = time.perf_counter()
+    try:
+        conn.request("POST", entry["endpoint"], body=json.dumps(body), headers={"Content-Type": "application/json"})
+        resp = conn.getresponse()
+        resp.read()
+        ok = resp.status == 200
+    except OSError:
+        ok = False
+    finally:
+        conn.close()
+    return entry["endpoint"], (time.perf_counter() - start) * 1000, ok
+
+def brain_metrics(port):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    try:
+        conn.request("GET", "/metrics?format=json")
+        return json.loads(conn.getresponse().read())
+    except (OSError, ValueError):
+        return {}
+    finally:
+        conn.close()
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+def summarize(samples):
+    return {
+        "requests": len(samples),
+        "p50_ms": round(percentile(samples, 0.50), 1),
+        "p95_ms": round(percentile(samples, 0.95), 1),
+        "p99_ms": round(percentile(samples, 0.99), 1),
+        "mean_ms": round(statistics.mean(samples), 1),
+    }
+
+def run_level(port, pid, trace, concurrency, repeat):
+    jobs = trace * repeat
+    by_endpoint, errors = {}, 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for endpoint, ms, ok in pool.map(lambda e: post(port, e), jobs):
+            if not ok: errors += 1
+            by_endpoint.setdefault(endpoint, []).append(ms)
+    wall = time.perf_counter() - start
+    rss, hwm = memory_kb(pid)
+    return {
+        "concurrency": concurrency,
+        "requests": len(jobs),
+        "errors": errors,
+        "throughput_rps": round(len(jobs) / wall, 1),
+        "all": summarize([ms for samples in by_endpoint.values() for ms in samples]),
+        "endpoints": {ep: summarize(samples) for ep, samples in sorted(by_endpoint.items())},
+        "rss_mb": round(rss / 1024, 1) if rss else None,
+        "peak_rss_mb": round(hwm / 1024, 1) if hwm else None,
+    }
+
+def wait_for_port(port, proc, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit("Stub brain exited during startup")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5): return
+        except OSError:
+            time.sleep(0.1)
+    raise SystemExit("Stub brain did not start listening")
+
+def compare(results, baseline, tolerance):
+    failures = []
+    for level in results["levels"]:
+        base_level = baseline.get(str(level["concurrency"]), {})
+        for endpoint, stats in level["endpoints"].items():
+            budget = base_level.get(endpoint)
+            if budget and stats["p95_ms"] > budget * (1 + tolerance) + NOISE_FLOOR_MS:
+                failures.append(f"c={level['concurrency']} {endpoint} p95 {stats['p95_ms']} ms "
+                                f"exceeds baseline {budget} ms by more than {tolerance:.0%}")
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trace", default=DEFAULT_TRACE)
+    parser.add_argument("--concurrency", default="1,4,8", help="Comma-separated client concurrency levels")
+    parser.add_argument("--repeat", type=int, default=3, help="Times the trace is replayed per level")
+    parser.add_argument("--token-delay-ms", type=float, default=5.0, help="Stub LLM delay per generated token")
+    parser.add_argument("--prefill-ms-per-token", type=float, default=0.2, help="Stub LLM prompt cost per token")
+    parser.add_argument("--upstream-delay-ms", type=float, default=20.0, help="Fake SearXNG/Wikipedia response delay")
+    parser.add_argument("--json", help="Also write the results to this file")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Allowed p95 slowdown over the baseline")
+    parser.add_argument("--update-baseline", action="store_true", help="Store this run's p95s as the baseline")
+    args = parser.parse_args()
+
+    trace = load_trace(args.trace)
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+
+    FakeUpstream.delay = args.upstream_delay_ms / 1000
+    upstream = ThreadingHTTPServer(("127.0.0.1", free_port()), FakeUpstream)
+    threading.Thread(target=upstream.serve_forever, daemon=True).start()
+
+    port = free_port()
+    brain = subprocess.Popen(
+        [sys.executable, STUB_SERVER, "--port", str(port), "--upstream", f"http://127.0.0.1:{upstream.server_port}",
+         "--token-delay-ms", str(args.token_delay_ms), "--prefill-ms-per-token", str(args.prefill_ms_per_token)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_port(port, brain)
+        idle_rss, _ = memory_kb(brain.pid)
+        post(port, {"endpoint": "/action", "query": "warm up"}) # First-request imports off the clock
+        results = {
+            "trace": os.path.relpath(args.trace, REPO_DIR),
+            "token_delay_ms": args.token_delay_ms,
+            "idle_rss_mb": round(idle_rss / 1024, 1) if idle_rss else None,
+            "levels": [run_level(port, brain.pid, trace, c, args.repeat) for c in levels],
+        }
+        metrics = brain_metrics(port)
+        results["speculation"] = metrics.get("speculation")
+        results["routes"] = metrics.get("routes")
+    finally:
+        brain.terminate()
+        try: brain.wait(timeout=5)
+        except subprocess.TimeoutExpired: brain.kill()
+        upstream.shutdown()
+
+    print(f"trace: {results['trace']} ({len(trace)} requests x {args.repeat}), token delay {args.token_delay_ms} ms, "
+          f"idle RSS {results['idle_rss_mb']} MB")
+    for level in results["levels"]:
+        print(f"\nconcurrency {level['concurrency']}: {level['throughput_rps']} req/s, {level['errors']} errors, "
+              f"RSS {level['rss_mb']} MB (peak {level['peak_rss_mb']} MB)")
+        print(f"  {'endpoint':<14} {'n':>5} {'p50':>9} {'p95':>9} {'p99':>9}")
+        for endpoint, stats in [("all", level["all"]), *level["endpoints"].items()]:
+            print(f"  {endpoint:<14} {stats['requests']:>5} {stats['p50_ms']:>9.1f} {stats['p95_ms']:>9.1f} {stats['p99_ms']:>9.1f}")
+    if results.get("speculation"):
+        spec = results["speculation"]
+        print(f"\nspeculation hit rate: {spec['hit_rate']}  {json.dumps(spec['stages'], sort_keys=True)}")
+    for route, per_model in (results.get("routes") or {}).items():
+        for model, stats in per_model.items():
+            print(f"route {route} -> {model}: {stats['n']} generations, p50 {stats['p50_ms']} ms, ok rate {stats['ok_rate']}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(BASELINE_PATH), exist_ok=True)
+        baseline = {str(l["concurrency"]): {ep: s["p95_ms"] for ep, s in l["endpoints"].items()} for l in results["levels"]}
+        with open(BASELINE_PATH, "w") as f:
+            json.dump(baseline, f, indent=2)
+            f.write("\n")
+        print(f"\nBaseline written to {BASELINE_PATH}")
+        return
+
+    failures = [f"{level['errors']} failed requests at concurrency {level['concurrency']}"
+                for level in results["levels"] if level["errors"]]
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH) as f:
+            failures += compare(results, json.load(f), args.tolerance)
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
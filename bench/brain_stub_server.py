@@ -0,0 +1,270 @@
+"""Runs src/brain.py with deterministic stand-ins for everything slow or external.
+
+Used by bench/brain_bench.py; not meant to be started by hand. The real Flask app, routes,
+locks and tracing are kept; only these are replaced:
+  - the llama.cpp models: StubLlama, with a fixed prefill cost per prompt token and a fixed
+    delay per generated token, streaming like llama_cpp does
+  - the batch context (batching.LlamaBatchBackend): StubBatchBackend, whose decode step costs the
+    token delay plus a small share per extra sequence, so batching pays off as it does on real
+    hardware where decode is bound by memory bandwidth
+  - the embedding model and LanceDB: a hash-based encoder and a small in-memory "files" table
+    over generated text files
+  - SearXNG, Wikipedia and DuckDuckGo: URLs pointed at the bench's fake upstream server
+  - the package catalog: a synthetic apt list, so /install_plan never reads the host's lists
+  - the navigation index: empty, so SEARCH: lines never read the host's browser history
+
+Usage: brain_stub_server.py --port 5599 --upstream http://127.0.0.1:5598 [--token-delay-ms 5]
+                             [--batch-slots 4]
+"""
+import argparse
+import hashlib
+import logging
+import os
+import re
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_DIR, "src"))
+
+STUB_ANSWER_TOKENS = 48
+BATCH_ROW_COST = 0.1 # Extra cost of each sequence in a batched decode step, relative to the token delay
+CATALOG_PACKAGES = 20000
+
+def stub_action(query):
+    """The action line a well-behaved fast model would produce for the query."""
+    q = query.strip()
+    lower = q.lower()
+    if lower.startswith("install "): return f"INSTALL:{q[8:]}"
+    if lower.startswith("who is "): return f"PERSON:{q[7:]}"
+    if lower.startswith("where is ") or lower.endswith(" map"): return f"PLACE:{q.replace('where is ', '')}"
+    if lower.startswith("open "): return f"OPEN:https://{q[5:].replace(' ', '')}.com"
+    if re.search(r"\d\s*[-+*/^]\s*\d", q): return f"CALC:{q}"
+    return f"SEARCH:{q}"
+
+class StubState:
+    def __init__(self, tokens):
+        self.input_ids = tokens
+        self.n_tokens = len(tokens)
+        self.llama_state_size = 64 * 1024 * len(tokens) # Roughly a 1B model's KV bytes per token
+
+class StubLlama:
+    """Stands in for llama_cpp.Llama: same call shapes, deterministic text, fixed timings.
+    Like llama.cpp, a completion only pays prefill for tokens past the prefix already cached."""
+
+    def __init__(self, token_delay_ms, prefill_ms_per_token):
+        self.token_delay = token_delay_ms / 1000
+        self.prefill_per_token = prefill_ms_per_token / 1000
+        self.cached = [] # Tokens "in the KV cache"
+
+    def tokenize(self, data):
+        return data.split()
+
+    def n_ctx(self):
+        return 4096
+
+    def save_state(self):
+        return StubState(list(self.cached))
+
+    def load_state(self, state):
+        self.cached = list(state.input_ids)
+
+    def _uncached(self, tokens):
+        shared = 0
+        for a, b in zip(self.cached, tokens):
+            if a != b: break
+            shared += 1
+        self.cached = list(tokens)
+        return len(tokens) - shared
+
+    def _timed(self, prompt_tokens, pieces):
+        time.sleep(self.prefill_per_token * prompt_tokens)
+        for piece in pieces:
+            time.sleep(self.token_delay)
+            yield piece
+
+    def __call__(self, prompt, max_tokens=16, stream=False, **kwargs):
+        seed = hashlib.sha1(prompt.encode()).hexdigest()
+        pieces = [f" {seed[i % 40]}{i}" for i in range(min(max_tokens, STUB_ANSWER_TOKENS))]
+        tokens = self.tokenize(prompt.encode())
+        chunks = ({"choices": [{"text": p}]} for p in self._timed(self._uncached(tokens), pieces))
+        if stream: return chunks
+        return {"choices": [{"text": "".join(c["choices"][0]["text"] for c in chunks)}]}
+
+    def create_chat_completion(self, messages, max_tokens=16, stream=False, **kwargs):
+        query = messages[-1]["content"].replace("Query: ", "", 1)
+        prompt_tokens = self._uncached([t for m in messages for t in m["content"].split()])
+        pieces = re.findall(r"\S+|\s+", stub_action(query))[:max_tokens]
+        def chunks():
+            first = True
+            for piece in self._timed(prompt_tokens, pieces):
+                if first:
+                    yield {"choices": [{"delta": {"role": "assistant"}}]}
+                    first = False
+                yield {"choices": [{"delta": {"content": piece}}]}
+        if stream: return chunks()
+        return {"choices": [{"message": {"role": "assistant", "content": "".join(pieces)}}]}
+
+class StubBatchBackend:
+    """Stands in for batching.LlamaBatchBackend. Tokens are interned words; each sequence's output
+    is planned from its whole prompt the first time it is sampled (the action line for /action
+    prompts, StubLlama's pieces otherwise) and handed out as one-hot logits, one token per step."""
+
+    EOG = 0
+
+    def __init__(self, llama, slots, n_ctx, token_delay_ms, prefill_ms_per_token):
+        self.n_ctx = n_ctx
+        self.token_delay = token_delay_ms / 1000
+        self.prefill_per_token = prefill_ms_per_token / 1000
+        self.words = [""]
+        self.ids = {"": self.EOG}
+        self.kv = {} # seq -> tokens "in the KV cache"
+        self.plans = {} # seq -> token ids still to produce, ending with EOG
+
+    def _intern(self, word):
+        if word not in self.ids:
+            self.ids[word] = len(self.words)
+            self.words.append(word)
+        return self.ids[word]
+
+    def tokenize(self, text, add_bos=True):
+        return [self._intern(w) for w in text.split()]
+
+    def piece(self, token):
+        return self.words[token].encode()
+
+    def is_eog(self, token):
+        return token == self.EOG
+
+    def _plan(self, tokens):
+        text = " ".join(self.words[t] for t in tokens)
+        query = re.search(r"Query: (.*?)<\|im_end\|>", text)
+        if query:
+            pieces = re.findall(r"\S+|\s+", stub_action(query.group(1)))
+        else:
+            seed = hashlib.sha1(text.encode()).hexdigest()
+            pieces = [f" {seed[i % 40]}{i}" for i in range(STUB_ANSWER_TOKENS)]
+        return [self._intern(p) for p in pieces] + [self.EOG]
+
+    def decode(self, entries):
+        import numpy as np
+        prefill = sum(len(tokens) for seq, tokens, start, want in entries if seq not in self.plans)
+        time.sleep(self.token_delay * (1 + BATCH_ROW_COST * (len(entries) - 1)) + self.prefill_per_token * prefill)
+        out = {}
+        for seq, tokens, start, want in entries:
+            self.kv.setdefault(seq, []).extend(tokens)
+            if not want: continue
+            if seq not in self.plans: self.plans[seq] = self._plan(self.kv[seq])
+            logits = np.full(len(self.words), -1e9, dtype=np.float32)
+            logits[self.plans[seq].pop(0) if self.plans[seq] else self.EOG] = 0.0
+            out[seq] = logits
+        return out
+
+    def clear(self, seq, keep=0):
+        self.kv[seq] = self.kv.get(seq, [])[:keep]
+        self.plans.pop(seq, None)
+
+    def close(self):
+        pass
+
+class StubEmbedder:
+    def encode(self, text):
+        if isinstance(text, list): return [self.encode(t) for t in text]
+        digest = hashlib.sha1(text.encode()).digest()
+        return [b / 255 for b in digest[:16]]
+
+class StubFrame:
+    """The slice of the pandas DataFrame API that /search uses."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.empty = not rows
+
+    def iterrows(self):
+        return enumerate(self.rows)
+
+class StubTable:
+    def __init__(self, workdir, n=200):
+        docs = os.path.join(workdir, "docs")
+        os.makedirs(docs, exist_ok=True)
+        self.rows = []
+        for i in range(n):
+            path = os.path.join(docs, f"document_{i}.txt")
+            with open(path, "w") as f:
+                # ~600 words, so /ask's local context has several chunks per file to rank
+                f.write(" ".join(f"Note {i} line {j} about project {j % 7} and meeting {j % 5}." for j in range(80)))
+            self.rows.append({"filename": f"document_{i}.txt", "path": path})
+        self._limit = 3
+        self._vector = None
+
+    def search(self, vector):
+        self._vector = vector
+        return self
+
+    def limit(self, n):
+        self._limit = n
+        return self
+
+    def to_pandas(self):
+        start = int(self._vector[0] * 1000) % len(self.rows)
+        picked = [self.rows[(start + i) % len(self.rows)] for i in range(self._limit)]
+        return StubFrame([dict(r, _distance=0.4 + 0.2 * i) for i, r in enumerate(picked)])
+
+class StubDB:
+    def __init__(self, workdir):
+        self.table = StubTable(workdir)
+
+    def open_table(self, name):
+        return self.table
+
+def synthetic_catalog(workdir):
+    from package_catalog import PackageCatalog
+    apt_list = os.path.join(workdir, "bench_Packages")
+    with open(apt_list, "w") as f:
+        for i in range(CATALOG_PACKAGES):
+            f.write(f"Package: benchpkg{i}\nDescription: Synthetic package {i}\n\n")
+        for name in ("firefox", "gimp", "vlc", "thunderbird", "inkscape", "blender", "obs-studio"):
+            f.write(f"Package: {name}\nDescription: {name} for the benchmark\n\n")
+    catalog = PackageCatalog(apt_globs=[apt_list], appstream_globs=[], cache_path=os.path.join(workdir, "catalog.json"))
+    catalog.refresh()
+    return catalog
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, required=True)
+    parser.add_argument("--upstream", required=True, help="Base URL of the fake SearXNG/Wikipedia/DuckDuckGo server")
+    parser.add_argument("--token-delay-ms", type=float, default=5.0)
+    parser.add_argument("--prefill-ms-per-token", type=float, default=0.2)
+    parser.add_argument("--batch-slots", type=int, help="batching.slots for this run (0 turns batching off)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="omni-bench-")
+    # Shipped defaults only: no user settings file, SearXNG pointed at the fake upstream
+    os.environ["OMNI_SETTINGS"] = os.path.join(workdir, "settings.json")
+    os.environ["OMNI_SEARXNG_URL"] = f"{args.upstream}/search"
+    os.environ["OMNI_ENTITIES_PATH"] = os.path.join(workdir, "entities.db") # Starts empty, fills from lookups
+    os.environ["OMNI_ASK_LOCAL_CONTEXT"] = "1" # Off by default; /ask still measures retrieval over the stub table
+    if args.batch_slots is not None: os.environ["OMNI_BATCHING_SLOTS"] = str(args.batch_slots)
+    import brain
+    import navigation_index
+    logging.getLogger().setLevel(logging.WARNING)
+    llm = StubLlama(args.token_delay_ms, args.prefill_ms_per_token)
+    # The shipped config: one registry model serving every route
+    brain.models.load_model = lambda spec: llm
+    brain.batch_backend = lambda llama, slots, n_ctx: StubBatchBackend(
+        llama, slots, n_ctx, args.token_delay_ms, args.prefill_ms_per_token)
+    brain.embed_model = StubEmbedder()
+    brain.db_conn = StubDB(workdir)
+    brain.ensure_model_loaded = lambda: None
+    brain.WIKIPEDIA_SUMMARY_URL = f"{args.upstream}/wiki/"
+    brain.DUCKDUCKGO_HTML_URL = f"{args.upstream}/ddg"
+    brain.package_catalog = synthetic_catalog(workdir)
+    # No browser history: every SEARCH: line still measures the SearXNG path
+    brain.navigation = navigation_index.NavigationIndex([], [], os.path.join(workdir, "navigations.json"))
+
+    print("ready", flush=True)
+    brain.app.run(host="127.0.0.1", port=args.port, threaded=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Import-time regression benchmark for the launcher (omni.py) and the brain (brain.py).
+
+Each run spawns `python -X importtime -c "import <module>"` from src/ and records the
+cumulative import time of the module. Fails (exit status 1) when:
+  - the median exceeds the budget in bench/baselines/import_time.json by more than --tolerance
+  - a module that is meant to be imported lazily shows up in the eager import graph
+
+Usage: python3 bench/import_bench.py [--runs 7] [--tolerance 0.25] [--update-baseline] [--json out.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_DIR = os.path.join(REPO_DIR, "src")
+BASELINE_PATH = os.path.join(REPO_DIR, "bench", "baselines", "import_time.json")
+sys.path.insert(0, SRC_DIR)
+
+from startup_profile import parse_importtime
+
+# Modules each entry point must only import on first use
+LAZY_MODULES = {
+    "omni": ["requests", "http.client", "PyQt6.QtNetwork", "concurrent.futures", "logging.handlers",
+             "calc_engine"],
+    "brain": ["requests", "simpleeval", "torch", "sentence_transformers", "llama_cpp", "lancedb",
+              "calc_engine", "speculation", "local_rag", "ask_sessions", "batching", "entity_store",
+              "navigation_index"],
+}
+
+def measure(module, env):
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=SRC_DIR, env=env, capture_output=True, text=True, timeout=60)
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    modules = parse_importtime(proc.stderr)
+    total = next((m["cumulative_ms"] for m in modules if m["module"] == module), None)
+    if total is None:
+        raise RuntimeError(f"No importtime entry for {module}")
+    return total, {m["module"] for m in modules}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown over the baseline (0.25 = 25%%)")
+    parser.add_argument("--update-baseline", action="store_true", help="Write the measured medians as the new baseline")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    # Importing omni builds no widgets, but keep Qt away from the real display anyway
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen")
+    baseline = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH) as f:
+            baseline = json.load(f)
+
+    results, failures = {}, []
+    for module, lazy in LAZY_MODULES.items():
+        samples, imported = [], set()
+        for _ in range(args.runs):
+            total, imported = measure(module, env)
+            samples.append(total)
+        median = statistics.median(samples)
+        eager = [name for name in lazy if name in imported]
+        results[module] = {"median_ms": round(median, 1), "min_ms": round(min(samples), 1), "eager": eager}
+
+        budget = baseline.get(module, {}).get("median_ms")
+        line = f"{module:>6}: median {median:7.1f} ms  min {min(samples):7.1f} ms"
+        if budget:
+            line += f"  (baseline {budget:.1f} ms, {median / budget - 1:+.0%})"
+            if not args.update_baseline and median > budget * (1 + args.tolerance):
+                failures.append(f"{module} import time {median:.1f} ms exceeds baseline {budget:.1f} ms by more than {args.tolerance:.0%}")
+        print(line)
+        if eager:
+            failures.append(f"{module} eagerly imports {', '.join(eager)}")
+
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(BASELINE_PATH), exist_ok=True)
+        with open(BASELINE_PATH, "w") as f:
+            json.dump({m: {"median_ms": r["median_ms"]} for m, r in results.items()}, f, indent=2)
+            f.write("\n")
+        print(f"Baseline written to {BASELINE_PATH}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Startup-to-first-paint benchmark for the launcher: cold process vs. resident daemon.
+
+cold: spawns `omni.py --first-paint-exit` and times spawn -> first painted frame.
+warm: starts `omni.py --daemon --hidden` once, then times `show-wait` over the control
+      socket (command sent -> window painted -> reply received) followed by `hide`.
+
+Usage: python3 bench/startup_bench.py [--runs 10] [--json out.json]
+Runs headless with QT_QPA_PLATFORM=offscreen unless a display is requested with --display.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_DIR = os.path.join(REPO_DIR, "src")
+OMNI = os.path.join(SRC_DIR, "omni.py")
+sys.path.insert(0, SRC_DIR)
+
+from omni_ctl import send_command
+
+def summarize(samples):
+    samples = sorted(samples)
+    return {
+        "runs": len(samples),
+        "min_ms": round(samples[0], 1),
+        "median_ms": round(statistics.median(samples), 1),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 1),
+        "max_ms": round(samples[-1], 1),
+    }
+
+def bench_cold(runs, env):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        proc = subprocess.Popen([sys.executable, OMNI, "--first-paint-exit"], stdout=subprocess.PIPE, env=env, text=True)
+        line = proc.stdout.readline()
+        elapsed = (time.perf_counter() - start) * 1000
+        proc.wait(timeout=10)
+        if line.strip() != "painted":
+            raise RuntimeError("Cold launcher exited without painting a frame")
+        samples.append(elapsed)
+    return samples
+
+def bench_warm(runs, env, socket_path):
+    daemon = subprocess.Popen([sys.executable, OMNI, "--daemon", "--hidden"], env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.time() + 30
+        while send_command("ping", path=socket_path) != "ok":
+            if time.time() > deadline or daemon.poll() is not None:
+                raise RuntimeError("Launcher daemon did not come up")
+            time.sleep(0.05)
+
+        samples = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            reply = send_command("show-wait", timeout=5.0, path=socket_path)
+            elapsed = (time.perf_counter() - start) * 1000
+            if not reply or not reply.startswith("painted"):
+                raise RuntimeError(f"Unexpected daemon reply: {reply!r}")
+            samples.append(elapsed)
+            send_command("hide", path=socket_path)
+            time.sleep(0.1)
+        return samples
+    finally:
+        send_command("quit", path=socket_path)
+        try: daemon.wait(timeout=5)
+        except subprocess.TimeoutExpired: daemon.kill()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--json", help="Also write the results to this file")
+    parser.add_argument("--display", action="store_true", help="Use the real display instead of offscreen")
+    args = parser.parse_args()
+
+    socket_path = f"/tmp/omni_launcher_bench_{os.getpid()}.sock"
+    env = dict(os.environ, OMNI_LAUNCHER_SOCKET=socket_path)
+    if not args.display:
+        env["QT_QPA_PLATFORM"] = "offscreen"
+
+    results = {
+        "cold": summarize(bench_cold(args.runs, env)),
+        "warm": summarize(bench_warm(args.runs, env, socket_path)),
+    }
+    results["speedup_median"] = round(results["cold"]["median_ms"] / max(results["warm"]["median_ms"], 0.1), 1)
+
+    for mode in ("cold", "warm"):
+        r = results[mode]
+        print(f"{mode:>5}: median {r['median_ms']:8.1f} ms  p95 {r['p95_ms']:8.1f} ms  min {r['min_ms']:8.1f} ms  ({r['runs']} runs)")
+    print(f"speedup (median): {results['speedup_median']}x")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
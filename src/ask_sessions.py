@@ -0,0 +1,155 @@
+"""Conversation sessions for /ask.
+
+A session is one launcher conversation, named by the session ID the launcher sends. It keeps the
+turns as text and, after each answer, the llama.cpp state (KV cache) the answer ended on. The
+next question is rendered as exactly the same prompt plus one new turn, so once that state is
+loaded back llama.cpp finds the shared token prefix and only prefills the new turn.
+
+When a prompt would leave less than ANSWER_TOKENS of the context window, the oldest turns are
+folded into a one-line summary in the system prompt, down to half the budget. That changes the
+prefix, so the turn after a fold pays one full prefill and the following turns are warm again.
+Saved states are dropped, least recently used first, when they exceed the memory budget or sit
+idle; the turns stay, so an evicted session keeps its memory and only loses the prefill shortcut. Whole sessions are forgotten after SESSION_TTL.
+
+All model calls happen under the caller's model lock; the store has its own lock for its maps.
+"""
+import threading
+import time
+
+SYSTEM_PROMPT = "You are Omni, a smart OS assistant.\nRULES:\n1. Answer concisely.\n2. Use context if available."
+ANSWER_TOKENS = 1024 # Room left in n_ctx for the reply
+KEEP_TURNS = 1 # Recent turns never folded into the summary
+FOLD_TARGET = 0.5 # Once over the limit, fold down to this share of it so the next turns reuse the prefix again
+SUMMARY_CHARS = 600
+STATE_BUDGET_BYTES = 512 * 1024 * 1024 # Default budget for saved KV states
+STATE_TTL = 10 * 60 # Seconds before an idle session's KV state is dropped
+SESSION_TTL = 60 * 60 # Seconds before an idle session is forgotten
+MAX_SESSIONS = 64
+
+def user_turn(query, source_type, context_text):
+    """The user message for one turn. Retrieved context rides in the turn, not the system
+    prompt, so earlier turns (and their cached prefix) stay byte-identical."""
+    if not context_text:
+        return query
+    return f"Context Source: {source_type}\nContext Data:\n{context_text}\nQuestion: {query}"
+
+def render(summary, turns, user_text):
+    system = SYSTEM_PROMPT + (f"\nEarlier in this conversation: {summary}" if summary else "")
+    parts = [f"<|im_start|>system\n{system}<|im_end|>\n"]
+    for turn in turns:
+        parts.append(f"<|im_start|>user\n{turn['user']}<|im_end|>\n<|im_start|>assistant\n{turn['answer']}<|im_end|>\n")
+    parts.append(f"<|im_start|>user\n{user_text}<|im_end|>\n<|im_start|>assistant\n")
+    return "".join(parts)
+
+class Session:
+    def __init__(self, session_id):
+        self.id = session_id
+        self.turns = [] # {"query", "user", "answer"}
+        self.summary = ""
+        self.state = None # llama_cpp.LlamaState after the last answer
+        self.state_model = None # Registry name of the model that state belongs to
+        self.state_bytes = 0
+        self.last_used = time.monotonic()
+
+    def drop_state(self):
+        self.state, self.state_bytes = None, 0
+
+    def fold_oldest(self):
+        turn = self.turns.pop(0)
+        asked = turn["query"].strip().replace("\n", " ")
+        summary = f"{self.summary}; {asked}" if self.summary else f"the user asked about {asked}"
+        # Keep the newest questions when the summary itself grows too long
+        self.summary = summary if len(summary) <= SUMMARY_CHARS else "..." + summary[-SUMMARY_CHARS:]
+        self.drop_state() # The system prompt changed, so the cached prefix is gone
+
+class SessionStore:
+    def __init__(self, budget_bytes=STATE_BUDGET_BYTES):
+        """budget_bytes: a byte count, or a callable returning one (read each time states are saved)."""
+        self._budget = budget_bytes if callable(budget_bytes) else lambda: budget_bytes
+        self.sessions = {}
+        self.lock = threading.Lock()
+
+    def get(self, session_id):
+        """The session for this ID, created on first use. Also expires idle sessions/states."""
+        now = time.monotonic()
+        with self.lock:
+            for sid, s in list(self.sessions.items()):
+                idle = now - s.last_used
+                if idle > SESSION_TTL: del self.sessions[sid]
+                elif idle > STATE_TTL: s.drop_state()
+            session = self.sessions.get(session_id)
+            if session is None:
+                if len(self.sessions) >= MAX_SESSIONS:
+                    oldest = min(self.sessions.values(), key=lambda s: s.last_used)
+                    del self.sessions[oldest.id]
+                session = self.sessions[session_id] = Session(session_id)
+            session.last_used = now
+            return session
+
+    def prompt(self, session, user_text, count_tokens, n_ctx, answer_tokens=ANSWER_TOKENS):
+        """Renders the next prompt, folding old turns when it would not fit next to answer_tokens."""
+        if session is None:
+            return render("", [], user_text)
+        limit = n_ctx - answer_tokens
+        prompt = render(session.summary, session.turns, user_text)
+        if count_tokens(prompt) <= limit:
+            return prompt
+        while len(session.turns) > KEEP_TURNS:
+            session.fold_oldest()
+            prompt = render(session.summary, session.turns, user_text)
+            if count_tokens(prompt) <= limit * FOLD_TARGET: break
+        return prompt
+
+    @staticmethod
+    def _kv_holds(model, state):
+        # True when the model's KV cache still starts with this state's tokens (nothing else ran)
+        try:
+            n = state.n_tokens
+            return model.n_tokens >= n and bool((model.input_ids[:n] == state.input_ids[:n]).all())
+        except Exception:
+            return False
+
+    def restore(self, session, model, model_name=None):
+        """Loads the session's KV state into the model. Returns "warm", "restored" or "cold"."""
+        if session is None or session.state is None:
+            return "cold"
+        if session.state_model != model_name:
+            session.drop_state() # Routed to another model: its KV state is no use here
+            return "cold"
+        if self._kv_holds(model, session.state):
+            return "warm"
+        model.load_state(session.state)
+        return "restored"
+
+    def commit(self, session, query, user_text, answer, model, model_name=None):
+        """Records the finished turn and snapshots the model state for the next one.
+        model is None when the answer came from elsewhere (a batched decode): no state to keep."""
+        if session is None: return
+        session.turns.append({"query": query, "user": user_text, "answer": answer})
+        session.last_used = time.monotonic()
+        if model is None:
+            session.drop_state()
+            return
+        session.state = model.save_state()
+        session.state_model = model_name
+        session.state_bytes = getattr(session.state, "llama_state_size", 0)
+        self._enforce_budget(keep=session)
+
+    def _enforce_budget(self, keep):
+        with self.lock:
+            held = sorted((s for s in self.sessions.values() if s.state is not None), key=lambda s: s.last_used)
+            total, budget = sum(s.state_bytes for s in held), self._budget()
+            for s in held:
+                if total <= budget: break
+                if s is keep: continue
+                total -= s.state_bytes
+                s.drop_state()
+
+    def stats(self):
+        with self.lock:
+            return {
+                "sessions": len(self.sessions),
+                "states": sum(1 for s in self.sessions.values() if s.state is not None),
+                "state_mb": round(sum(s.state_bytes for s in self.sessions.values()) / (1024 * 1024), 1),
+                "budget_mb": round(self._budget() / (1024 * 1024), 1),
+            }
@@ -0,0 +1,151 @@
+"""Queue-backed logging for the launcher and the brain.
+
+`install()` points the root logger at a QueueHandler; one QueueListener thread owns every real
+handler (size-rotated files, stderr) and does all formatting I/O, so a logging call on a request
+or GUI thread is a non-blocking queue put. `channel()` gives a named logger with its own rotated
+file on the same listener (the old ad-hoc /tmp/*.log appends), optionally sampled so chatty
+debug records keep 1 in N. When the queue is full records are dropped and counted rather than
+blocking the caller.
+"""
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+
+DEFAULT_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+MAX_BYTES = int(os.environ.get("OMNI_LOG_MAX_BYTES", 5 * 1024 * 1024))
+BACKUPS = 3
+QUEUE_SIZE = 10000
+
+class SampleFilter(logging.Filter):
+    """Keeps every Nth record below WARNING; warnings and errors always pass. `every` may be a
+    callable, read per record, so the rate can change while the process runs."""
+
+    def __init__(self, every):
+        super().__init__()
+        self._every = every if callable(every) else lambda: every
+        self.seen = 0
+        self.sampled_out = 0
+
+    @property
+    def every(self):
+        return max(1, int(self._every()))
+
+    def filter(self, record):
+        every = self.every
+        if record.levelno >= logging.WARNING or every == 1: return True
+        self.seen += 1 # Racy across threads, which only shifts which record is kept
+        if self.seen % every == 1: return True
+        self.sampled_out += 1
+        return False
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that counts and drops records instead of raising when the queue is full."""
+
+    def __init__(self, q):
+        super().__init__(q)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try: self.queue.put_nowait(record)
+        except queue.Full: self.dropped += 1
+
+class RoutingListener(logging.handlers.QueueListener):
+    """QueueListener that sends a record only to the handlers registered for its logger."""
+
+    def __init__(self, q):
+        super().__init__(q, respect_handler_level=True)
+        self.routes = {"": []} # Logger name -> handlers; "" = everything else
+
+    def handle(self, record):
+        record = self.prepare(record)
+        for handler in self.routes.get(record.name, self.routes[""]):
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel) # Wait for room so stop() always flushes
+
+_queue = None
+_handler = None
+_listener = None
+_channels = {}
+_lock = threading.Lock()
+
+def rotating_file(path, fmt=DEFAULT_FORMAT, max_bytes=MAX_BYTES, backups=BACKUPS):
+    handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups,
+                                                   encoding="utf-8", delay=True)
+    handler.setFormatter(logging.Formatter(fmt))
+    return handler
+
+def stream(fmt="%(levelname)s:%(name)s:%(message)s"):
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(logging.Formatter(fmt))
+    return handler
+
+def install(*handlers, level=logging.INFO):
+    """Routes the root logger through the queue; `handlers` run on the listener thread."""
+    global _queue, _handler, _listener
+    with _lock:
+        if _listener is None:
+            _queue = queue.Queue(maxsize=QUEUE_SIZE)
+            _handler = DroppingQueueHandler(_queue)
+            _listener = RoutingListener(_queue)
+            _listener.start()
+            import atexit
+            atexit.register(stop)
+        _listener.routes = dict(_listener.routes, **{"": list(handlers)})
+    root = logging.getLogger()
+    for h in root.handlers[:]:
+        root.removeHandler(h)
+    root.addHandler(_handler)
+    root.setLevel(level)
+    return _listener
+
+def channel(name, path, sample_every=1, fmt="%(asctime)s %(message)s", level=logging.DEBUG):
+    """Logger writing only to its own rotated file through the shared listener."""
+    with _lock:
+        if name in _channels: return _channels[name]
+    if _listener is None: install(stream())
+    logger = logging.getLogger(name)
+    logger.propagate = False
+    logger.setLevel(level)
+    logger.addHandler(_handler)
+    if callable(sample_every) or sample_every > 1:
+        logger.addFilter(SampleFilter(sample_every))
+    with _lock:
+        _listener.routes = dict(_listener.routes, **{name: [rotating_file(path, fmt)]})
+        _channels[name] = logger
+    return logger
+
+def sampled(name, every):
+    """Child logger of the root pipeline that keeps 1 in `every` records below WARNING."""
+    logger = logging.getLogger(name)
+    if not any(isinstance(f, SampleFilter) for f in logger.filters):
+        logger.addFilter(SampleFilter(every))
+    return logger
+
+def stats():
+    """Queue depth plus dropped and sampled-out record counts."""
+    sampled_out = {}
+    for name, logger in logging.Logger.manager.loggerDict.items():
+        for f in getattr(logger, "filters", []):
+            if isinstance(f, SampleFilter): sampled_out[name] = f.sampled_out
+    return {
+        "queued": _queue.qsize() if _queue else 0,
+        "dropped": _handler.dropped if _handler else 0,
+        "sampled_out": sampled_out,
+    }
+
+def stop():
+    """Flushes what is queued and stops the listener thread."""
+    global _listener
+    with _lock:
+        listener, _listener = _listener, None
+    if listener is None: return
+    listener.stop()
+    for handlers in listener.routes.values():
+        for h in handlers:
+            h.close()
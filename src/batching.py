@@ -0,0 +1,335 @@
+"""Continuous batching of concurrent generations on one model.
+
+Without it every generation holds the model lock, so concurrent /ask and /action requests (several
+launcher windows, scripted clients) run strictly one after another. A BatchEngine keeps up to
+`slots` sequences in a llama.cpp context of its own, sharing the model's weights, and one loop
+thread advances them together. Each step builds a single batch with:
+  - the next token of every sequence that is decoding
+  - the next chunk of every prompt still being prefilled; prompts are split into chunks so a long
+    one does not stall the others' decode
+One llama_decode call runs the whole batch. Each sequence is then sampled from its own logits
+with its own temperature, top_k, top_p and seed. Requests join at the next step and leave as soon
+as they finish. Decode on CPU and GPU is bound by memory bandwidth, so a step with eight sequences
+costs little more than a step with one, and aggregate tokens/s grows with concurrency.
+
+The engine is used for requests that find the model busy (see brain.py); an uncontended request
+keeps the direct path and its session KV reuse. A finished sequence leaves its tokens in the KV
+cache, and a new request goes to the free slot whose cached tokens share the longest prefix with
+its prompt. Requests built from the same system prompt (every /action, most /ask) then only
+prefill what differs. Admission is limited by the engine's KV cells: a request waits until its
+prompt plus max_tokens fits beside the running ones, after idle slots' caches are dropped.
+"""
+import codecs
+import logging
+import queue
+import random
+import threading
+
+import tracing
+
+PREFILL_CHUNK = 256 # Prompt tokens per sequence per step
+MAX_BATCH_TOKENS = 512 # llama_batch capacity (n_batch)
+BATCH_SIZE_BUCKETS = (1, 2, 3, 4, 6, 8, 12, 16)
+
+def chat_prompt(model, messages):
+    """(prompt text, add_bos) for chat messages, using the model's own chat template when it has one."""
+    template = (getattr(model, "metadata", None) or {}).get("tokenizer.chat_template")
+    if template:
+        try:
+            from llama_cpp.llama_chat_format import Jinja2ChatFormatter
+            eos = model.detokenize([model.token_eos()], special=True).decode("utf-8", "ignore")
+            bos = model.detokenize([model.token_bos()], special=True).decode("utf-8", "ignore")
+            result = Jinja2ChatFormatter(template, eos_token=eos, bos_token=bos)(messages=messages)
+            return result.prompt, not getattr(result, "added_special", False)
+        except Exception as e:
+            logging.warning(f"Batching: chat template failed, using ChatML: {e}")
+    parts = [f"<|im_start|>{m['role']}\n{m['content']}<|im_end|>\n" for m in messages]
+    return "".join(parts) + "<|im_start|>assistant\n", True
+
+def sample(logits, temperature, top_k, top_p, rng):
+    """Token id from one row of logits (numpy array) with the request's own sampling settings."""
+    import numpy as np
+    if temperature <= 0:
+        return int(np.argmax(logits))
+    logits = np.asarray(logits, dtype=np.float64) / temperature
+    if 0 < top_k < logits.shape[0]:
+        ids = np.argpartition(logits, -top_k)[-top_k:]
+    else:
+        ids = np.arange(logits.shape[0])
+    scores = logits[ids]
+    probs = np.exp(scores - scores.max())
+    probs /= probs.sum()
+    if top_p < 1.0:
+        order = np.argsort(-probs)
+        keep = order[:int(np.searchsorted(np.cumsum(probs[order]), top_p)) + 1]
+        ids, probs = ids[keep], probs[keep] / probs[keep].sum()
+    return int(ids[min(int(np.searchsorted(np.cumsum(probs), rng.random())), len(ids) - 1)])
+
+class LlamaBatchBackend:
+    """The llama.cpp side: a multi-sequence context on an already loaded llama_cpp.Llama."""
+
+    def __init__(self, llama, slots, n_ctx):
+        import llama_cpp
+        import numpy as np
+        self.lib = llama_cpp
+        self.np = np
+        self.llama = llama
+        self.n_ctx = n_ctx
+        params = llama_cpp.llama_context_default_params()
+        params.n_ctx = n_ctx
+        params.n_batch = MAX_BATCH_TOKENS
+        params.n_seq_max = slots
+        params.n_threads = llama.context_params.n_threads
+        params.n_threads_batch = llama.context_params.n_threads_batch
+        self.ctx = llama_cpp.llama_new_context_with_model(llama.model, params)
+        if not self.ctx: raise RuntimeError("llama.cpp could not create the batch context")
+        self.batch = llama_cpp.llama_batch_init(MAX_BATCH_TOKENS, 0, slots)
+        self.n_vocab = llama.n_vocab()
+        # Renamed in newer llama.cpp releases
+        self._seq_rm = getattr(llama_cpp, "llama_kv_self_seq_rm", None) or llama_cpp.llama_kv_cache_seq_rm
+
+    def tokenize(self, text, add_bos=True):
+        return self.llama.tokenize(text.encode("utf-8"), add_bos=add_bos, special=True)
+
+    def piece(self, token):
+        return self.llama.detokenize([token])
+
+    def is_eog(self, token):
+        return bool(self.lib.llama_token_is_eog(self.llama.model, token))
+
+    def decode(self, entries):
+        """entries: [(seq, tokens, start position, want logits)].
+        Returns {seq: logits after its last token} for the sequences that want them."""
+        b = self.batch
+        n = 0
+        last = {}
+        for seq, tokens, start, want in entries:
+            for i, token in enumerate(tokens):
+                b.token[n] = token
+                b.pos[n] = start + i
+                b.n_seq_id[n] = 1
+                b.seq_id[n][0] = seq
+                b.logits[n] = want and i == len(tokens) - 1
+                n += 1
+            if want: last[seq] = n - 1
+        b.n_tokens = n
+        rc = self.lib.llama_decode(self.ctx, b)
+        if rc != 0: raise RuntimeError(f"llama_decode returned {rc}")
+        return {seq: self.np.ctypeslib.as_array(self.lib.llama_get_logits_ith(self.ctx, i), shape=(self.n_vocab,))
+                for seq, i in last.items()}
+
+    def clear(self, seq, keep=0):
+        """Drops the sequence's cached tokens from position `keep` on."""
+        self._seq_rm(self.ctx, seq, keep, -1)
+
+    def close(self):
+        if self.ctx:
+            self.lib.llama_batch_free(self.batch)
+            self.lib.llama_free(self.ctx)
+            self.ctx = None
+
+class BatchRequest:
+    """One generation in the engine. Iterating it yields text pieces as they are sampled."""
+
+    def __init__(self, tokens, max_tokens, temperature, top_k, top_p, seed, stop):
+        self.tokens = list(tokens) # Prompt, then each token fed back; what the KV cache holds when done
+        self.pending = list(tokens) # Fed to the model next: the prompt, then each sampled token
+        self.prompt_tokens = len(tokens)
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.top_k = top_k
+        self.top_p = top_p
+        self.rng = random.Random(seed)
+        self.stop = [s for s in stop or [] if s]
+        self.seq = None
+        self.pos = 0 # Tokens of this sequence already in the KV cache
+        self.generated = 0
+        self.held = "" # Sampled text not yet emitted because it may be the start of a stop string
+        self.decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self.out = queue.Queue()
+        self.cancelled = False
+        self.finished = False
+
+    @property
+    def prefilling(self):
+        return self.pos < self.prompt_tokens
+
+    def cancel(self):
+        self.cancelled = True
+
+    def _emit(self, text):
+        """Adds sampled text; returns True when a stop string ended the generation."""
+        self.held += text
+        for s in self.stop:
+            i = self.held.find(s)
+            if i >= 0:
+                if i: self.out.put(self.held[:i])
+                self.held = ""
+                return True
+        # Keep back only the longest tail that could still grow into a stop string
+        keep = max((k for s in self.stop for k in range(1, len(s)) if self.held.endswith(s[:k])), default=0)
+        ready, self.held = self.held[:len(self.held) - keep], self.held[len(self.held) - keep:]
+        if ready: self.out.put(ready)
+        return False
+
+    def _finish(self, error=None):
+        self.finished = True
+        if error is None and self.held: self.out.put(self.held)
+        self.out.put(error)
+
+    def __iter__(self):
+        try:
+            while True:
+                item = self.out.get()
+                if item is None: return
+                if isinstance(item, Exception): raise item
+                yield item
+        finally:
+            self.cancel() # A consumer that stops early frees the slot
+
+class BatchEngine:
+    def __init__(self, backend, slots, prefill_chunk=PREFILL_CHUNK):
+        self.backend = backend
+        self.slots = slots
+        self.prefill_chunk = prefill_chunk
+        self.cond = threading.Condition()
+        self.waiting = []
+        self.active = {} # seq id -> BatchRequest
+        self.cached = {} # seq id -> tokens left in the KV cache by its last request
+        self.stopping = False
+        self.steps = 0
+        self.tokens = 0
+        self.thread = threading.Thread(target=self._loop, daemon=True, name="omni-batch")
+        self.thread.start()
+
+    def submit(self, prompt, max_tokens=256, temperature=0.7, top_k=40, top_p=0.95, seed=None, stop=None, add_bos=True):
+        req = BatchRequest(self.backend.tokenize(prompt, add_bos), max_tokens, temperature, top_k, top_p, seed, stop)
+        if not req.prompt_tokens: raise ValueError("empty prompt")
+        if req.prompt_tokens + max_tokens > self.backend.n_ctx:
+            raise ValueError(f"prompt of {req.prompt_tokens} tokens plus {max_tokens} does not fit the batch context")
+        with self.cond:
+            if self.stopping: raise RuntimeError("batch engine stopped")
+            self.waiting.append(req)
+            self.cond.notify()
+        return req
+
+    def stop(self):
+        with self.cond:
+            self.stopping = True
+            self.cond.notify()
+        self.thread.join(timeout=5)
+        self.backend.close()
+
+    def _reserved(self):
+        return (sum(r.prompt_tokens + r.max_tokens for r in self.active.values())
+                + sum(len(t) for s, t in self.cached.items() if s not in self.active))
+
+    def _drop_cache(self, seq, keep=0):
+        try: self.backend.clear(seq, keep)
+        except Exception as e:
+            logging.warning(f"Batching: clearing sequence {seq} failed: {e}")
+            keep = 0
+        self.cached[seq] = self.cached.get(seq, [])[:keep]
+
+    def _admit(self):
+        free = [s for s in range(self.slots) if s not in self.active]
+        while self.waiting and free:
+            req = self.waiting[0]
+            if req.cancelled:
+                self.waiting.pop(0)
+                req._finish()
+                continue
+            # Reuse the free slot whose cache shares the most with this prompt; at least the last
+            # prompt token is decoded again so there are logits to sample from
+            shared = {s: _common_prefix(self.cached.get(s, []), req.pending, req.prompt_tokens - 1) for s in free}
+            seq = max(free, key=lambda s: shared[s])
+            needed = req.prompt_tokens + req.max_tokens - shared[seq]
+            # The KV cells are shared: drop idle caches, then wait until this request's worst case fits
+            for idle in [s for s in free if s != seq and self.cached.get(s)]:
+                if self._reserved() + needed <= self.backend.n_ctx: break
+                self._drop_cache(idle)
+            if self.active and self._reserved() + needed > self.backend.n_ctx: break
+            self.waiting.pop(0)
+            free.remove(seq)
+            self._drop_cache(seq, shared[seq])
+            req.seq = seq
+            req.pos = len(self.cached[seq])
+            del req.pending[:req.pos]
+            self.active[seq] = req
+            if req.pos: tracing.metrics.inc("omni_batch_prefix_tokens_total", req.pos)
+
+    def _release(self, req, error=None):
+        with self.cond:
+            self.active.pop(req.seq, None)
+            # Tokens decoded so far stay cached for the next request with the same prefix
+            self.cached[req.seq] = req.tokens[:req.pos]
+            if error is not None: self._drop_cache(req.seq)
+        req._finish(error)
+
+    def _loop(self):
+        while True:
+            with self.cond:
+                while not self.stopping and not self.waiting and not self.active:
+                    self.cond.wait()
+                if self.stopping:
+                    for req in list(self.active.values()) + self.waiting: req._finish(RuntimeError("batch engine stopped"))
+                    self.active.clear()
+                    self.waiting.clear()
+                    return
+                self._admit()
+                running = list(self.active.values())
+            for req in [r for r in running if r.cancelled]:
+                self._release(req)
+            running = [r for r in running if not r.cancelled]
+            if not running: continue
+
+            # Decode tokens first (one per sequence), then prompt chunks in the room that is left
+            entries, room = [], MAX_BATCH_TOKENS
+            for req in sorted(running, key=lambda r: r.prefilling):
+                n = 1 if not req.prefilling else min(self.prefill_chunk, len(req.pending), room)
+                if n <= 0: continue
+                entries.append((req, req.pending[:n]))
+                room -= n
+            try:
+                logits = self.backend.decode([(req.seq, tokens, req.pos, req.pos + len(tokens) >= req.prompt_tokens)
+                                              for req, tokens in entries])
+            except Exception as e:
+                logging.error(f"Batching: decode failed: {e}")
+                for req in running: self._release(req, e)
+                continue
+            self.steps += 1
+            tracing.metrics.observe("omni_batch_sequences", len(entries), buckets=BATCH_SIZE_BUCKETS)
+
+            for req, tokens in entries:
+                req.pos += len(tokens)
+                del req.pending[:len(tokens)]
+                if req.prefilling: continue
+                try:
+                    token = sample(logits[req.seq], req.temperature, req.top_k, req.top_p, req.rng)
+                    req.generated += 1
+                    self.tokens += 1
+                    if self.backend.is_eog(token):
+                        self._release(req)
+                        continue
+                    stopped = req._emit(req.decoder.decode(self.backend.piece(token)))
+                except Exception as e:
+                    self._release(req, e)
+                    continue
+                if stopped or req.generated >= req.max_tokens:
+                    self._release(req)
+                    continue
+                req.pending = [token]
+                req.tokens.append(token)
+
+    def stats(self):
+        with self.cond:
+            return {"slots": self.slots, "active": len(self.active), "waiting": len(self.waiting),
+                    "steps": self.steps, "tokens": self.tokens,
+                    "cached_tokens": sum(len(t) for t in self.cached.values())}
+
+def _common_prefix(a, b, limit):
+    n = 0
+    for x, y in zip(a, b):
+        if n >= limit or x != y: break
+        n += 1
+    return n
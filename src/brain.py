@@ -1,52 +1,140 @@
-import logging, sys, os, time, threading, json, subprocess
+from startup_profile import milestone
+import logging, sys, os, re, time, threading, json, subprocess
 from flask import Flask, request, jsonify
-import requests
-from simpleeval import SimpleEval
+from contextlib import contextmanager
+import tracing
+import async_log
+import settings
+import model_registry
+# requests, simpleeval and the request-path modules (calc_engine, speculation, local_rag, ...)
+# are imported where used (and pre-warmed by _startup_sequence) so the HTTP server binds
+# without paying for them
+milestone("imports")
 
 # Silence logs
 logging.getLogger('werkzeug').setLevel(logging.ERROR)
-logging.basicConfig(level=logging.INFO)
+# Handlers run on async_log's listener thread; request threads only enqueue
+async_log.install(async_log.stream())
+llm_output_log = async_log.channel("omni.llm_output", "/tmp/llm_output.log",
+                                   sample_every=lambda: settings.get("llm.log_sample"))
+person_debug_log = async_log.channel("omni.person", "/tmp/person_debug.log",
+                                     sample_every=lambda: settings.get("person.log_sample"))
 app = Flask(__name__)
 
-HOME = os.path.expanduser("~")
-MODEL_DIR = os.path.join(HOME, ".local/share/ai-models")
-# Matches setup-dev.sh
-MODEL_FILENAME = "gemma-3-1b-it-Q8_0.gguf"
-MODEL_PATH = os.path.join(MODEL_DIR, MODEL_FILENAME)
+@app.before_request
+def _begin_trace():
+    # The matched rule, not the raw path, so stray URLs cannot grow the label set
+    tracing.begin(request.url_rule.rule if request.url_rule else "unmatched")
 
-DB_PATH = os.path.join(HOME, ".local/share/ai-memory-db")
-SEARXNG_URL = "http://127.0.0.1:8888/search"
+@app.after_request
+def _finish_trace(response):
+    tracing.finish(response.status_code)
+    return response
+
+# Model, paths, timeouts and context budgets are read from settings.py at use time, so edits
+# to ~/.config/omni/settings.json apply to the next request (model and DB keys to the next load)
+WIKIPEDIA_SUMMARY_URL = "https://en.wikipedia.org/api/rest_v1/page/summary/"
+DUCKDUCKGO_HTML_URL = "https://html.duckduckgo.com/html/" # Non-JS version (robust fallback)
+RETRIEVAL_STAGES = ("searxng", "web_context", "embedding", "lancedb", "rag_chunks", "rag_context")
+GENERATION_STAGES = ("prefill", "decode")
 
-llm = None
 embed_model = None
 db_conn = None
 init_error = None
-
-# Thread Lock
-main_lock = threading.Lock()
-fast_lock = threading.Lock()
 abort_fast_event = threading.Event()
 
-# Fast Action Model (Shared with Main in this config to save VRAM)
-fast_model = None
-fast_loading_started = False
-fast_model_error = None
-
-# --- SHORTCUTS ---
-COMMON_SHORTCUTS = {
-    "yt": "https://www.youtube.com",
-    "gh": "https://github.com",
-    "x": "https://x.com",
-    "red": "https://reddit.com",
-    "map": "https://www.google.com/maps",
-    "chat": "https://chatgpt.com"
-}
+# Installable package index for /install_plan (see package_catalog.py)
+package_catalog = None
+catalog_lock = threading.Lock()
+
+# Chunk text and embeddings of indexed files, reused until a file changes (see local_rag.py)
+chunk_cache = None
+
+# /ask conversations keyed by the launcher's session ID (see ask_sessions.py)
+sessions = None
+
+# chunk_cache, sessions, navigation, entities and speculator are created by their get_*()
+# on first use, like package_catalog
+lazy_lock = threading.Lock()
+
+def get_chunk_cache():
+    global chunk_cache
+    with lazy_lock:
+        if chunk_cache is None:
+            import local_rag
+            chunk_cache = local_rag.ChunkCache()
+        return chunk_cache
+
+def get_sessions():
+    global sessions
+    with lazy_lock:
+        if sessions is None:
+            import ask_sessions
+            sessions = ask_sessions.SessionStore(lambda: settings.get("session.memory_mb") * 1024 * 1024)
+        return sessions
+
+# Launcher generation IDs: a newer request of the same kind from the same launcher supersedes older ones
+latest_generations = {}
+generation_lock = threading.Lock()
+
+def load_llama(spec):
+    """Loads one registry model (see model_registry.py)."""
+    from llama_cpp import Llama
+    if not os.path.exists(spec["path"]):
+        raise FileNotFoundError(f"Model not found at {spec['path']}")
+    return Llama(
+        model_path=spec["path"], 
+        n_ctx=spec["n_ctx"], 
+        n_threads=spec["n_threads"], 
+        n_gpu_layers=spec["n_gpu_layers"], 
+        verbose=False
+    )
+
+# GGUF models by size, loaded on demand within the memory budget, and the per-request router
+models = model_registry.ModelRegistry(load_llama)
+router = model_registry.Router(models)
+loader_done = False
+
+# Requests that find their model busy share a batched decode loop instead of waiting (see batching.py)
+batch_backend = None # batching.LlamaBatchBackend unless replaced
+batch_lock = threading.Lock()
+
+def batch_engine(entry):
+    """The entry's BatchEngine, created on first use; None when batching is off or unavailable."""
+    slots = settings.get("batching.slots")
+    if slots < 2 or entry.batch is False: return None
+    with batch_lock:
+        if entry.batch is None:
+            try:
+                import batching
+                backend = (batch_backend or batching.LlamaBatchBackend)(entry.model, slots, settings.get("batching.n_ctx"))
+                entry.batch = batching.BatchEngine(backend, slots)
+                logging.info(f"Batching: {slots} sequences on {entry.name}")
+            except Exception as e:
+                logging.warning(f"Batching: unavailable for {entry.name}, requests will queue: {e}")
+                entry.batch = False
+        return entry.batch or None
+
+@contextmanager
+def generation_slot(entry, model_name):
+    """Yields the BatchEngine a generation should join, or None with entry.lock held for the
+    direct path. The lock is tried without blocking, so checking and taking it are one step;
+    a request that finds it taken goes to the engine, or waits for it when batching is off."""
+    acquired = entry.lock.acquire(blocking=False)
+    if not acquired:
+        engine = batch_engine(entry)
+        if engine is not None:
+            yield engine
+            return
+    with tracing.timed_lock(entry.lock, model_name, held=acquired):
+        yield None
 
 def ensure_model_loaded():
-    """Smart Loader: Loads models separately or unified based on config"""
-    global llm, fast_model, init_error, embed_model, db_conn, fast_lock, main_lock
+    """Smart Loader: DB, embeddings and the models that fit the memory budget, once"""
+    global loader_done, init_error, embed_model, db_conn
     
-    if llm and fast_model: return
+    if loader_done: return
+    loader_done = True
 
     logging.info("Smart Loader: Starting...")
     
@@ -54,9 +142,10 @@ def ensure_model_loaded():
     logging.info("Smart Loader: Connecting to DB...")
     if db_conn is None:
         try: 
-            if os.path.exists(DB_PATH): 
+            db_path = settings.get("db.path")
+            if os.path.exists(db_path): 
                 import lancedb
-                db_conn = lancedb.connect(DB_PATH)
+                db_conn = lancedb.connect(db_path)
                 logging.info("Smart Loader: DB Connected.")
             else:
                 logging.info("Smart Loader: DB Path not found, skipping.")
@@ -73,43 +162,16 @@ def ensure_model_loaded():
     except Exception as e:
         logging.error(f"Smart Loader: Import Error: {e}")
         init_error = str(e)
+        loader_done = False # Retried by the next request
         return
 
-    # 3. Load Model
-    if not os.path.exists(MODEL_PATH):
-        init_error = f"Model not found at {MODEL_PATH}"
-        logging.error(init_error)
-        return
-
-    n_gpu_layers = -1 # All layers to GPU if possible
-    
-    with main_lock:
-        if llm and fast_model: return 
-        logging.info(f"Loading Model: {MODEL_FILENAME}")
-        try:
-            shared_model = Llama(
-                model_path=MODEL_PATH, 
-                n_ctx=4096, 
-                n_threads=4, 
-                n_gpu_layers=n_gpu_layers, 
-                verbose=False
-            )
-            llm = shared_model
-            fast_model = shared_model
-            
-            # Helper for simple completions
-            # Monkey patch or wrapper if custom logic needed, but Llama object is callable
-            
-            fast_lock = main_lock 
-            logging.info("Model Loaded successfully.")
-        except Exception as e:
-            logging.error(f"Model Load Error: {e}")
-            init_error = str(e)
+    # 3. Load Models: smallest first (it serves /action), then larger ones while they fit
+    models.preload()
+    logging.info(f"Models Loaded: {', '.join(models.stats()['loaded']) or 'none'}")
 
     # 4. Embeddings (CPU/GPU)
     try:
         from sentence_transformers import SentenceTransformer
-        import torch
         device = 'cpu' # Force CPU for now to be safe
         logging.info(f"Loading Embeddings on device: {device.upper()}")
         embed_model = SentenceTransformer('all-MiniLM-L6-v2', device=device)
@@ -123,7 +185,29 @@ def ensure_fast_model():
 def ensure_main_model():
     ensure_model_loaded()
 
+def register_generation(kind):
+    """Remembers the launcher generation of the current request. Returns a token for is_superseded()."""
+    try:
+        client = request.headers.get('X-Omni-Client')
+        generation = int(request.headers.get('X-Omni-Generation', ''))
+    except ValueError:
+        return None
+    if not client: return None
+
+    key = (client, kind)
+    with generation_lock:
+        if generation > latest_generations.get(key, -1):
+            latest_generations[key] = generation
+    return key, generation
+
+def is_superseded(token):
+    if not token: return False
+    key, generation = token
+    with generation_lock:
+        return latest_generations.get(key, generation) > generation
+
 def search_api(query, categories='general'):
+    import requests
     try:
         logging.info(f"Searching SearXNG for: '{query}' (Categories: {categories})")
         params = {
@@ -132,7 +216,8 @@ def search_api(query, categories='general'):
             'categories': categories,
             'language': 'en-US' 
         }
-        resp = requests.get(SEARXNG_URL, params=params, timeout=5.0)
+        with tracing.span("searxng", categories=categories):
+            resp = requests.get(settings.get("searxng.url"), params=params, timeout=settings.get("timeouts.search"))
         if resp.status_code == 200:
             results = resp.json().get('results', [])
             return results
@@ -146,23 +231,57 @@ def perform_web_search(query):
         results = search_api(query, categories='general')
         if not results: return "No search results found."
         
-        text_res = []
-        for i, res in enumerate(results):
-            if i >= 3: break
-            title = res.get('title', 'No Title')
-            url = res.get('url', ' ')
+        passages = []
+        for res in results[:settings.get("context.web_candidates")]:
             content = res.get('content', ' '.strip()) or res.get('snippet', ' '.strip())
             if content:
-                text_res.append(f"Source: {title} ({url})\nContent: {content}")
-        
-        return "\n\n".join(text_res)
+                passages.append({"title": res.get('title', 'No Title'), "url": res.get('url', ' '), "text": content.strip()})
+
+        # Most relevant, non-repeating snippets that fit the budget instead of the first three raw ones
+        import context_builder
+        with tracing.span("web_context") as attrs:
+            blocks, stats = context_builder.build(
+                query, passages, settings.get("context.web_tokens"), prompt_tokens,
+                lambda p, text: f"Source: {p['title']} ({p['url']})\nContent: {text}",
+                encode=embed_model.encode if embed_model else None,
+            )
+            attrs.update(stats)
+        tracing.annotate(web_context_tokens=stats["tokens"])
+        return "\n\n".join(blocks) or "No search results found."
     except Exception as e:
         return f"Search failed: {str(e)}"
 
+def build_local_context(query):
+    """Best chunks of the indexed files nearest to the question, within the local-context token budget."""
+    if not db_conn or not embed_model: return ""
+    import local_rag, context_builder
+    try:
+        with tracing.span("embedding"):
+            vector = embed_model.encode(query)
+        with tracing.span("lancedb", table="files"):
+            files = local_rag.nearest_files(db_conn.open_table("files"), vector)
+        if not files: return ""
+        with tracing.span("rag_chunks", files=len(files)):
+            passages = local_rag.passages(files, get_chunk_cache(), embed_model.encode)
+        with tracing.span("rag_context") as attrs:
+            blocks, stats = context_builder.build(
+                query, passages, settings.get("context.local_tokens"), prompt_tokens,
+                lambda p, text: f"File: {p['title']} ({p['url']})\n{text}",
+                encode=embed_model.encode, query_vector=vector, min_score=settings.get("context.local_min_score"),
+            )
+            attrs.update(stats)
+        tracing.annotate(local_context_tokens=stats["tokens"])
+        return "\n\n".join(blocks)
+    except Exception as e:
+        logging.error(f"Local context failed: {e}")
+        return ""
+
 def get_navigation_result(query):
+    import requests
     try:
         params = {'q': query, 'format': 'json'}
-        resp = requests.get(SEARXNG_URL, params=params, timeout=3.0)
+        with tracing.span("searxng", categories="navigation"):
+            resp = requests.get(settings.get("searxng.url"), params=params, timeout=settings.get("timeouts.navigation"))
         if resp.status_code == 200:
             results = resp.json().get('results', [])
             if results:
@@ -175,56 +294,110 @@ def get_navigation_result(query):
     except: pass
     return None
 
+# Sites and pages from browser history, bookmarks and past navigations (see navigation_index.py)
+navigation = None
+
+def get_navigation():
+    global navigation
+    with lazy_lock:
+        if navigation is None:
+            import navigation_index
+            navigation = navigation_index.NavigationIndex()
+        return navigation
+
+def navigation_result(query, typed=None):
+    """First URL for a SEARCH: query: the local navigation index, SearXNG only on a miss."""
+    with tracing.span("navigation_index"):
+        nav = get_navigation().lookup(query, typed)
+    tracing.metrics.inc("omni_navigation_lookup_total", result="hit" if nav else "miss")
+    return nav or get_navigation_result(query)
+
+def wikipedia_summary(title):
+    """Wikipedia's REST summary of an article, or None when there is no such article."""
+    import requests
+    headers = {"User-Agent": "OmniOS/1.0 (internal-dev)"}
+    with tracing.span("wikipedia"):
+        r = requests.get(f"{WIKIPEDIA_SUMMARY_URL}{title.strip().replace(' ', '_')}", headers=headers,
+                         timeout=settings.get("timeouts.enrichment"))
+    if r.status_code == 200:
+        data = r.json()
+        if data.get('type') == 'standard': return data
+    return None
+
+# Person/place summaries and thumbnails kept locally, refreshed in the background (see entity_store.py)
+entities = None
+
+def get_entities():
+    global entities
+    with lazy_lock:
+        if entities is None:
+            import entity_store
+            entities = entity_store.EntityStore(settings.get("entities.path"), fetch=wikipedia_summary,
+                                                max_age_days=lambda: settings.get("entities.max_age_days"))
+        return entities
+
+def entity_result(kind, query, fetch, speculative=False):
+    """A PERSON/PLACE card from the entity store, else fetch(query) from the web (then stored).
+    Speculative fetches store the entity under its title only, never the query as an alias."""
+    with tracing.span("entity_store", kind=kind):
+        cached = get_entities().lookup(kind, query)
+    tracing.metrics.inc("omni_entity_lookup_total", kind=kind, result="hit" if cached else "miss")
+    if cached: return cached
+    result = fetch(query)
+    if result: get_entities().remember(kind, query, result, alias=not speculative)
+    return result
+
 def get_person_result(name):
+    return entity_result("person", name, fetch_person_result)
+
+def get_place_result(query):
+    return entity_result("place", query, fetch_place_result)
+
+def fetch_person_result(name):
+    import requests
     # Simplified logic for porting (can be expanded later)
     try:
-        with open("/tmp/person_debug.log", "a") as f:
-            f.write(f"Entering get_person_result for: {name}\n")
         params = {'q': name, 'format': 'json', 'categories': 'general', 'language': 'en-US'}
-        resp = requests.get(SEARXNG_URL, params=params, timeout=4.0)
+        with tracing.span("searxng", categories="person"):
+            resp = requests.get(settings.get("searxng.url"), params=params, timeout=settings.get("timeouts.enrichment"))
         
         if resp.status_code == 200:
             results = resp.json().get('results', [])
-            with open("/tmp/person_debug.log", "a") as f:
-                f.write(f"Query: {name}\nStatus: {resp.status_code}\nResults: {len(results)}\nFirst: {results[0] if results else 'None'}\n{'-'*20}\n")
+            person_debug_log.debug("Query: %s\nStatus: %s\nResults: %d\nFirst: %s\n%s",
+                                   name, resp.status_code, len(results), results[0] if results else 'None', '-' * 20)
             if results:
                 best = results[0]
-                image_url = None
-                # Basic direct image fetch via search if needed
                 return {
                     "type": "person",
                     "name": best.get('title', name),
                     "description": best.get('content') or best.get('snippet', ''),
                     "url": best.get('url'),
-                    "image": None # Placeholder for now
+                    "image": None # The entity store's refresher adds the Wikipedia thumbnail
                 }
     except Exception as e:
+        person_debug_log.warning("SearXNG person lookup for %s failed: %s", name, e)
         # Fallback: Wikipedia API
         try:
-            # Clean name for URL (spaces to underscores)
-            wiki_name = name.strip().replace(" ", "_")
-            url = f"https://en.wikipedia.org/api/rest_v1/page/summary/{wiki_name}"
-            headers = {"User-Agent": "OmniOS/1.0 (internal-dev)"}
-            r = requests.get(url, headers=headers, timeout=4)
-            if r.status_code == 200:
-                data = r.json()
-                if data.get('type') == 'standard':
-                   return {
-                       "type": "person",
-                       "name": data.get('title', name),
-                       "description": data.get('extract', ' '),
-                       "url": data.get('content_urls', {}).get('desktop', {}).get('page', ''),
-                       "image": data.get('thumbnail', {}).get('source')
-                   }
+            data = wikipedia_summary(name)
+            if data:
+                return {
+                    "type": "person",
+                    "name": data.get('title', name),
+                    "description": data.get('extract', ' '),
+                    "url": data.get('content_urls', {}).get('desktop', {}).get('page', ''),
+                    "image": data.get('thumbnail', {}).get('source')
+                }
         except: pass
     pass
     return None
 
-def get_place_result(query):
+def fetch_place_result(query):
+    import requests
     # Simplified logic for porting
     try:
         params = {'q': query, 'format': 'json', 'categories': 'map'}
-        resp = requests.get(SEARXNG_URL, params=params, timeout=4.0)
+        with tracing.span("searxng", categories="map"):
+            resp = requests.get(settings.get("searxng.url"), params=params, timeout=settings.get("timeouts.enrichment"))
         if resp.status_code == 200:
             results = resp.json().get('results', [])
             if results:
@@ -242,15 +415,16 @@ def get_place_result(query):
     return None
 
 def resolve_app_metadata(app_name):
+    import requests
     # User requested generic web search for "first link"
     try:
-        # Use html.duckduckgo.com for non-JS version (robust fallback)
-        url = "https://html.duckduckgo.com/html/"
+        url = DUCKDUCKGO_HTML_URL
         params = {"q": f"{app_name} official website"}
         headers = {"User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.114 Safari/537.36"}
         
         # Use POST to emulate standard form submission
-        resp = requests.post(url, data=params, headers=headers, timeout=5)
+        with tracing.span("duckduckgo"):
+            resp = requests.post(url, data=params, headers=headers, timeout=settings.get("timeouts.search"))
         
         if resp.status_code == 200:
             import re
@@ -272,24 +446,85 @@ def perform_calculation(expression):
         for prefix in ["calculate ", "what is ", "solve "]:
             if lower_input.startswith(prefix):
                 expression = expression[len(prefix):]
+        import calc_engine
+        calc = calc_engine.evaluate(expression)
+        if calc:
+            return (f"Expression: {expression}\nResult: {calc['result']}")
+        from simpleeval import SimpleEval
         s = SimpleEval()
         result = s.eval(expression)
         return (f"Expression: {expression}\nResult: {result}")
     except Exception as e:
         return f"Error calculating '{expression}': {str(e)}"
 
+def count_tokens(model, text):
+    try: return len(model.tokenize(text.encode("utf-8")))
+    except Exception: return 0
+
+def prompt_tokens(text):
+    # Tokenizer of the most recently used model when one is loaded, otherwise ~4 characters per token
+    entry = models.any_loaded()
+    return (count_tokens(entry.model, text) if entry else 0) or len(text) // 4
+
+def model_error(name):
+    return models.errors.get(name) or init_error or "unknown error"
+
+def answer_outcome(model, answer, max_tokens):
+    """Quality outcome of an /ask generation for the route stats."""
+    if not answer: return "empty"
+    return "truncated" if count_tokens(model, answer) >= max_tokens - 1 else "ok"
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    # Prometheus text exposition by default, ?format=json for a percentile summary
+    if request.args.get("format") == "json":
+        return jsonify(dict(tracing.metrics.snapshot(), logging=async_log.stats(), sessions=get_sessions().stats(),
+                            speculation=get_speculator().stats(), models=models.stats(), routes=router.stats(),
+                            chunk_cache=get_chunk_cache().stats(), entities=get_entities().stats(),
+                            navigation=get_navigation().stats()))
+    return tracing.metrics.render_prometheus(), 200, {"Content-Type": "text/plain; version=0.0.4"}
+
+def calc_answer(query):
+    """calc_engine result for the query (or None), counted and put on the trace."""
+    with tracing.span("calc"):
+        import calc_engine
+        try: calc = calc_engine.evaluate(query)
+        except Exception as e:
+            # A calculator bug must not take /ask or /action down; the model answers instead
+            logging.warning(f"Calc failed for {query!r}: {e}")
+            calc = None
+    if calc:
+        tracing.annotate(calc=calc["kind"])
+        tracing.metrics.inc("omni_calc_total", kind=calc["kind"])
+    return calc
+
+@app.route('/settings', methods=['GET'])
+def settings_endpoint():
+    # Effective settings after the file and environment overrides (see settings.py)
+    return jsonify(settings.snapshot())
+
 @app.route('/ask', methods=['POST'])
 def ask():
-    abort_fast_event.set()
-    ensure_main_model()
-
-    if not llm:
-        return jsonify({"answer": f"Error: Model failed to load. Reason: {init_error}"})
-
     try: req = request.get_json(force=True)
     except: return jsonify({"answer": "Error: Bad JSON"}), 400
     
     query = req.get('query', ' '.strip())
+    session_id = req.get('session_id')
+
+    # Arithmetic, units, currency and bases are answered exactly, without waking the model
+    calc = calc_answer(query)
+    if calc:
+        answer = f"{calc['expression']} = {calc['result']}"
+        if calc.get("rates_updated"): answer += f"\n(offline rates from {calc['rates_updated']})"
+        return jsonify({"answer": answer, "timings": {"retrieval_ms": 0.0, "generation_ms": 0.0, "stages": tracing.stage_totals()}})
+
+    abort_fast_event.set()
+    ensure_main_model()
+    try: requested_tokens = int(req.get('max_tokens') or 0) or None
+    except (TypeError, ValueError): requested_tokens = None
+    answer_tokens = requested_tokens or settings.get("ask.max_tokens")
+    # Short closed questions to a mid-size model, long or open-ended ones to the largest
+    model_name, tier = router.route("ask", query, requested_tokens)
     
     # Simple Routing Logic (Rule based + Lite LLM if needed)
     # For speed in this port, we rely on semantic routing or just asking LLM directly
@@ -305,29 +540,68 @@ def ask():
          source_type = "Calculator"
          context_text = f"--- Calculation Result ---\n{perform_calculation(query)}\n"
 
-    prompt = (
-        f"<|im_start|>system\nYou are Omni, a smart OS assistant.\n"
-        f"Context Source: {source_type}\n"
-        f"Context Data:\n{context_text or 'No context.'}\n\n"
-        f"RULES:\n"
-        f"1. Answer concisely.\n"
-        f"2. Use context if available.\n"
-        f"<|im_end|>\n"
-        f"<|im_start|>user\n{query}<|im_end|>\n"
-        f"<|im_start|>assistant\n"
-    )
+    # Passages from the user's own indexed files, alongside (or instead of) the web
+    if source_type != "Calculator" and req.get('local_context', settings.get("ask.local_context")):
+        local_text = build_local_context(query)
+        if local_text:
+            source_type = "Local Files" if source_type == "None" else f"{source_type} + Local Files"
+            context_text += f"--- Local Files ---\n{local_text}\n"
+
+    import ask_sessions
+    store = get_sessions()
+    user_text = ask_sessions.user_turn(query, source_type, context_text)
+    session = store.get(session_id) if session_id else None
 
+    start = time.perf_counter()
+    outcome = "error"
     try:
         abort_fast_event.clear()
-        with main_lock:
-            output = llm(
-                prompt, max_tokens=1024, stop=["<|im_start|>", "<|im_end|>", "<|endoftext|>"], 
-                echo=False, temperature=0.7
-            )
-        answer = output['choices'][0]['text'].strip()
+        with models.checkout(model_name) as entry:
+            if entry is None:
+                return jsonify({"answer": f"Error: Model failed to load. Reason: {model_error(model_name)}"})
+            llm = entry.model
+            with get_speculator().priority(), generation_slot(entry, model_name) as engine:
+                if engine:
+                    # Model busy: decode alongside the running generation instead of queueing behind it.
+                    # The batch context holds no session state, so the turn is recorded without a snapshot.
+                    prompt = store.prompt(session, user_text, lambda text: count_tokens(llm, text), llm.n_ctx(), answer_tokens)
+                    tracing.annotate(batched=True, session_turns=len(session.turns) if session else 0)
+                    tracing.metrics.inc("omni_ask_session_total", cache="batched")
+                    stream = engine.submit(prompt, max_tokens=answer_tokens, temperature=settings.get("ask.temperature"),
+                                           stop=["<|im_start|>", "<|im_end|>", "<|endoftext|>"])
+                    answer = tracing.drain_generation(stream, lambda piece: piece, model_name,
+                                                      prompt_tokens=stream.prompt_tokens).strip()
+                    store.commit(session, query, user_text, answer, None, model_name)
+                else:
+                    # Same prompt as last turn plus the new one, so the restored KV cache covers the prefix
+                    prompt = store.prompt(session, user_text, lambda text: count_tokens(llm, text), llm.n_ctx(), answer_tokens)
+                    with tracing.span("session_restore"):
+                        cache = store.restore(session, llm, model_name)
+                    tracing.annotate(session_cache=cache, session_turns=len(session.turns) if session else 0)
+                    tracing.metrics.inc("omni_ask_session_total", cache=cache)
+                    # Streamed so prefill (time to first token) and decode can be timed separately
+                    stream = llm(
+                        prompt, max_tokens=answer_tokens, stop=["<|im_start|>", "<|im_end|>", "<|endoftext|>"], 
+                        echo=False, temperature=settings.get("ask.temperature"), stream=True
+                    )
+                    answer = tracing.drain_generation(stream, lambda c: c['choices'][0]['text'], model_name,
+                                                      prompt_tokens=count_tokens(llm, prompt)).strip()
+                    with tracing.span("session_save"):
+                        store.commit(session, query, user_text, answer, llm, model_name)
+            outcome = answer_outcome(llm, answer, answer_tokens)
     except Exception as e: answer = f"Error: {e}"
-    
-    return jsonify({"answer": answer})
+    router.record("ask", model_name, (time.perf_counter() - start) * 1000, outcome)
+
+    # Where the time went: fetching context versus running the model
+    stages = tracing.stage_totals()
+    timings = {
+        "retrieval_ms": round(sum(stages.get(s, 0) for s in RETRIEVAL_STAGES), 2),
+        "generation_ms": round(sum(stages.get(s, 0) for s in GENERATION_STAGES), 2),
+        "stages": stages,
+    }
+    for phase in ("retrieval", "generation"):
+        tracing.metrics.observe("omni_ask_phase_duration_ms", timings[f"{phase}_ms"], phase=phase)
+    return jsonify({"answer": answer, "timings": timings})
 
 @app.route('/search', methods=['POST'])
 def search_endpoint():
@@ -343,8 +617,11 @@ def search_endpoint():
 
     results = []
     try:
-        tbl = db_conn.open_table("files")
-        res = tbl.search(embed_model.encode(query)).limit(3).to_pandas()
+        with tracing.span("embedding"):
+            vector = embed_model.encode(query)
+        with tracing.span("lancedb", table="files"):
+            tbl = db_conn.open_table("files")
+            res = tbl.search(vector).limit(3).to_pandas()
         if not res.empty:
             for _, row in res.iterrows():
                 if row.get('_distance', 0) < 1.1:
@@ -358,30 +635,7 @@ def search_endpoint():
 
     return jsonify({"results": results})
 
-@app.route('/action', methods=['POST'])
-def action_endpoint():
-    ensure_fast_model()
-    
-    try: req = request.get_json(force=True)
-    except: return jsonify({"actions": []}), 400
-    
-    query = req.get('query', "").strip()
-    if not query: return jsonify({"actions": []})
-
-    # 1. Shortcuts
-    if query.lower() in COMMON_SHORTCUTS:
-        url = COMMON_SHORTCUTS[query.lower()]
-        act = {
-                "type": "link",
-                "url": url,
-                "title": url.replace("https://", "").replace("www.", "").split('/')[0].title(),
-                "description": f"Direct Shortcut"
-            }
-        return jsonify({"action": act, "actions": [act]})
-
-    # 2. LLM Inference for Action
-    # Creating a simplified prompt for the port
-    system_prompt = """Output ONLY the matching action(s).
+ACTION_SYSTEM_PROMPT = """Output ONLY the matching action(s).
 Format:
 PERSON:[Name]
 PLACE:[Name]
@@ -390,23 +644,124 @@ INSTALL:[App Name]
 CALC:[Expression]
 SEARCH:[Query]
 """
-    user_prompt = f"Query: {query}"
-    
-    messages = [
-        {"role": "system", "content": system_prompt},
-        {"role": "user", "content": user_prompt}
+
+def action_messages(query):
+    return [
+        {"role": "system", "content": ACTION_SYSTEM_PROMPT},
+        {"role": "user", "content": f"Query: {query}"}
     ]
+
+def speculative_action_text(query, should_stop, started):
+    """Fast-model action text for a partial query. None when the model is busy, or as soon as
+    a real request wants it: speculation never waits for or holds up the model."""
+    with models.borrow(router.route("speculate", query)[0]) as entry:
+        if entry is None or not entry.lock.acquire(blocking=False): return None
+        try:
+            if not started(): return None # The real /action for this query got here first
+            stream = entry.model.create_chat_completion(
+                messages=action_messages(query), max_tokens=settings.get("action.max_tokens"),
+                temperature=settings.get("action.temperature"), stream=True
+            )
+            parts = []
+            for chunk in stream:
+                if should_stop() or abort_fast_event.is_set(): return None
+                parts.append(chunk['choices'][0]['delta'].get('content') or "")
+            return "".join(parts).strip()
+        finally:
+            entry.lock.release()
+
+speculator = None
+
+def get_speculator():
+    global speculator
+    with lazy_lock:
+        if speculator is None:
+            import speculation
+            speculator = speculation.Speculator(speculative_action_text, {
+                "PERSON": lambda name: entity_result("person", name, fetch_person_result, speculative=True),
+                "PLACE": lambda query: entity_result("place", query, fetch_place_result, speculative=True),
+                "INSTALL": resolve_app_metadata,
+            })
+        return speculator
+
+@app.route('/navigated', methods=['POST'])
+def navigated_endpoint():
+    # The launcher opened a link for a query; the next SEARCH: for it resolves locally
+    try: req = request.get_json(force=True)
+    except: return jsonify({"recorded": False}), 400
+    get_navigation().record(req.get('query', ""), req.get('url'), req.get('title'))
+    return jsonify({"recorded": True})
+
+@app.route('/speculate', methods=['POST'])
+def speculate_endpoint():
+    # Partial query from the launcher while typing; returns at once, the work runs in the background
+    try: req = request.get_json(force=True)
+    except: return jsonify({"started": False}), 400
+    return jsonify({"started": get_speculator().speculate(req.get('query', ""))})
+
+@app.route('/action', methods=['POST'])
+def action_endpoint():
+    try: req = request.get_json(force=True)
+    except: return jsonify({"actions": []}), 400
     
+    query = req.get('query', "").strip()
+    if not query: return jsonify({"actions": []})
+
+    # 0. Calculator: exact answer in microseconds, no model needed
+    calc = calc_answer(query)
+    if calc:
+        act = {"type": "calc", "content": calc["result"]}
+        return jsonify({"action": act, "actions": [act]})
+
+    # 1. Shortcuts (built-ins plus the user's aliases, see shortcuts.py)
+    import shortcuts
+    act = shortcuts.link_action(query)
+    if act:
+        return jsonify({"action": act, "actions": [act]})
+
+    ensure_fast_model()
+    generation = register_generation("action")
+
+    # 2. LLM Inference for Action (or the speculated output for this exact query)
+    import speculation
+    speculator = get_speculator()
     try:
-        with fast_lock:
-            # Gemma 2 instruct check
-            out = fast_model.create_chat_completion(
-                messages=messages, max_tokens=64, temperature=0.1
-            )
-            result_text = out['choices'][0]['message']['content'].strip()
-            with open("/tmp/llm_output.log", "a") as f:
-                f.write(f"Query: {query}\nOutput:\n{result_text}\n{'-'*20}\n")
-            
+        result_text = speculator.model_result(query)
+        if result_text is not None:
+            tracing.annotate(speculated=True)
+        else:
+            # Launcher intents always go to the smallest model
+            model_name = router.route("action", query)[0]
+            start = time.perf_counter()
+            with models.checkout(model_name) as entry:
+                if entry is None:
+                    router.record("action", model_name, (time.perf_counter() - start) * 1000, "error")
+                    return jsonify({"actions": [], "error": f"Model failed to load: {model_error(model_name)}"})
+                with speculator.priority(), generation_slot(entry, model_name) as engine:
+                    if engine:
+                        # Model busy (another launcher, an /ask): batch with it rather than wait
+                        tracing.annotate(batched=True)
+                        import batching
+                        prompt, add_bos = batching.chat_prompt(entry.model, action_messages(query))
+                        stream = engine.submit(prompt, max_tokens=settings.get("action.max_tokens"),
+                                               temperature=settings.get("action.temperature"), add_bos=add_bos)
+                        result_text = tracing.drain_generation(stream, lambda piece: piece, model_name,
+                                                               prompt_tokens=stream.prompt_tokens).strip()
+                    else:
+                        # The launcher moved on while we waited for the model
+                        if is_superseded(generation):
+                            tracing.annotate(superseded=True)
+                            return jsonify({"actions": [], "superseded": True})
+                        # Gemma 2 instruct check
+                        stream = entry.model.create_chat_completion(
+                            messages=action_messages(query), max_tokens=settings.get("action.max_tokens"),
+                            temperature=settings.get("action.temperature"), stream=True
+                        )
+                        result_text = tracing.drain_generation(stream, lambda c: c['choices'][0]['delta'].get('content'), model_name).strip()
+            outcome = "ok" if speculation.action_lines(result_text) else "empty" if not result_text else "unparsed"
+            router.record("action", model_name, (time.perf_counter() - start) * 1000, outcome)
+        llm_output_log.info("Query: %s\nOutput:\n%s\n%s", query, result_text, '-' * 20)
+
         actions = []
         for line in result_text.split('\n'):
             line = line.strip()
@@ -421,7 +776,7 @@ SEARCH:[Query]
             elif "SEARCH:" in line:
                 q = line.split("SEARCH:")[1].strip()
                 # Basic navigation check
-                nav = get_navigation_result(q)
+                nav = navigation_result(q, query)
                 if nav:
                     actions.append({"type": "link", "url": nav['url'], "title": nav['title'], "description": nav['description']})
                 else:
@@ -430,19 +785,21 @@ SEARCH:[Query]
             
             elif "PERSON:" in line:
                 name = line.split("PERSON:")[1].strip()
-                res = get_person_result(name)
+                res = speculator.enrichment("PERSON", name, get_person_result)
                 if res: actions.append(res)
             
             elif "PLACE:" in line:
                 name = line.split("PLACE:")[1].strip()
-                res = get_place_result(name)
+                res = speculator.enrichment("PLACE", name, get_place_result)
                 if res: actions.append(res)
 
             elif "INSTALL:" in line:
-                app = line.split("INSTALL:")[1].strip()
-                meta = resolve_app_metadata(app)
-                website = meta.get('website') if meta else None
-                actions.append({"type": "install", "name": app, "website": website, "content": f"Install {app}"})
+                # "INSTALL:gimp, vlc and spotify" -> one install card per app, batch-installable together
+                value = line.split("INSTALL:")[1].strip()
+                for app in speculation.split_apps(value):
+                    meta = speculator.enrichment("INSTALL", app, resolve_app_metadata)
+                    website = meta.get('website') if meta else None
+                    actions.append({"type": "install", "name": app, "website": website, "content": f"Install {app}"})
 
             elif "OPEN:" in line:
                 url = line.split("OPEN:")[1].strip()
@@ -453,16 +810,17 @@ SEARCH:[Query]
     except Exception as e:
         return jsonify({"actions": [], "error": str(e)})
 
-@app.route('/install_plan', methods=['POST'])
-def install_plan_endpoint():
-    try: req = request.get_json(force=True)
-    except: return jsonify({"error": "Bad JSON"}), 400
-    
-    app_name = req.get('app_name', '').strip()
-    if not app_name: return jsonify({"error": "No app name"}), 400
-    
-    logging.info(f"Generating Install Plan for: {app_name}")
-    
+def get_package_catalog():
+    global package_catalog
+    with catalog_lock:
+        if package_catalog is None:
+            from package_catalog import PackageCatalog
+            package_catalog = PackageCatalog()
+            package_catalog.start()
+        return package_catalog
+
+def install_target_via_cli(app_name):
+    """Fallback when the catalog is empty: the original apt-cache/flatpak search probe."""
     # 1. APT CHECK (Debian/Ubuntu/Pop)
     try:
         # Search apt cache
@@ -471,13 +829,7 @@ def install_plan_endpoint():
         if res.returncode == 0 and res.stdout.strip():
             # Found exact or close match
             pkg_name = res.stdout.strip().split()[0] # Take first word of first line
-            return jsonify({
-                "method": "apt",
-                "description": f"Found '{pkg_name}' in system repositories",
-                "commands": [
-                    f"pkexec apt-get install -y {pkg_name}"
-                ]
-            })
+            return {"source": "apt", "id": pkg_name, "name": pkg_name}
     except Exception as e:
         logging.error(f"Apt check failed: {e}")
 
@@ -502,26 +854,123 @@ def install_plan_endpoint():
                     app_id = next((p for p in parts if '.' in p), None)
                 
                 if app_id:
-                    return jsonify({
-                        "method": "flatpak",
-                        "description": f"Found '{app_id}' in Flatpak",
-                        "commands": [
-                            f"flatpak install -y {app_id}"
-                        ]
-                    })
+                    return {"source": "flatpak", "id": app_id, "name": app_id}
     except Exception as e:
         logging.error(f"Flatpak check failed: {e}")
 
+    return None
+
+def resolve_install_target(app_name):
+    """Picks the package to install for app_name. Returns (entry or None, ranked candidates)."""
+    catalog = get_package_catalog()
+    candidates = catalog.search(app_name)
+    if not catalog.entries:
+        # No apt lists or appstream data indexed (or still building): ask the package tools directly
+        return install_target_via_cli(app_name), []
+
+    summary = [{k: c[k] for k in ("source", "id", "name", "summary", "score")} for c in candidates]
+    best = candidates[0] if candidates else None
+    if not best or best["score"] < settings.get("install.min_score"):
+        return None, summary
+    return best, summary
+
+@app.route('/install_plan', methods=['POST'])
+def install_plan_endpoint():
+    try: req = request.get_json(force=True)
+    except: return jsonify({"error": "Bad JSON"}), 400
+    
+    app_names = [n.strip() for n in req.get('app_names') or [] if isinstance(n, str) and n.strip()]
+    if app_names:
+        return install_batch_plan(app_names)
+
+    app_name = req.get('app_name', '').strip()
+    if not app_name: return jsonify({"error": "No app name"}), 400
+    
+    logging.info(f"Generating Install Plan for: {app_name}")
+    start = time.perf_counter()
+    from package_catalog import install_command
+    best, summary = resolve_install_target(app_name)
+    logging.info(f"Install plan lookup took {(time.perf_counter() - start) * 1000:.1f} ms ({len(summary)} candidates)")
+    if not best:
+        return jsonify({
+            "method": "failed",
+            "description": "Could not find package in apt or flatpak.",
+            "commands": [],
+            "candidates": summary
+        })
+
+    where = "system repositories" if best["source"] == "apt" else "Flatpak"
+    return jsonify({
+        "method": best["source"],
+        "description": f"Found '{best['id']}' in {where}",
+        "commands": [install_command(best)],
+        "candidates": summary
+    })
+
+def install_batch_plan(app_names):
+    """Resolves several apps at once and folds them into one apt transaction and one flatpak
+    invocation per remote, behind a single authentication prompt."""
+    from concurrent.futures import ThreadPoolExecutor
+    from package_catalog import batch_install_command
+
+    logging.info(f"Generating Batch Install Plan for: {app_names}")
+    start = time.perf_counter()
+    # Catalog lookups are in-process; the pool matters when falling back to the CLI probes
+    with ThreadPoolExecutor(max_workers=min(4, len(app_names))) as pool:
+        resolved = list(pool.map(resolve_install_target, app_names))
+
+    packages, unresolved, seen = [], [], set()
+    for app_name, (best, _) in zip(app_names, resolved):
+        if not best:
+            unresolved.append(app_name)
+            continue
+        if (best["source"], best["id"]) in seen: continue # "gimp, GIMP" -> one package
+        seen.add((best["source"], best["id"]))
+        packages.append({"app_name": app_name, "source": best["source"], "id": best["id"],
+                         "name": best.get("name", best["id"]), "remote": best.get("remote")})
+    logging.info(f"Batch install plan took {(time.perf_counter() - start) * 1000:.1f} ms "
+                 f"({len(packages)} resolved, {len(unresolved)} unresolved)")
+
+    if not packages:
+        return jsonify({
+            "method": "failed",
+            "description": "Could not find any of these apps in apt or flatpak.",
+            "commands": [],
+            "packages": [],
+            "unresolved": unresolved
+        })
+
+    n_apt = sum(1 for p in packages if p["source"] == "apt")
+    n_flatpak = len(packages) - n_apt
     return jsonify({
-        "method": "failed", 
-        "description": "Could not find package in apt or flatpak.",
-        "commands": []
+        "method": "batch",
+        "description": f"Installing {len(packages)} apps ({n_apt} apt, {n_flatpak} flatpak)",
+        "commands": [batch_install_command(packages)],
+        "packages": packages,
+        "unresolved": unresolved
     })
 
 def _startup_sequence():
+    # Pull the request-path imports in off the serving thread before the first /action needs them
+    import requests, simpleeval, calc_engine, shortcuts, context_builder, local_rag, batching
+    get_package_catalog()
+    get_chunk_cache()
+    get_sessions()
+    get_speculator()
+    get_entities().start()
+    get_navigation().start()
     time.sleep(2)
     ensure_model_loaded()
 
 if __name__ == '__main__':
+    if "--profile-startup" in sys.argv:
+        # Re-runs the brain under -X importtime up to the point where it would start serving
+        from startup_profile import profile
+        profile(os.path.abspath(__file__), ["--exit-before-serve"])
+        sys.exit(0)
+    milestone("app_ready")
+    if "--exit-before-serve" in sys.argv:
+        sys.exit(0)
+    tracing.start_writer()
     threading.Thread(target=_startup_sequence, daemon=True).start()
-    app.run(host='127.0.0.1', port=5500, threaded=True)
+    app.run(host='127.0.0.1', port=settings.get("brain.port"), threaded=True)
@@ -0,0 +1,247 @@
+"""Deterministic calculator for the launcher query line.
+
+Handles what people type into a launcher without needing a model:
+  - arithmetic: 2+2, (3^2 + 4^2)^0.5, sqrt(2)*pi, 12 x 7, 10 mod 3
+  - percentages: 15% of 80, 80 + 15%, 200 - 10%
+  - units: 5 km to mi, 70 f in c, 2.5 gib to mb, 90 km/h to mph
+  - currency: 100 usd to eur, €20 in pln (local rate table, see RATES_PATH)
+  - bases: 255 to hex, 0xff to dec, 0b1010 + 1, 42 in binary
+
+`evaluate(text)` returns None quickly for anything else: a cheap character pre-check rejects
+ordinary queries before any parsing. Expressions are evaluated on a restricted AST (numbers,
++ - * / // % **, a few math functions), never with eval(); exponents, factorials and integer
+results are capped so a query cannot pin the CPU, and evaluate() never raises.
+"""
+import ast
+import json
+import math
+import operator
+import os
+import re
+
+RATES_PATH = os.path.expanduser("~/.config/omni/exchange_rates.json")
+MAX_EXPONENT = 10000
+MAX_RESULT_DIGITS = 12 # Significant digits shown for non-integers
+MAX_INT_DIGITS = 21 # Longer exact integers are shown in scientific notation
+MAX_INT_BITS = 16384 # ~4900 digits; larger intermediate integers are refused
+MAX_BASE_BITS = 1024 # Largest integer shown in hex/binary/octal/decimal
+
+# Quick reject: a calc query has a digit and nothing but calculator-ish characters and words
+_CANDIDATE = re.compile(r"^[\w\s.,+\-*/^%()×÷$€£¥:!°]*\d[\w\s.,+\-*/^%()×÷$€£¥:!°]*$")
+
+# --- Arithmetic ---
+_BINARY = {ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul, ast.Div: operator.truediv,
+           ast.FloorDiv: operator.floordiv, ast.Mod: operator.mod, ast.Pow: operator.pow}
+_UNARY = {ast.UAdd: operator.pos, ast.USub: operator.neg}
+
+def _factorial(n):
+    if n != int(n) or n < 0 or n > 170: raise ValueError("factorial needs an integer from 0 to 170")
+    return math.factorial(int(n))
+
+FUNCTIONS = {
+    "sqrt": math.sqrt, "cbrt": lambda x: math.copysign(abs(x) ** (1 / 3), x), "abs": abs, "round": round,
+    "floor": math.floor, "ceil": math.ceil, "exp": math.exp, "ln": math.log, "log": math.log10,
+    "log2": math.log2, "sin": math.sin, "cos": math.cos, "tan": math.tan, "asin": math.asin,
+    "acos": math.acos, "atan": math.atan, "fact": _factorial, "factorial": _factorial,
+}
+CONSTANTS = {"pi": math.pi, "e": math.e, "tau": math.tau}
+
+def _eval(node):
+    if isinstance(node, ast.Expression): return _eval(node.body)
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+        return node.value
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY:
+        left, right = _eval(node.left), _eval(node.right)
+        if isinstance(node.op, ast.Pow) and (abs(right) > MAX_EXPONENT or (abs(left) > 1 and abs(right) * math.log10(abs(left)) > 4000)):
+            raise ValueError("exponent too large")
+        value = _BINARY[type(node.op)](left, right)
+        if isinstance(value, int) and value.bit_length() > MAX_INT_BITS: raise ValueError("number too large")
+        return value
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY:
+        return _UNARY[type(node.op)](_eval(node.operand))
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in FUNCTIONS and not node.keywords:
+        return FUNCTIONS[node.func.id](*[_eval(a) for a in node.args])
+    if isinstance(node, ast.Name) and node.id in CONSTANTS:
+        return CONSTANTS[node.id]
+    raise ValueError("unsupported expression")
+
+def _normalize(expr):
+    expr = expr.replace("×", "*").replace("÷", "/").replace("^", "**").replace(",", "")
+    expr = re.sub(r"(?<!^0)(?<![^\w.]0)(?<=[\d)])\s*x\s*(?=[\d(])", "*", expr) # 12 x 7, but not 0x1f
+    expr = re.sub(r"\bmod\b", "%", expr)
+    expr = re.sub(r"(\d+(?:\.\d+)?)\s*!", r"fact(\1)", expr)
+    return expr
+
+def arithmetic(expr):
+    """Value of a plain arithmetic expression; raises ValueError/SyntaxError/ArithmeticError."""
+    tree = ast.parse(_normalize(expr.strip()), mode="eval")
+    value = _eval(tree)
+    if isinstance(value, complex): raise ValueError("complex result")
+    return value
+
+def format_number(value):
+    """Display text for a result; raises ValueError for inf and nan."""
+    if isinstance(value, int):
+        if abs(value) < 10 ** MAX_INT_DIGITS: return str(value)
+        # Leading digits by integer division: str() of the whole number is slow, and refused past 4300 digits
+        exponent = int(math.log10(abs(value)))
+        if 10 ** exponent > abs(value): exponent -= 1
+        elif 10 ** (exponent + 1) <= abs(value): exponent += 1
+        digits = str(abs(value) // 10 ** (exponent - MAX_RESULT_DIGITS + 1))
+        mantissa = f"{digits[0]}.{digits[1:]}".rstrip("0").rstrip(".")
+        return f"{'-' if value < 0 else ''}{mantissa}e+{exponent}"
+    if not math.isfinite(value): raise ValueError("result is not a finite number")
+    if value.is_integer() and abs(value) < 10 ** MAX_RESULT_DIGITS:
+        return str(int(value))
+    text = f"{value:.{MAX_RESULT_DIGITS}g}"
+    return text if "e" in text else text.rstrip("0").rstrip(".")
+
+# --- Percentages ---
+PERCENT_OF = re.compile(r"^(.+?)\s*%\s*of\s+(.+)$", re.I)
+PERCENT_CHANGE = re.compile(r"^(.+?)\s*([+\-])\s*(\d+(?:\.\d+)?)\s*%$")
+
+def percentage(text):
+    m = PERCENT_OF.match(text)
+    if m: return arithmetic(m.group(1)) / 100 * arithmetic(m.group(2))
+    m = PERCENT_CHANGE.match(text)
+    if m:
+        base, pct = arithmetic(m.group(1)), float(m.group(3)) / 100
+        return base * (1 + pct) if m.group(2) == "+" else base * (1 - pct)
+    return None
+
+# --- Units: dimension -> {unit: factor to the base unit} ---
+UNITS = {
+    "length": {"m": 1, "km": 1000, "cm": 0.01, "mm": 0.001, "um": 1e-6, "nm": 1e-9, "mi": 1609.344,
+               "yd": 0.9144, "ft": 0.3048, "in": 0.0254, "nmi": 1852},
+    "mass": {"kg": 1, "g": 0.001, "mg": 1e-6, "t": 1000, "lb": 0.45359237, "oz": 0.028349523125, "st": 6.35029318},
+    "time": {"s": 1, "ms": 0.001, "us": 1e-6, "min": 60, "h": 3600, "day": 86400, "week": 604800, "year": 31557600},
+    "data": {"b": 1, "kb": 1e3, "mb": 1e6, "gb": 1e9, "tb": 1e12, "kib": 1024, "mib": 1024 ** 2,
+             "gib": 1024 ** 3, "tib": 1024 ** 4, "bit": 0.125},
+    "volume": {"l": 1, "ml": 0.001, "cl": 0.01, "m3": 1000, "gal": 3.785411784, "qt": 0.946352946,
+               "pt": 0.473176473, "cup": 0.2365882365, "floz": 0.0295735295625},
+    "speed": {"m/s": 1, "km/h": 1 / 3.6, "mph": 0.44704, "kn": 0.514444},
+    "area": {"m2": 1, "km2": 1e6, "cm2": 1e-4, "ha": 1e4, "acre": 4046.8564224, "ft2": 0.09290304},
+    "temperature": {"c": None, "f": None, "k": None},
+}
+ALIASES = {
+    "meter": "m", "meters": "m", "metre": "m", "metres": "m", "kilometer": "km", "kilometers": "km",
+    "kilometre": "km", "kilometres": "km", "centimeter": "cm", "centimeters": "cm", "millimeter": "mm",
+    "millimeters": "mm", "mile": "mi", "miles": "mi", "yard": "yd", "yards": "yd", "foot": "ft", "feet": "ft",
+    "inch": "in", "inches": "in", "kilogram": "kg", "kilograms": "kg", "kgs": "kg", "gram": "g", "grams": "g",
+    "pound": "lb", "pounds": "lb", "lbs": "lb", "ounce": "oz", "ounces": "oz", "ton": "t", "tons": "t",
+    "tonne": "t", "tonnes": "t", "stone": "st", "sec": "s", "second": "s", "seconds": "s", "mins": "min",
+    "minute": "min", "minutes": "min", "hr": "h", "hrs": "h", "hour": "h", "hours": "h", "days": "day",
+    "d": "day", "weeks": "week", "years": "year", "yr": "year", "byte": "b", "bytes": "b", "bits": "bit",
+    "liter": "l", "liters": "l", "litre": "l", "litres": "l", "gallon": "gal", "gallons": "gal",
+    "cups": "cup", "kmh": "km/h", "kph": "km/h", "knots": "kn", "celsius": "c", "°c": "c",
+    "fahrenheit": "f", "°f": "f", "kelvin": "k", "hectare": "ha", "hectares": "ha", "acres": "acre",
+}
+_DIMENSION = {unit: dim for dim, table in UNITS.items() for unit in table}
+CONVERSION = re.compile(r"^(.+?)\s+(?:to|in|as|into|->)\s+([a-z°/][a-z°/0-9]*)$", re.I)
+QUANTITY = re.compile(r"^(.*?)\s*([a-z°/][a-z°/0-9]*)$", re.I) # "2.5 gib", "90km/h"
+
+def _unit(name):
+    name = name.lower()
+    return ALIASES.get(name, name)
+
+def _temperature(value, src, dst):
+    kelvin = {"c": value + 273.15, "f": (value - 32) * 5 / 9 + 273.15, "k": value}[src]
+    return {"c": kelvin - 273.15, "f": (kelvin - 273.15) * 9 / 5 + 32, "k": kelvin}[dst]
+
+def convert_unit(value, src, dst):
+    dim = _DIMENSION.get(src)
+    if dim is None or _DIMENSION.get(dst) != dim: return None
+    if dim == "temperature": return _temperature(value, src, dst)
+    return value * UNITS[dim][src] / UNITS[dim][dst]
+
+# --- Currency ---
+# Fallback rates per 1 USD, used until ~/.config/omni/exchange_rates.json provides fresher ones
+DEFAULT_RATES = {
+    "updated": "2025-01-01",
+    "base": "USD",
+    "rates": {"USD": 1.0, "EUR": 0.96, "GBP": 0.80, "PLN": 4.10, "CHF": 0.90, "JPY": 157.0, "CNY": 7.30,
+              "CAD": 1.44, "AUD": 1.61, "SEK": 11.0, "NOK": 11.3, "DKK": 7.17, "CZK": 24.2, "INR": 85.6,
+              "BRL": 6.18, "MXN": 20.6, "KRW": 1470.0, "UAH": 42.0, "HUF": 396.0, "TRY": 35.4},
+}
+CURRENCY_SYMBOLS = {"$": "USD", "€": "EUR", "£": "GBP", "¥": "JPY", "zł": "PLN"}
+_rates = None
+_rates_mtime = None
+
+def load_rates(path=RATES_PATH):
+    """The local rate table; reloaded when the file changes. Format matches DEFAULT_RATES."""
+    global _rates, _rates_mtime
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        mtime = None
+    if _rates is None or mtime != _rates_mtime:
+        table = DEFAULT_RATES
+        if mtime is not None:
+            try:
+                with open(path) as f:
+                    loaded = json.load(f)
+                if isinstance(loaded.get("rates"), dict): table = loaded
+            except (OSError, ValueError):
+                pass
+        _rates, _rates_mtime = table, mtime
+    return _rates
+
+def convert_currency(value, src, dst):
+    table = load_rates()
+    rates = {k.upper(): v for k, v in table["rates"].items()}
+    src, dst = src.upper(), dst.upper()
+    if src not in rates or dst not in rates: return None
+    return value / rates[src] * rates[dst], table.get("updated")
+
+# --- Bases ---
+BASES = {"hex": 16, "hexadecimal": 16, "dec": 10, "decimal": 10, "bin": 2, "binary": 2, "oct": 8, "octal": 8}
+BASE_FORMAT = {16: hex, 2: bin, 8: oct, 10: str}
+
+def evaluate(text):
+    """{"expression", "result", "kind"} for a calculator query, else None (also for results
+    that are too large or not finite)."""
+    try: return _evaluate(text)
+    except (ValueError, SyntaxError, TypeError, ArithmeticError, RecursionError, MemoryError):
+        return None
+
+def _evaluate(text):
+    q = text.strip().rstrip("=").strip()
+    if not q or len(q) > 200 or not _CANDIDATE.match(q): return None
+    for prefix in ("calculate ", "what is ", "what's ", "solve ", "convert ", "= "):
+        if q.lower().startswith(prefix):
+            q = q[len(prefix):].strip()
+    if re.fullmatch(r"[\d\s.,]+", q): return None # A bare number is not a calculation
+
+    m = CONVERSION.match(q)
+    if m:
+        lhs, dst = m.group(1).strip(), m.group(2)
+        target_base = BASES.get(dst.lower())
+        if target_base:
+            value = arithmetic(lhs)
+            if isinstance(value, float) and not value.is_integer(): return None
+            value = int(value)
+            if value.bit_length() > MAX_BASE_BITS: return None
+            return {"expression": q, "result": BASE_FORMAT[target_base](value), "kind": "base"}
+        symbol = next((s for s in CURRENCY_SYMBOLS if lhs.startswith(s)), None)
+        if symbol: # "€20 in pln"
+            amount, src = lhs[len(symbol):], CURRENCY_SYMBOLS[symbol]
+        else:
+            quantity = QUANTITY.match(lhs)
+            if not quantity or not quantity.group(1): return None
+            amount, src = quantity.groups()
+        value = arithmetic(amount)
+        converted = convert_unit(value, _unit(src), _unit(dst))
+        if converted is not None:
+            return {"expression": q, "result": f"{format_number(converted)} {_unit(dst)}", "kind": "unit"}
+        money = convert_currency(value, src, dst)
+        if money:
+            return {"expression": q, "result": f"{format_number(round(money[0], 2))} {dst.upper()}",
+                    "kind": "currency", "rates_updated": money[1]}
+        return None
+
+    value = percentage(q)
+    kind = "percent"
+    if value is None:
+        value, kind = arithmetic(q.rstrip("%") if q.endswith("%") else q), "arithmetic"
+        if q.endswith("%"): value, kind = value / 100, "percent"
+    return {"expression": q, "result": format_number(value), "kind": kind}
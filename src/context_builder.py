@@ -0,0 +1,85 @@
+"""Prompt context assembly for /ask.
+
+Takes retrieved passages (web search results, local file chunks), ranks them by embedding
+similarity to the question, drops near-duplicates and packs the best ones into a token budget
+measured with the model's own tokenizer. Passages that do not fit whole are cut at a sentence
+boundary. The result is the smallest context that still carries the most relevant text, which
+is what keeps prefill short on CPU.
+"""
+import re
+
+DUPLICATE_OVERLAP = 0.8 # Word-set Jaccard above which two passages say the same thing
+MIN_PASSAGE_TOKENS = 24 # A tail shorter than this is not worth a "Source:" header
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+def _words(text):
+    return set(re.findall(r"\w+", text.lower()))
+
+def _dot(a, b):
+    return float(sum(x * y for x, y in zip(a, b)))
+
+def rank(query, passages, encode=None, query_vector=None):
+    """Passages sorted by cosine similarity to the query, each with a "score".
+    A passage may carry a precomputed "vector"; the rest are embedded in one batch together with
+    the query. Without an encoder the incoming order (the search engine's ranking) is kept."""
+    if not passages: return []
+    if encode is None:
+        return [dict(p, score=round(1 - i / len(passages), 3)) for i, p in enumerate(passages)]
+    missing = [p for p in passages if p.get("vector") is None]
+    texts = ([] if query_vector is not None else [query]) + [f"{p.get('title', '')}\n{p['text']}" for p in missing]
+    encoded = list(encode(texts)) if texts else []
+    q = query_vector if query_vector is not None else encoded.pop(0)
+    fresh = iter(encoded)
+    vectors = [p["vector"] if p.get("vector") is not None else next(fresh) for p in passages]
+    qn = _dot(q, q) ** 0.5 or 1.0
+    scored = []
+    for p, v in zip(passages, vectors):
+        p = {k: val for k, val in p.items() if k != "vector"}
+        p["score"] = round(_dot(q, v) / (qn * (_dot(v, v) ** 0.5 or 1.0)), 3)
+        scored.append(p)
+    return sorted(scored, key=lambda p: p["score"], reverse=True)
+
+def dedupe(passages):
+    """Drops passages whose words mostly repeat a higher-ranked one (mirrors, syndicated copies)."""
+    kept, seen = [], []
+    for p in passages:
+        words = _words(p["text"])
+        if not words: continue
+        if any(len(words & w) / len(words | w) >= DUPLICATE_OVERLAP for w in seen): continue
+        kept.append(p)
+        seen.append(words)
+    return kept
+
+def trim(text, budget, count_tokens):
+    """Longest run of leading sentences that fits in `budget` tokens ("" if none does)."""
+    if count_tokens(text) <= budget: return text
+    out = ""
+    for sentence in SENTENCE_END.split(text):
+        candidate = f"{out} {sentence}" if out else sentence
+        if count_tokens(candidate) > budget: break
+        out = candidate
+    return out
+
+def pack(passages, budget, count_tokens, render):
+    """Adds rendered passages in order until the token budget is spent.
+    `render(passage, text)` formats one passage; returns (blocks, tokens used)."""
+    blocks, used = [], 0
+    for p in passages:
+        header_tokens = count_tokens(render(p, ""))
+        room = budget - used - header_tokens
+        if room < MIN_PASSAGE_TOKENS: break
+        text = trim(p["text"], room, count_tokens)
+        if not text: continue
+        block = render(p, text)
+        blocks.append(block)
+        used += count_tokens(block)
+    return blocks, used
+
+def build(query, passages, budget, count_tokens, render, encode=None, query_vector=None, min_score=None):
+    """rank -> dedupe -> pack. Returns (blocks, stats)."""
+    ranked = rank(query, passages, encode, query_vector)
+    if min_score is not None:
+        ranked = [p for p in ranked if p["score"] >= min_score]
+    ranked = dedupe(ranked)
+    blocks, used = pack(ranked, budget, count_tokens, render)
+    return blocks, {"candidates": len(passages), "unique": len(ranked), "kept": len(blocks), "tokens": used}
@@ -0,0 +1,341 @@
+"""Local store of person and place summaries for the launcher's rich cards.
+
+PERSON:/PLACE: lookups used to go to SearXNG (or Wikipedia's REST API) every time, and their cards
+had no image. This store keeps titles, summaries, coordinates and thumbnails in a SQLite
+database with an FTS5 index on titles. A name it knows resolves in a few milliseconds without
+the network. It is filled from three sources:
+  - past lookups: every result the brain fetched, plus the query as an alias for it
+    ("obama" -> Barack Obama). Speculative fetches for half-typed queries add no alias.
+  - offline dumps, via `python3 src/entity_store.py <dump>`. Accepted formats are
+    Wikipedia's abstract dump (enwiki-latest-abstract.xml.gz) and JSON lines of REST summary
+    objects ({"title", "extract", "content_urls", "thumbnail", "coordinates"}).
+  - the refresher: a daemon thread that re-fetches the Wikipedia summary of entries that were
+    looked up and are missing an image or are older than entities.max_age_days. The most used
+    entries go first, REFRESH_BATCH per REFRESH_INTERVAL.
+
+A lookup matches an alias or the exact title first, with any "(disambiguation)" suffix
+ignored. Otherwise FTS candidates are tried. A candidate is accepted when its title contains
+every query word plus at most one more, and it is the clear favourite by past hits. A miss
+returns None, and the caller goes to the network.
+"""
+import gzip
+import json
+import logging
+import os
+import re
+import threading
+import time
+from urllib.parse import unquote
+
+REFRESH_INTERVAL = 60 # Seconds between refresher passes (a new entry wakes it early)
+REFRESH_BATCH = 20 # Summaries fetched per pass
+FTS_CANDIDATES = 10
+IMPORT_BATCH = 5000 # Rows per transaction when importing a dump
+KINDS = ("person", "place")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entities (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL DEFAULT '', -- 'person', 'place', or '' when a dump does not say
+    key TEXT NOT NULL,
+    title TEXT NOT NULL,
+    description TEXT,
+    address TEXT,
+    url TEXT,
+    image TEXT,
+    latitude REAL,
+    longitude REAL,
+    source TEXT NOT NULL, -- 'lookup' or 'dump'
+    fetched REAL NOT NULL DEFAULT 0, -- When the data was last fetched
+    checked REAL NOT NULL DEFAULT 0, -- When the refresher last tried
+    hits INTEGER NOT NULL DEFAULT 0,
+    last_hit REAL NOT NULL DEFAULT 0,
+    UNIQUE (kind, key)
+);
+CREATE INDEX IF NOT EXISTS entities_hits ON entities (hits) WHERE hits > 0 OR source = 'lookup';
+CREATE TABLE IF NOT EXISTS aliases (
+    kind TEXT NOT NULL,
+    alias TEXT NOT NULL,
+    entity INTEGER NOT NULL REFERENCES entities (id) ON DELETE CASCADE,
+    PRIMARY KEY (kind, alias)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS entities_fts USING fts5(
+    title, content='entities', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS entities_ai AFTER INSERT ON entities BEGIN
+    INSERT INTO entities_fts (rowid, title) VALUES (new.id, new.title);
+END;
+CREATE TRIGGER IF NOT EXISTS entities_ad AFTER DELETE ON entities BEGIN
+    INSERT INTO entities_fts (entities_fts, rowid, title) VALUES ('delete', old.id, old.title);
+END;
+CREATE TRIGGER IF NOT EXISTS entities_au AFTER UPDATE OF title ON entities BEGIN
+    INSERT INTO entities_fts (entities_fts, rowid, title) VALUES ('delete', old.id, old.title);
+    INSERT INTO entities_fts (rowid, title) VALUES (new.id, new.title);
+END;
+"""
+FIELDS = ("title", "description", "address", "url", "image", "latitude", "longitude")
+
+def key(text):
+    """Match key: lowercased words without punctuation, a " - Wikipedia" suffix or a
+    "(disambiguation)" part."""
+    text = re.sub(r"\s+[-–|]\s+Wikipedia$", "", text.strip(), flags=re.I)
+    text = re.sub(r"\s*\(disambiguation\)", " ", text, flags=re.I)
+    return " ".join(re.sub(r"[^\w\s]", " ", text.lower()).split())
+
+def wikipedia_page(url):
+    """Page title from a Wikipedia article URL, else None."""
+    m = re.match(r"https?://[a-z-]+\.(?:m\.)?wikipedia\.org/wiki/([^?#]+)", url or "")
+    return unquote(m.group(1)).replace("_", " ") if m else None
+
+def page_title(title, url):
+    """Wikipedia article to refresh an entry from: the one its URL points at, else its title
+    without a trailing " - Site name"."""
+    return wikipedia_page(url) or re.sub(r"\s+[-–|]\s+[^-–|]+$", "", title)
+
+def from_summary(data):
+    """Entity fields from a Wikipedia REST summary object (or one shaped like it)."""
+    if not isinstance(data, dict) or not data.get("title"): return None
+    coords = data.get("coordinates") or {}
+    return {
+        "title": data["title"],
+        "description": data.get("extract") or data.get("description"),
+        "url": data.get("url") or (data.get("content_urls") or {}).get("desktop", {}).get("page"),
+        "image": data.get("image") or (data.get("thumbnail") or {}).get("source"),
+        "latitude": data.get("latitude", coords.get("lat")),
+        "longitude": data.get("longitude", coords.get("lon")),
+    }
+
+def _open_dump(path):
+    return gzip.open(path, "rb") if path.endswith(".gz") else open(path, "rb")
+
+def read_abstract_dump(path):
+    """Yields entity fields from a Wikipedia abstract dump (<doc><title>Wikipedia: X</title>...)."""
+    import xml.etree.ElementTree as ET
+    with _open_dump(path) as f:
+        for _, elem in ET.iterparse(f):
+            if elem.tag != "doc": continue
+            title = (elem.findtext("title") or "").strip()
+            if title.startswith("Wikipedia: "): title = title[11:]
+            abstract = (elem.findtext("abstract") or "").strip()
+            # Redirect and list pages come through with empty or markup-only abstracts
+            if title and len(abstract) > 20 and not abstract.startswith(("|", "{")):
+                yield {"title": title, "description": abstract, "url": (elem.findtext("url") or "").strip() or None}
+            elem.clear()
+
+def read_jsonl_dump(path):
+    """Yields entity fields (and "kind" when given) from JSON lines of REST summary objects."""
+    with _open_dump(path) as f:
+        for line in f:
+            try: data = json.loads(line)
+            except ValueError: continue
+            entity = from_summary(data)
+            if entity:
+                if data.get("kind") in KINDS: entity["kind"] = data["kind"]
+                yield entity
+
+class EntityStore:
+    def __init__(self, path, fetch=None, max_age_days=None):
+        """fetch(title) -> Wikipedia REST summary dict or None, used by the refresher.
+        max_age_days: callable returning the refresh age, read on every pass."""
+        self.path = path
+        self.fetch = fetch
+        self.max_age_days = max_age_days or (lambda: 30)
+        self.lock = threading.Lock()
+        self.conn = None
+        self.counts = {"hit": 0, "miss": 0, "remembered": 0, "refreshed": 0, "refresh_failed": 0}
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _db(self):
+        """The shared connection, opened (and the schema created) on first use. Call under self.lock."""
+        if self.conn is None:
+            import sqlite3
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+            conn.row_factory = sqlite3.Row
+            # WAL so an import from the command line does not block the brain's reads
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            conn.executescript(SCHEMA)
+            self.conn = conn
+        return self.conn
+
+    # --- Lookup ---
+    @staticmethod
+    def _kind_filter(kind):
+        # Untyped dump entries serve either kind, except that nothing with coordinates is a person
+        coords = "1" if kind == "place" else "latitude IS NULL"
+        return f"(e.kind = ? OR (e.kind = '' AND {coords}))"
+
+    def _find(self, db, kind, k):
+        row = db.execute("SELECT e.* FROM aliases a JOIN entities e ON e.id = a.entity "
+                         "WHERE a.kind = ? AND a.alias = ?", (kind, k)).fetchone()
+        if row: return row, False
+        row = db.execute(f"SELECT e.* FROM entities e WHERE e.key = ? AND {self._kind_filter(kind)} "
+                         "ORDER BY e.kind = '', e.hits DESC LIMIT 1", (k, kind)).fetchone()
+        if row: return row, False
+        words = k.split()
+        if not words or len(k) < 3: return None, False
+        match = " ".join(f'"{w}"' for w in words)
+        rows = db.execute(f"SELECT e.* FROM entities_fts f JOIN entities e ON e.id = f.rowid "
+                          f"WHERE entities_fts MATCH ? AND {self._kind_filter(kind)} ORDER BY bm25(entities_fts) LIMIT ?",
+                          (match, kind, FTS_CANDIDATES)).fetchall()
+        # Every query word in the title and at most one more: "obama" finds "Barack Obama",
+        # "john" does not find "John Lennon" unless he is the clear favourite
+        close = sorted((r for r in rows if set(words) <= set(r["key"].split()) and len(r["key"].split()) - len(words) <= 1),
+                       key=lambda r: -r["hits"])
+        if close and (len(close) == 1 or close[0]["hits"] > close[1]["hits"]):
+            return close[0], True
+        return None, False
+
+    def lookup(self, kind, query):
+        """The stored result for a PERSON/PLACE query, shaped like a live lookup, or None."""
+        k = key(query)
+        if not k: return None
+        with self.lock:
+            try:
+                db = self._db()
+                row, fuzzy = self._find(db, kind, k)
+                if row:
+                    with db:
+                        db.execute("UPDATE entities SET hits = hits + 1, last_hit = ? WHERE id = ?", (time.time(), row["id"]))
+                        # Next time this query is an exact hit
+                        if fuzzy: db.execute("INSERT OR IGNORE INTO aliases VALUES (?, ?, ?)", (kind, k, row["id"]))
+            except Exception as e:
+                logging.warning(f"Entity store: lookup failed: {e}")
+                row = None
+            self.counts["hit" if row else "miss"] += 1
+        return self._result(kind, row) if row else None
+
+    @staticmethod
+    def _result(kind, row):
+        if kind == "place":
+            return {"type": "place", "name": row["title"], "description": row["description"],
+                    "address": row["address"] or "", "latitude": row["latitude"], "longitude": row["longitude"],
+                    "url": row["url"], "image": row["image"]}
+        return {"type": "person", "name": row["title"], "description": row["description"] or "",
+                "url": row["url"], "image": row["image"]}
+
+    # --- Filling ---
+    def _upsert(self, db, kind, fields, source, now):
+        """Inserts or updates one entity; a dump never overwrites what a lookup fetched. Returns its id."""
+        fields = {f: fields.get(f) for f in FIELDS}
+        k = key(fields["title"] or "")
+        if not k: return None
+        db.execute(f"INSERT INTO entities (kind, key, {', '.join(FIELDS)}, source, fetched) "
+                   f"VALUES (?, ?, {', '.join('?' * len(FIELDS))}, ?, ?) "
+                   f"ON CONFLICT (kind, key) DO UPDATE SET "
+                   + ", ".join(f"{f} = COALESCE(excluded.{f}, {f})" for f in FIELDS)
+                   + ", source = excluded.source, fetched = excluded.fetched "
+                   "WHERE entities.source = 'dump' OR excluded.source = 'lookup'",
+                   (kind, k, *fields.values(), source, now))
+        return db.execute("SELECT id FROM entities WHERE kind = ? AND key = ?", (kind, k)).fetchone()[0]
+
+    def remember(self, kind, query, result, alias=True):
+        """Stores a live PERSON/PLACE result, with the query as an alias for it unless alias is
+        False (the query may be a half-typed prefix)."""
+        fields = {"title": result.get("name"), "description": result.get("description") or None,
+                  "address": result.get("address") or None, "url": result.get("url"), "image": result.get("image"),
+                  "latitude": result.get("latitude"), "longitude": result.get("longitude")}
+        with self.lock:
+            try:
+                db = self._db()
+                with db:
+                    entity = self._upsert(db, kind, fields, "lookup", time.time())
+                    if entity is None or not alias: return
+                    db.execute("INSERT OR REPLACE INTO aliases VALUES (?, ?, ?)", (kind, key(query), entity))
+                self.counts["remembered"] += 1
+            except Exception as e:
+                logging.warning(f"Entity store: could not store {query!r}: {e}")
+                return
+        if not result.get("image"): self._wake.set() # Let the refresher find its thumbnail now
+
+    def import_dump(self, path, kind=""):
+        """Loads an abstract dump (.xml[.gz]) or REST summary JSON lines (.jsonl[.gz]). Returns the row count."""
+        reader = read_abstract_dump if re.search(r"\.xml(\.gz)?$", path) else read_jsonl_dump
+        count, now = 0, time.time()
+        with self.lock:
+            db = self._db()
+            batch = []
+            def flush():
+                with db:
+                    for entity in batch:
+                        self._upsert(db, entity.pop("kind", kind), entity, "dump", now)
+                batch.clear()
+            for entity in reader(path):
+                batch.append(entity)
+                count += 1
+                if len(batch) >= IMPORT_BATCH:
+                    flush()
+                    logging.info(f"Entity store: {count} imported")
+            flush()
+        return count
+
+    # --- Refreshing ---
+    def due(self, limit=REFRESH_BATCH):
+        """Entries worth re-fetching: looked up at least once, and missing an image or stale. Age
+        counts from the last fetch or refresher attempt, so a failed refresh waits a full period."""
+        stale = time.time() - self.max_age_days() * 86400
+        with self.lock:
+            return [dict(r) for r in self._db().execute(
+                "SELECT id, kind, title, url FROM entities WHERE (hits > 0 OR source = 'lookup') "
+                "AND (MAX(fetched, checked) < ? OR (image IS NULL AND checked = 0)) ORDER BY hits DESC, last_hit DESC LIMIT ?",
+                (stale, limit))]
+
+    def refresh_once(self):
+        """One refresher pass. Returns the number of entries updated."""
+        updated = 0
+        for entity in self.due():
+            if self._stop.is_set(): break
+            try: fields = from_summary(self.fetch(page_title(entity["title"], entity["url"])))
+            except Exception as e:
+                logging.debug(f"Entity store: refreshing {entity['title']!r} failed: {e}")
+                fields = None
+            now = time.time()
+            with self.lock:
+                db = self._db()
+                with db:
+                    if fields:
+                        # Keep the stored title: it is what the key and aliases were built from
+                        db.execute("UPDATE entities SET " + ", ".join(f"{f} = COALESCE(?, {f})" for f in FIELDS[1:])
+                                   + ", fetched = ?, checked = ? WHERE id = ?",
+                                   (*(fields.get(f) for f in FIELDS[1:]), now, now, entity["id"]))
+                    else:
+                        db.execute("UPDATE entities SET checked = ? WHERE id = ?", (now, entity["id"]))
+                self.counts["refreshed" if fields else "refresh_failed"] += 1
+            updated += bool(fields)
+        return updated
+
+    def start(self):
+        """Runs the refresher on a daemon thread (only when a fetch function was given)."""
+        if self._thread or not self.fetch: return
+        def loop():
+            while not self._stop.is_set():
+                try: self.refresh_once()
+                except Exception as e: logging.error(f"Entity store refresh failed: {e}")
+                self._wake.wait(REFRESH_INTERVAL)
+                self._wake.clear()
+        self._thread = threading.Thread(target=loop, daemon=True, name="omni-entity-refresh")
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counts)
+
+if __name__ == "__main__":
+    import argparse
+    import settings
+    parser = argparse.ArgumentParser(description="Fill the local person/place store from an offline dump.")
+    parser.add_argument("dump", help="enwiki-latest-abstract.xml.gz, or JSON lines of Wikipedia REST summaries")
+    parser.add_argument("--kind", choices=KINDS, default="", help="Kind of every entry (default: from the data)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    store = EntityStore(settings.get("entities.path"))
+    start = time.perf_counter()
+    n = store.import_dump(args.dump, args.kind)
+    print(f"{n} entries imported into {store.path} in {time.perf_counter() - start:.1f} s")
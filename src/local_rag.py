@@ -0,0 +1,139 @@
+"""Retrieval of local file passages for /ask.
+
+The LanceDB "files" table indexes whole files, so retrieval runs in two steps: the table picks
+the few files nearest to the question, then those files are split into overlapping word chunks
+and the chunks are ranked against the question. Chunk text and chunk embeddings are cached per
+file and reused until the file's size or mtime changes, so a warm query costs one query
+embedding, one table search and a few stat() calls. A cold query embeds at most MAX_COLD_CHUNKS
+chunks while the question waits; files past that are embedded in the background and used from
+the next question on. context_builder then packs the best chunks into the local-context token
+budget.
+"""
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+CANDIDATE_FILES = 5 # Files taken from the table per question
+MAX_DISTANCE = 1.1 # Same cut-off /search uses for a relevant file
+CHUNK_WORDS = 120
+CHUNK_OVERLAP = 20
+MAX_FILE_BYTES = 512 * 1024 # Larger files are read only up to here
+MAX_CHUNKS_PER_FILE = 64
+CACHE_FILES = 256
+MAX_COLD_CHUNKS = 64 # Chunks embedded per question; colder files are warmed in the background
+
+def read_text(path):
+    """Decoded file text, or None for binaries and unreadable files."""
+    try:
+        with open(path, "rb") as f:
+            data = f.read(MAX_FILE_BYTES)
+    except OSError:
+        return None
+    if b"\0" in data[:4096]: return None
+    return data.decode("utf-8", errors="replace")
+
+def chunk(text, words=CHUNK_WORDS, overlap=CHUNK_OVERLAP):
+    tokens = text.split()
+    step = max(1, words - overlap)
+    chunks = []
+    for start in range(0, len(tokens), step):
+        chunks.append(" ".join(tokens[start:start + words]))
+        if start + words >= len(tokens) or len(chunks) >= MAX_CHUNKS_PER_FILE: break
+    return chunks
+
+class ChunkCache:
+    """path -> chunk texts and their embeddings, valid while (size, mtime) is unchanged."""
+
+    def __init__(self, max_files=CACHE_FILES):
+        self.max_files = max_files
+        self.files = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.warming = set()
+
+    def current(self, path):
+        """Cached entries for the file while they are valid, else None; never reads or embeds."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return []
+        with self.lock:
+            cached = self.files.get(path)
+            if cached and cached[0] == (st.st_size, int(st.st_mtime)):
+                self.files.move_to_end(path)
+                self.hits += 1
+                return cached[1]
+        return None
+
+    def get(self, path, encode, max_chunks=None):
+        """[(chunk text, vector)] for the file; [] when it has no readable text. None, with nothing
+        embedded, when the file is not cached and has more than max_chunks chunks."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return []
+        key = (st.st_size, int(st.st_mtime))
+        with self.lock:
+            cached = self.files.get(path)
+            if cached and cached[0] == key:
+                self.files.move_to_end(path)
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+        text = read_text(path)
+        chunks = chunk(text) if text else []
+        if max_chunks is not None and len(chunks) > max_chunks: return None
+        entries = list(zip(chunks, encode(chunks))) if chunks else []
+        with self.lock:
+            self.files[path] = (key, entries)
+            self.files.move_to_end(path)
+            while len(self.files) > self.max_files: self.files.popitem(last=False)
+        return entries
+
+    def warm(self, paths, encode):
+        """Chunks and embeds the files on a background thread, for the next question that needs them."""
+        with self.lock:
+            paths = [path for path in paths if path not in self.warming]
+            self.warming.update(paths)
+        if not paths: return
+
+        def run():
+            for path in paths:
+                try: self.get(path, encode)
+                except Exception as e: logging.warning(f"Chunk cache: could not warm {path}: {e}")
+                finally:
+                    with self.lock: self.warming.discard(path)
+
+        threading.Thread(target=run, daemon=True, name="chunk-warm").start()
+
+    def stats(self):
+        with self.lock:
+            return {"files": len(self.files), "hits": self.hits, "misses": self.misses,
+                    "warming": len(self.warming)}
+
+def nearest_files(table, vector, limit=CANDIDATE_FILES, max_distance=MAX_DISTANCE):
+    """(filename, path) of the closest files in the LanceDB table."""
+    res = table.search(vector).limit(limit).to_pandas()
+    if res.empty: return []
+    return [(row['filename'], row['path']) for _, row in res.iterrows() if row.get('_distance', 0) < max_distance]
+
+def passages(files, cache, encode, max_cold_chunks=MAX_COLD_CHUNKS):
+    """context_builder passages (with precomputed vectors) for every chunk of the given files.
+    Uncached files are embedded here while max_cold_chunks lasts; the rest are left out of this
+    answer and warmed in the background."""
+    out, cold = [], []
+    budget = max_cold_chunks
+    for filename, path in files:
+        entries = cache.current(path)
+        if entries is None:
+            entries = None if path in cache.warming else cache.get(path, encode, max_chunks=budget)
+            if entries is None:
+                cold.append(path)
+                continue
+            budget -= len(entries)
+        for text, vector in entries:
+            out.append({"title": filename, "url": path, "text": text, "vector": vector})
+    if cold: cache.warm(cold, encode)
+    return out
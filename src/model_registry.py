@@ -0,0 +1,236 @@
+"""Registry of local GGUF models and the router that picks one per request.
+
+Models come from the "models.registry" setting, {name: {"path", "n_ctx", "n_threads",
+"n_gpu_layers", "memory_mb"}}, where every field but "path" falls back to the model.* settings.
+With no registry configured there is a single model, "default", made from model.*, and every
+route uses it. Models are ordered by size (memory_mb, else the file size) into tiers.
+
+Routing: launcher intents (/action, speculation) go to the smallest model. /ask goes to the
+largest when the question is long, open-ended ("why ...", "explain ...") or expects a long
+answer, and to the middle tier otherwise. With two models the middle tier is the larger one.
+
+Loading: a model loads on first use and gets its own lock. Loaded models are kept within
+"models.memory_mb" (estimated as memory_mb, else file size times MEMORY_OVERHEAD for the KV
+cache and buffers). Loading evicts the least recently used idle models first. A model in use is
+never evicted, so a load can briefly exceed the budget; that is logged, not refused.
+
+Tracking: every routed generation is counted per route and model, with its latency and a
+quality outcome:
+  - ok: usable output
+  - truncated: hit max_tokens
+  - empty
+  - unparsed: an action with no action line
+  - error
+"""
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import settings
+import tracing
+
+MEMORY_OVERHEAD = 1.25 # Loaded size relative to the GGUF file: KV cache, scratch buffers
+DEFAULT_NAME = "default"
+OPEN_ENDED = re.compile(r"^(?:why|how|explain|describe|compare|summari[sz]e|write|draft|tell me about|"
+                        r"what are the (?:pros|differences)|help me)\b", re.I)
+SMALL_ROUTES = ("action", "speculate")
+
+def specs():
+    """name -> spec for the configured models, smallest first."""
+    base = {"n_ctx": settings.get("model.n_ctx"), "n_threads": settings.get("model.n_threads"),
+            "n_gpu_layers": settings.get("model.n_gpu_layers")}
+    registry = settings.get("models.registry") or {DEFAULT_NAME: {"path": settings.get("model.path")}}
+    out = {}
+    for name, spec in registry.items():
+        if not isinstance(spec, dict) or not spec.get("path"):
+            logging.warning(f"Model registry: {name!r} has no path, skipped")
+            continue
+        spec = dict(base, **spec, name=name)
+        spec["path"] = os.path.expanduser(spec["path"])
+        spec["bytes"] = int(spec["memory_mb"] * 1024 * 1024) if spec.get("memory_mb") else _file_bytes(spec["path"])
+        out[name] = spec
+    return OrderedDict(sorted(out.items(), key=lambda item: item[1]["bytes"]))
+
+def _file_bytes(path):
+    try: return int(os.path.getsize(path) * MEMORY_OVERHEAD)
+    except OSError: return 0
+
+class Loaded:
+    def __init__(self, name, model, nbytes):
+        self.name = name
+        self.model = model
+        self.bytes = nbytes
+        self.lock = threading.Lock() # Held around every direct generation on this model
+        self.batch = None # batching.BatchEngine for requests that find the lock taken
+        self.users = 0
+
+class ModelRegistry:
+    def __init__(self, load_model):
+        """load_model(spec) -> model; raises when the model cannot be loaded."""
+        self.load_model = load_model
+        self.loaded = OrderedDict() # name -> Loaded, least recently used first
+        self.lock = threading.Lock()
+        self.load_locks = {}
+        self.errors = {} # name -> last load error
+        self.loads = 0
+        self.evictions = 0
+
+    def tiers(self):
+        return list(specs())
+
+    @contextmanager
+    def borrow(self, name):
+        """Like checkout, but yields None instead of loading (for work that must not wait)."""
+        with self.lock:
+            entry = self.loaded.get(name)
+            if entry is not None: entry.users += 1
+        try: yield entry
+        finally:
+            if entry is not None:
+                with self.lock: entry.users -= 1
+
+    def any_loaded(self):
+        with self.lock:
+            return next(reversed(self.loaded.values()), None)
+
+    @contextmanager
+    def checkout(self, name):
+        """Yields the Loaded entry for `name` (loading it if needed), or None when it fails to load.
+        The model cannot be evicted while checked out."""
+        entry = self._get(name)
+        try: yield entry
+        finally:
+            if entry is not None:
+                with self.lock: entry.users -= 1
+
+    def _get(self, name):
+        with self.lock:
+            entry = self.loaded.get(name)
+            if entry is not None:
+                entry.users += 1
+                self.loaded.move_to_end(name)
+                return entry
+            load_lock = self.load_locks.setdefault(name, threading.Lock())
+        with load_lock:
+            with self.lock:
+                entry = self.loaded.get(name)
+                if entry is not None:
+                    entry.users += 1
+                    return entry
+            spec = specs().get(name)
+            if spec is None:
+                self.errors[name] = f"Model {name!r} is not in the registry"
+                return None
+            self._make_room(spec["bytes"])
+            logging.info(f"Model registry: loading {name} ({os.path.basename(spec['path'])})")
+            start = time.perf_counter()
+            try:
+                model = self.load_model(spec)
+            except Exception as e:
+                logging.error(f"Model registry: loading {name} failed: {e}")
+                self.errors[name] = str(e)
+                return None
+            tracing.metrics.observe("omni_model_load_duration_ms", (time.perf_counter() - start) * 1000, model=name)
+            self.errors.pop(name, None)
+            entry = Loaded(name, model, spec["bytes"])
+            entry.users = 1
+            with self.lock:
+                self.loaded[name] = entry
+                self.loads += 1
+            return entry
+
+    def _make_room(self, needed):
+        budget = settings.get("models.memory_mb") * 1024 * 1024
+        configured = specs()
+        evicted = []
+        with self.lock:
+            # Models dropped from the registry go first, then the least recently used
+            victims = sorted((e for e in self.loaded.values() if e.users == 0),
+                             key=lambda e: (e.name in configured, list(self.loaded).index(e.name)))
+            held = sum(e.bytes for e in self.loaded.values())
+            for entry in victims:
+                if held + needed <= budget and entry.name in configured: break
+                del self.loaded[entry.name]
+                held -= entry.bytes
+                self.evictions += 1
+                evicted.append(entry)
+        # Stopping a batch engine joins its thread: done after the lock so checkouts of other models go on
+        for entry in evicted:
+            logging.info(f"Model registry: evicted {entry.name}")
+            if entry.batch: entry.batch.stop()
+            close = getattr(entry.model, "close", None)
+            if close:
+                try: close()
+                except Exception: pass
+        if held + needed > budget:
+            logging.warning(f"Model registry: {round((held + needed) / 2**20)} MB in use exceeds the "
+                            f"{round(budget / 2**20)} MB budget (models in use cannot be evicted)")
+
+    def preload(self):
+        """Loads models smallest first while they fit the budget without evicting anything."""
+        budget = settings.get("models.memory_mb") * 1024 * 1024
+        held = 0
+        for i, (name, spec) in enumerate(specs().items()):
+            if i and held + spec["bytes"] > budget: break
+            with self.checkout(name) as entry:
+                if entry is None: break
+                held += entry.bytes
+
+    def stats(self):
+        with self.lock:
+            loaded = {e.name: {"mb": round(e.bytes / 2**20, 1), "in_use": e.users,
+                               "batch": e.batch.stats() if e.batch else None} for e in self.loaded.values()}
+            return {"tiers": self.tiers(), "loaded": loaded, "budget_mb": settings.get("models.memory_mb"),
+                    "loads": self.loads, "evictions": self.evictions, "errors": dict(self.errors)}
+
+class Router:
+    def __init__(self, registry):
+        self.registry = registry
+        self.lock = threading.Lock()
+        self.routes = {} # (route, model) -> {"latency": Histogram, outcome: count}
+
+    def expected_tokens(self, route, query, requested=None):
+        """Expected answer length: what the caller asked for, else by route and intent."""
+        if requested: return requested
+        if route in SMALL_ROUTES: return settings.get("action.max_tokens")
+        return settings.get("ask.max_tokens") if OPEN_ENDED.match(query.strip()) else settings.get("router.short_answer_tokens")
+
+    def route(self, route, query, requested_tokens=None):
+        """(model name, tier) for one request."""
+        tiers = self.registry.tiers() or [DEFAULT_NAME]
+        expected = self.expected_tokens(route, query, requested_tokens)
+        if route in SMALL_ROUTES:
+            tier = "small"
+        elif (len(query.split()) >= settings.get("router.long_query_words") or OPEN_ENDED.match(query.strip())
+              or expected >= settings.get("router.long_answer_tokens")):
+            tier = "large"
+        else:
+            tier = "medium"
+        name = {"small": tiers[0], "medium": tiers[len(tiers) // 2], "large": tiers[-1]}[tier]
+        tracing.annotate(model=name, model_tier=tier, expected_tokens=expected)
+        return name, tier
+
+    def record(self, route, model, ms, outcome):
+        tracing.metrics.observe("omni_route_duration_ms", ms, route=route, model=model)
+        tracing.metrics.inc("omni_route_total", route=route, model=model, outcome=outcome)
+        with self.lock:
+            entry = self.routes.setdefault((route, model), {"latency": tracing.Histogram(tracing.LATENCY_BUCKETS_MS)})
+            entry["latency"].observe(ms)
+            entry[outcome] = entry.get(outcome, 0) + 1
+
+    def stats(self):
+        """Per route and model: request count, latency percentiles and the share of ok outcomes."""
+        out = {}
+        with self.lock:
+            for (route, model), entry in sorted(self.routes.items()):
+                hist = entry["latency"]
+                outcomes = {k: v for k, v in entry.items() if k != "latency"}
+                out.setdefault(route, {})[model] = {
+                    "n": hist.count, "p50_ms": hist.quantile(0.5), "p95_ms": hist.quantile(0.95),
+                    "outcomes": outcomes, "ok_rate": round(outcomes.get("ok", 0) / hist.count, 3) if hist.count else None,
+                }
+        return out
@@ -0,0 +1,312 @@
+"""In-process index of sites and pages for SEARCH: actions.
+
+A SEARCH: line used to cost a SearXNG round trip just to find the first URL for "github" or
+"python docs". This index answers those from what is already on disk:
+  - browser history and bookmarks: Firefox's places.sqlite and the History/Bookmarks files of
+    Chromium-based browsers. Each file is copied before it is read, because the browser keeps
+    it locked.
+  - past navigations: links the user opened from the launcher, reported through /navigated and
+    kept in LEARNED_PATH. A query opened before goes straight to the same URL.
+
+Every host becomes a site entry, the root URL weighted by all visits to that host. Often visited
+pages become page entries. A lookup matches each query word as a prefix of an entry's host
+labels or title words, using bisect over a sorted token list. When nothing matches, a
+single-word query is matched fuzzily against site names ("githib" -> github). Matches on the
+host beat matches on the title, sites beat pages, and visits, typed visits and bookmarks break
+ties. On a miss the caller asks SearXNG.
+
+The index is rebuilt in the background when a source file changes (see start()), as
+package_catalog does for the package lists.
+"""
+import bisect
+import glob
+import json
+import logging
+import math
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from difflib import SequenceMatcher
+from urllib.parse import urlsplit
+
+HOME = os.path.expanduser("~")
+FIREFOX_GLOBS = [f"{HOME}/.mozilla/firefox/*/places.sqlite",
+                 f"{HOME}/snap/firefox/common/.mozilla/firefox/*/places.sqlite",
+                 f"{HOME}/.var/app/org.mozilla.firefox/.mozilla/firefox/*/places.sqlite"]
+CHROMIUM_DIRS = ["google-chrome", "chromium", "BraveSoftware/Brave-Browser", "microsoft-edge", "vivaldi"]
+CHROMIUM_GLOBS = [f"{HOME}/.config/{d}/*/History" for d in CHROMIUM_DIRS] + [
+    f"{HOME}/snap/chromium/common/chromium/*/History",
+    f"{HOME}/.var/app/com.google.Chrome/config/google-chrome/*/History",
+    f"{HOME}/.var/app/com.brave.Browser/config/BraveSoftware/Brave-Browser/*/History",
+]
+LEARNED_PATH = os.path.expanduser("~/.local/share/omni/navigations.json")
+REFRESH_INTERVAL = 60 # Seconds between source file checks
+MAX_ROWS = 20000 # URLs read per history database, most used first
+MAX_PAGES = 5000 # Page entries kept besides the sites
+MAX_LEARNED = 2000
+MIN_MATCH = 0.5
+FUZZY_RATIO = 0.8
+
+def words(text):
+    return re.findall(r"\w+", (text or "").lower())
+
+def host_labels(host):
+    """Meaningful labels of a host: "docs.python.org" -> ["docs", "python"]."""
+    labels = host.lower().split(".")
+    if labels and labels[0] in ("www", "m"): labels = labels[1:]
+    return labels[:-1] if len(labels) > 1 else labels
+
+def _copy(path, tmp):
+    """Copies a SQLite database (and its WAL) so it can be read while the browser holds it."""
+    target = os.path.join(tmp, os.path.basename(path))
+    shutil.copy2(path, target)
+    if os.path.exists(f"{path}-wal"): shutil.copy2(f"{path}-wal", f"{target}-wal")
+    return target
+
+def read_firefox(path):
+    """Yields (url, title, visits, typed, bookmarked) from a Firefox places.sqlite."""
+    import sqlite3
+    with tempfile.TemporaryDirectory(prefix="omni-nav-") as tmp:
+        conn = sqlite3.connect(_copy(path, tmp))
+        try:
+            yield from conn.execute(
+                "SELECT p.url, p.title, p.visit_count, p.typed, "
+                "EXISTS (SELECT 1 FROM moz_bookmarks b WHERE b.fk = p.id) "
+                "FROM moz_places p WHERE p.hidden = 0 AND (p.visit_count > 0 OR "
+                "EXISTS (SELECT 1 FROM moz_bookmarks b WHERE b.fk = p.id)) ORDER BY p.frecency DESC LIMIT ?",
+                (MAX_ROWS,))
+        finally:
+            conn.close()
+
+def _chromium_bookmarks(path):
+    try:
+        with open(path) as f:
+            roots = json.load(f).get("roots", {})
+    except (OSError, ValueError):
+        return {}
+    marks, stack = {}, list(roots.values())
+    while stack:
+        node = stack.pop()
+        if not isinstance(node, dict): continue
+        if node.get("type") == "url" and node.get("url"): marks[node["url"]] = node.get("name")
+        stack.extend(node.get("children", []))
+    return marks
+
+def read_chromium(path):
+    """Yields (url, title, visits, typed, bookmarked) from a Chromium History file and the
+    Bookmarks file next to it."""
+    import sqlite3
+    marks = _chromium_bookmarks(os.path.join(os.path.dirname(path), "Bookmarks"))
+    with tempfile.TemporaryDirectory(prefix="omni-nav-") as tmp:
+        conn = sqlite3.connect(_copy(path, tmp))
+        try:
+            for url, title, visits, typed in conn.execute(
+                    "SELECT url, title, visit_count, typed_count FROM urls WHERE hidden = 0 "
+                    "ORDER BY visit_count DESC, last_visit_time DESC LIMIT ?", (MAX_ROWS,)):
+                yield url, title, visits, typed, url in marks
+                marks.pop(url, None)
+        finally:
+            conn.close()
+    for url, title in marks.items():
+        yield url, title, 0, 0, True
+
+def signature(paths):
+    """Path, size and mtime of every source file (and its WAL)."""
+    sig = []
+    for p in paths:
+        for f in (p, f"{p}-wal"):
+            try:
+                st = os.stat(f)
+                sig.append([f, st.st_size, int(st.st_mtime)])
+            except OSError:
+                pass
+    return sig
+
+class NavigationIndex:
+    def __init__(self, firefox_globs=FIREFOX_GLOBS, chromium_globs=CHROMIUM_GLOBS, learned_path=LEARNED_PATH):
+        self.firefox_globs = firefox_globs
+        self.chromium_globs = chromium_globs
+        self.learned_path = learned_path
+        self.entries = []
+        self.tokens = [] # Sorted (token, entry index, on host)
+        self.sites = [] # (main host label, entry index) for fuzzy matching
+        self.learned = self._load_learned()
+        self.signature = None
+        self.lock = threading.Lock()
+        self.counts = {"learned": 0, "hit": 0, "fuzzy": 0, "miss": 0}
+        self._stop = threading.Event()
+        self._thread = None
+
+    # --- Building ---
+    def sources(self):
+        firefox = sorted(p for g in self.firefox_globs for p in glob.glob(g))
+        chromium = sorted(p for g in self.chromium_globs for p in glob.glob(g))
+        return firefox, chromium
+
+    def refresh(self, force=False):
+        """Rebuilds the index if a history file changed. Returns True when it was rebuilt."""
+        firefox, chromium = self.sources()
+        sig = signature(firefox + chromium)
+        if not force and sig == self.signature: return False
+        start = time.perf_counter()
+        rows = []
+        for reader, paths in ((read_firefox, firefox), (read_chromium, chromium)):
+            for path in paths:
+                try: rows.extend(reader(path))
+                except Exception as e: logging.warning(f"Navigation index: skipping {path}: {e}")
+        self._build(rows, sig)
+        logging.info(f"Navigation index: {len(self.entries)} entries from {len(rows)} URLs in "
+                     f"{(time.perf_counter() - start) * 1000:.0f} ms")
+        return True
+
+    def _build(self, rows, sig):
+        sites, pages = {}, {}
+        for url, title, visits, typed, bookmarked in rows:
+            try: parts = urlsplit(url)
+            except ValueError: continue
+            if parts.scheme not in ("http", "https") or not parts.hostname or len(url) > 512: continue
+            host = parts.hostname
+            weight = (visits or 0) + 2 * (typed or 0)
+            site = sites.setdefault(host, {"url": f"https://{host}/", "title": host, "host": host,
+                                           "visits": 0, "bookmarked": False, "kind": "site"})
+            site["visits"] += weight
+            site["bookmarked"] |= bool(bookmarked) and parts.path in ("", "/")
+            if parts.path in ("", "/") and not parts.query:
+                site["url"] = url
+                if title: site["title"] = title
+            elif not parts.query:
+                page = pages.setdefault(url, {"url": url, "title": title or url, "host": host,
+                                              "visits": 0, "bookmarked": False, "kind": "page"})
+                page["visits"] += weight
+                page["bookmarked"] |= bool(bookmarked)
+        ranked = sorted(pages.values(), key=lambda p: (p["bookmarked"], p["visits"]), reverse=True)
+        entries = list(sites.values()) + ranked[:MAX_PAGES]
+
+        tokens, fuzzy = [], []
+        for i, e in enumerate(entries):
+            e["weight"] = math.log2(2 + e["visits"]) + (2 if e["bookmarked"] else 0)
+            labels = host_labels(e["host"])
+            e["host_tokens"] = {t for label in labels for t in words(label)} | set(labels)
+            e["title_tokens"] = set(words(e["title"])) - e["host_tokens"]
+            tokens += [(t, i, True) for t in e["host_tokens"]] + [(t, i, False) for t in e["title_tokens"]]
+            if e["kind"] == "site" and labels: fuzzy.append((labels[-1], i))
+        tokens.sort()
+        with self.lock:
+            self.entries, self.tokens, self.sites, self.signature = entries, tokens, fuzzy, sig
+
+    def start(self):
+        """Builds the index and keeps it fresh from a daemon thread."""
+        if self._thread: return
+        def loop():
+            while not self._stop.is_set():
+                try: self.refresh()
+                except Exception as e: logging.error(f"Navigation index refresh failed: {e}")
+                self._stop.wait(REFRESH_INTERVAL)
+        self._thread = threading.Thread(target=loop, daemon=True, name="omni-nav-refresh")
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    # --- Past navigations ---
+    def _load_learned(self):
+        try:
+            with open(self.learned_path) as f:
+                learned = json.load(f)
+            return learned if isinstance(learned, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def record(self, query, url, title=None):
+        """Remembers that the user opened `url` for `query`."""
+        k = " ".join(words(query))
+        if not k or not url or urlsplit(url).scheme not in ("http", "https"): return
+        with self.lock:
+            entry = self.learned.get(k) or {"count": 0}
+            if entry.get("url") != url: entry = {"count": 0}
+            entry.update(url=url, title=title or entry.get("title") or url, count=entry["count"] + 1, last=time.time())
+            self.learned[k] = entry
+            if len(self.learned) > MAX_LEARNED:
+                for old in sorted(self.learned, key=lambda q: self.learned[q]["last"])[:len(self.learned) - MAX_LEARNED]:
+                    del self.learned[old]
+            snapshot = json.dumps(self.learned)
+        try:
+            os.makedirs(os.path.dirname(self.learned_path), exist_ok=True)
+            tmp = f"{self.learned_path}.tmp"
+            with open(tmp, "w") as f:
+                f.write(snapshot)
+            os.replace(tmp, self.learned_path)
+        except OSError as e:
+            logging.warning(f"Navigation index: could not save {self.learned_path}: {e}")
+
+    # --- Lookup ---
+    @staticmethod
+    def _match(entry, qwords):
+        """Match quality in [0, 1]: per query word, exact > prefix and host > title."""
+        total = 0.0
+        for w in qwords:
+            best = 0.0
+            for tokens, exact, prefix in ((entry["host_tokens"], 1.0, 0.75), (entry["title_tokens"], 0.7, 0.5)):
+                if w in tokens: best = max(best, exact)
+                elif any(t.startswith(w) for t in tokens): best = max(best, prefix)
+            total += best
+        return total / len(qwords)
+
+    def _prefixed(self, tokens, word):
+        """Entry indexes with a token starting with `word`."""
+        found = set()
+        for token, i, _ in tokens[bisect.bisect_left(tokens, (word,)):]:
+            if not token.startswith(word): break
+            found.add(i)
+        return found
+
+    def lookup(self, query, typed=None):
+        """{"url", "title", "description"} for a SEARCH: query (or the text the user typed), or None."""
+        qwords = words(query)
+        with self.lock:
+            learned = next((self.learned[k] for k in (" ".join(qwords), " ".join(words(typed)))
+                            if k and k in self.learned), None)
+            entries, tokens, sites = self.entries, self.tokens, self.sites
+        if learned:
+            self._count("learned")
+            return {"url": learned["url"], "title": learned["title"], "description": "Opened before"}
+        if not qwords or len("".join(qwords)) < 2:
+            self._count("miss")
+            return None
+
+        candidates = None
+        for w in qwords:
+            found = self._prefixed(tokens, w)
+            candidates = found if candidates is None else candidates & found
+            if not candidates: break
+        scored = [(self._match(entries[i], qwords), i) for i in candidates or ()]
+        result = "hit"
+        if not scored and len(qwords) == 1 and len(qwords[0]) >= 4:
+            fuzzy = SequenceMatcher(None, b=qwords[0])
+            for label, i in sites:
+                if abs(len(label) - len(qwords[0])) > 2: continue
+                fuzzy.set_seq1(label)
+                if fuzzy.quick_ratio() >= FUZZY_RATIO and fuzzy.ratio() >= FUZZY_RATIO:
+                    scored.append((0.6 * fuzzy.ratio(), i))
+            result = "fuzzy"
+        # Words of one or two letters only count whole ("go" -> go.dev, not google.com)
+        scored = [(m, i) for m, i in scored if m >= MIN_MATCH and all(
+            len(w) > 2 or w in entries[i]["host_tokens"] or w in entries[i]["title_tokens"] for w in qwords)]
+        if not scored:
+            self._count("miss")
+            return None
+        best = max(scored, key=lambda s: s[0] * entries[s[1]]["weight"] * (1.0 if entries[s[1]]["kind"] == "site" else 0.6))[1]
+        self._count(result)
+        e = entries[best]
+        return {"url": e["url"], "title": e["title"],
+                "description": "From your bookmarks" if e["bookmarked"] else "From your history"}
+
+    def _count(self, result):
+        with self.lock: self.counts[result] += 1
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counts, entries=len(self.entries), learned=len(self.learned))
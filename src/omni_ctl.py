@@ -0,0 +1,40 @@
+"""Lightweight control client for a resident Omni launcher (`omni.py --daemon`).
+
+Only uses the standard library so that pressing Super costs a bare interpreter start,
+not a PyQt6 import. Exits with status 1 when no launcher daemon is listening.
+
+Usage: omni_ctl.py [toggle|show|hide|quit|ping|show-wait|latency|latency-dump [path]]
+
+`latency` prints keystroke-to-result percentiles per result tier; `latency-dump` writes the
+recorded per-query timelines as JSON lines (default /tmp/omni_latency.jsonl).
+"""
+import os
+import socket
+import sys
+
+LAUNCHER_SOCKET = os.environ.get("OMNI_LAUNCHER_SOCKET", "/tmp/omni_launcher.sock")
+
+def send_command(command, timeout=2.0, path=None):
+    """Sends one command to the daemon and returns its reply, or None if nobody is listening."""
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(path or LAUNCHER_SOCKET)
+            sock.sendall(f"{command}\n".encode())
+            # The daemon closes the connection after replying
+            chunks = []
+            while True:
+                chunk = sock.recv(65536)
+                if not chunk: break
+                chunks.append(chunk)
+            return b"".join(chunks).decode(errors="replace").strip()
+    except OSError:
+        return None
+
+if __name__ == "__main__":
+    command = " ".join(sys.argv[1:]) or "toggle"
+    reply = send_command(command)
+    if reply is None:
+        sys.exit(1)
+    if reply and reply != "ok":
+        print(reply)
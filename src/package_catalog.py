@@ -0,0 +1,265 @@
+"""In-process package catalog for /install_plan.
+
+Indexes the local apt package lists and the flatpak appstream data once, keeps the index on
+disk between brain restarts and rebuilds it in the background when the source files change.
+Lookups are plain dictionary/list scans, so a plan comes back in milliseconds instead of
+waiting on `apt-cache search` and `flatpak search`.
+"""
+import glob
+import gzip
+import heapq
+import json
+import logging
+import lzma
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from difflib import SequenceMatcher
+
+APT_LIST_GLOBS = ["/var/lib/apt/lists/*_Packages", "/var/lib/apt/lists/*_Packages.gz", "/var/lib/apt/lists/*_Packages.xz"]
+APPSTREAM_GLOBS = [
+    "/var/lib/flatpak/appstream/*/*/active/appstream.xml.gz",
+    os.path.expanduser("~/.local/share/flatpak/appstream/*/*/active/appstream.xml.gz"),
+]
+CACHE_PATH = os.path.expanduser("~/.cache/omni/package_catalog.json")
+CACHE_VERSION = 1
+REFRESH_INTERVAL = 60 # Seconds between source file checks
+PARSE_WORKERS = 4
+DERIVED_FIELDS = ("key", "pkg", "text") # Rebuilt on load, not cached
+
+# apt packages that are rarely what someone asking to "install <app>" wants
+APT_NOISE_SUFFIXES = ("-dev", "-doc", "-dbg", "-dbgsym", "-data", "-common", "-examples")
+
+def _open_text(path):
+    if path.endswith(".gz"): return gzip.open(path, "rt", encoding="utf-8", errors="replace")
+    if path.endswith(".xz"): return lzma.open(path, "rt", encoding="utf-8", errors="replace")
+    return open(path, encoding="utf-8", errors="replace")
+
+def parse_apt_list(path):
+    """Parses one apt Packages file into [{source, id, name, summary}]."""
+    entries, pkg, summary = [], None, ""
+    with _open_text(path) as f:
+        for line in f:
+            if line.startswith("Package: "):
+                pkg = line[9:].strip()
+            elif line.startswith("Description: "):
+                summary = line[13:].strip()
+            elif line == "\n" and pkg:
+                entries.append({"source": "apt", "id": pkg, "name": pkg, "summary": summary})
+                pkg, summary = None, ""
+    if pkg:
+        entries.append({"source": "apt", "id": pkg, "name": pkg, "summary": summary})
+    return entries
+
+def parse_appstream(path):
+    """Parses one flatpak appstream.xml.gz into [{source, id, name, summary, remote}]."""
+    import xml.etree.ElementTree as ET
+    # .../appstream/<remote>/<arch>/active/appstream.xml.gz
+    remote = path.split(os.sep)[-4]
+    lang_attr = "{http://www.w3.org/XML/1998/namespace}lang"
+    entries = []
+    with gzip.open(path) as f:
+        for _, elem in ET.iterparse(f):
+            if elem.tag != "component": continue
+            app_id = (elem.findtext("id") or "").strip()
+            bundle = elem.find("bundle")
+            if bundle is not None and bundle.text and bundle.text.startswith("app/"):
+                app_id = bundle.text.split("/")[1]
+            name = next((n.text for n in elem.findall("name") if lang_attr not in n.attrib and n.text), app_id)
+            summary = next((n.text for n in elem.findall("summary") if lang_attr not in n.attrib and n.text), "")
+            if app_id.endswith(".desktop"): app_id = app_id[:-8]
+            if app_id:
+                entries.append({"source": "flatpak", "id": app_id, "name": name.strip(), "summary": summary.strip(), "remote": remote})
+            elem.clear()
+    return entries
+
+def source_files(apt_globs=APT_LIST_GLOBS, appstream_globs=APPSTREAM_GLOBS):
+    apt = sorted(p for g in apt_globs for p in glob.glob(g))
+    appstream = sorted(p for g in appstream_globs for p in glob.glob(g))
+    return apt, appstream
+
+def signature(paths):
+    """Cheap change detector: path, size and mtime of every source file."""
+    sig = []
+    for p in paths:
+        try:
+            st = os.stat(p)
+            sig.append([p, st.st_size, int(st.st_mtime)])
+        except OSError:
+            pass
+    return sig
+
+class PackageCatalog:
+    """Fuzzy-searchable index of installable apt packages and flatpak apps."""
+
+    def __init__(self, apt_globs=APT_LIST_GLOBS, appstream_globs=APPSTREAM_GLOBS, cache_path=CACHE_PATH):
+        self.apt_globs = apt_globs
+        self.appstream_globs = appstream_globs
+        self.cache_path = cache_path
+        self.entries = []
+        self.by_key = {} # lowercased id/name -> [entry]
+        self.signature = None
+        self.lock = threading.Lock()
+        self.ready = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # --- Building ---
+    def _set_entries(self, entries, sig):
+        by_key = {}
+        for e in entries:
+            # Lowercased copies so lookups do not re-lower 100k strings per query
+            e["key"], e["pkg"], e["text"] = e["name"].lower(), e["id"].lower(), e["summary"].lower()
+            by_key.setdefault(e["pkg"], []).append(e)
+            if e["key"] != e["pkg"]:
+                by_key.setdefault(e["key"], []).append(e)
+        with self.lock:
+            self.entries, self.by_key, self.signature = entries, by_key, sig
+        self.ready.set()
+
+    def _load_cache(self, sig):
+        try:
+            with open(self.cache_path) as f:
+                cached = json.load(f)
+            if cached.get("version") == CACHE_VERSION and cached.get("signature") == sig:
+                return cached["entries"]
+        except (OSError, ValueError, KeyError):
+            pass
+        return None
+
+    def _write_cache(self, entries, sig):
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            tmp = f"{self.cache_path}.tmp"
+            with open(tmp, "w") as f:
+                json.dump({"version": CACHE_VERSION, "signature": sig,
+                           "entries": [{k: v for k, v in e.items() if k not in DERIVED_FIELDS} for e in entries]}, f)
+            os.replace(tmp, self.cache_path)
+        except OSError as e:
+            logging.warning(f"Package catalog: could not write cache: {e}")
+
+    def refresh(self, force=False):
+        """Rebuilds the index if the source files changed. Returns True when it was rebuilt."""
+        apt, appstream = source_files(self.apt_globs, self.appstream_globs)
+        sig = signature(apt + appstream)
+        if not force and sig == self.signature:
+            return False
+
+        start = time.perf_counter()
+        entries = None if force else self._load_cache(sig)
+        origin = "cache"
+        if entries is None:
+            origin = "sources"
+            jobs = [(parse_apt_list, p) for p in apt] + [(parse_appstream, p) for p in appstream]
+            entries = []
+            with ThreadPoolExecutor(max_workers=PARSE_WORKERS, thread_name_prefix="omni-catalog") as pool:
+                futures = [(p, pool.submit(fn, p)) for fn, p in jobs]
+                for p, fut in futures:
+                    try: entries.extend(fut.result())
+                    except Exception as e: logging.warning(f"Package catalog: skipping {p}: {e}")
+            # apt lists repeat packages across pockets/architectures
+            seen, unique = set(), []
+            for e in entries:
+                k = (e["source"], e["id"])
+                if k in seen: continue
+                seen.add(k)
+                unique.append(e)
+            entries = unique
+            self._write_cache(entries, sig)
+
+        self._set_entries(entries, sig)
+        logging.info(f"Package catalog: {len(entries)} packages from {origin} in {(time.perf_counter() - start) * 1000:.0f} ms")
+        return True
+
+    def start(self):
+        """Loads the index and keeps it fresh from a daemon thread."""
+        if self._thread: return
+        def loop():
+            while not self._stop.is_set():
+                try: self.refresh()
+                except Exception as e: logging.error(f"Package catalog refresh failed: {e}")
+                self.ready.set() # Even a failed build should not block lookups forever
+                self._stop.wait(REFRESH_INTERVAL)
+        self._thread = threading.Thread(target=loop, daemon=True, name="omni-catalog-refresh")
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    # --- Lookup ---
+    @staticmethod
+    def _score(query, entry):
+        """Match quality in [0, 1] plus small source/noise adjustments."""
+        key, pkg = entry["key"], entry["pkg"]
+        if query in (key, pkg): score = 1.0
+        elif key.startswith(query) or pkg.startswith(query): score = 0.8
+        elif query in key or query in pkg: score = 0.65
+        elif query in entry["text"]: score = 0.4
+        else: score = 0.75 * SequenceMatcher(None, query, key).ratio() # Typos: "firfox" -> firefox
+
+        if entry["source"] == "apt" and (pkg.startswith("lib") or pkg.endswith(APT_NOISE_SUFFIXES)):
+            score -= 0.2
+        if entry["source"] == "flatpak" and score < 1.0:
+            score += 0.05 # Flatpaks are desktop apps, which is what the launcher installs
+        return score
+
+    def search(self, query, limit=5, wait=2.0):
+        """Returns up to `limit` entries ranked across apt and flatpak, best first."""
+        query = query.strip().lower()
+        if not query: return []
+        self.ready.wait(wait)
+        with self.lock:
+            entries, by_key = self.entries, self.by_key
+
+        candidates = {id(e): e for e in by_key.get(query, [])}
+        short = len(query) < 3
+        slack = max(2, len(query) // 3)
+        fuzzy = SequenceMatcher(None, b=query) # seq2 is fixed, so its character counts are computed once
+        for e in entries:
+            key = e["key"]
+            if query in key or query in e["pkg"]:
+                candidates[id(e)] = e
+            elif not short and key[:1] == query[:1] and abs(len(key) - len(query)) <= slack:
+                fuzzy.set_seq1(key)
+                if fuzzy.quick_ratio() > 0.75: candidates[id(e)] = e
+        if len(candidates) < limit and not short:
+            for e in entries:
+                if id(e) not in candidates and query in e["text"]:
+                    candidates[id(e)] = e
+                    if len(candidates) >= limit * 4: break
+
+        scored = ((self._score(query, e), -len(e["id"]), i, e) for i, e in enumerate(candidates.values()))
+        best = heapq.nlargest(limit, scored)
+        return [dict({k: v for k, v in e.items() if k not in DERIVED_FIELDS}, score=round(score, 3))
+                for score, _, _, e in best]
+
+def install_command(entry):
+    if entry["source"] == "apt":
+        return f"pkexec apt-get install -y {entry['id']}"
+    if entry.get("remote"):
+        return f"flatpak install -y {entry['remote']} {entry['id']}"
+    return f"flatpak install -y {entry['id']}"
+
+def batch_install_command(entries):
+    """One shell command installing every entry: all apt packages in a single apt-get
+    transaction and all flatpak refs of a remote in a single flatpak invocation.
+
+    When apt is involved the whole script runs under one pkexec, so the user authenticates
+    once; flatpak-only batches go through flatpak's own polkit prompt, as single installs do."""
+    import shlex
+    apt = [e["id"] for e in entries if e["source"] == "apt"]
+    remotes = {}
+    for e in entries:
+        if e["source"] == "flatpak":
+            remotes.setdefault(e.get("remote"), []).append(e["id"])
+
+    steps = []
+    if apt:
+        steps.append(shlex.join(["apt-get", "install", "-y", *apt]))
+    for remote, refs in remotes.items():
+        steps.append(shlex.join(["flatpak", "install", "-y", *([remote] if remote else []), *refs]))
+    script = " && ".join(steps)
+    if not apt:
+        return script
+    return shlex.join(["pkexec", "sh", "-c", script])
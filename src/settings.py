@@ -0,0 +1,168 @@
+"""Settings shared by the launcher and the brain.
+
+Each key is resolved from three layers, later ones winning:
+  1. DEFAULTS below
+  2. SETTINGS_PATH (~/.config/omni/settings.json, or $OMNI_SETTINGS): a flat JSON object of the
+     same keys, e.g. {"model.n_threads": 8, "launcher.delay.action": [150, 700, 300]}
+  3. the environment: "ask.max_tokens" -> OMNI_ASK_MAX_TOKENS
+
+Values are converted to the type of their default (whole numbers for int keys, true/false,
+yes/no, on/off or 1/0 for bool keys); one that does not convert is logged and ignored. get() re-checks the file at most once per RELOAD_INTERVAL and reloads it when it
+changed, so tuning values apply to the next request without a restart. Keys in RESTART_KEYS are
+only read when the model loads or the process starts; changing them is logged, not applied.
+"""
+import json
+import logging
+import math
+import os
+import threading
+import time
+
+SETTINGS_PATH = os.environ.get("OMNI_SETTINGS", os.path.expanduser("~/.config/omni/settings.json"))
+RELOAD_INTERVAL = 1.0 # Seconds between checks of the file's mtime
+ENV_PREFIX = "OMNI_"
+
+DEFAULTS = {
+    # Model (brain). Matches setup-dev.sh
+    "model.path": os.path.expanduser("~/.local/share/ai-models/gemma-3-1b-it-Q8_0.gguf"),
+    "model.n_ctx": 4096,
+    "model.n_threads": 4,
+    "model.n_gpu_layers": -1, # All layers to GPU if possible
+    # Several models of different sizes, routed by query: {name: {"path": ..., "memory_mb": ...}}
+    # (see model_registry.py). Empty means the single model above serves everything.
+    "models.registry": {},
+    "models.memory_mb": 6144, # Loaded models are evicted, least recently used first, above this
+    # Concurrent requests on a busy model share one batched decode loop (see batching.py)
+    "batching.slots": 4, # Sequences decoded together per model; below 2 turns batching off
+    "batching.n_ctx": 8192, # KV cells shared by those sequences
+    "db.path": os.path.expanduser("~/.local/share/ai-memory-db"),
+    "brain.port": 5500,
+    # Generation
+    "ask.max_tokens": 1024, # Also the room /ask sessions keep free in n_ctx for the reply
+    "ask.temperature": 0.7,
+    "ask.local_context": False, # Default for /ask's local_context flag (the launcher never sends it)
+    "action.max_tokens": 64,
+    "action.temperature": 0.1,
+    # Routing between registry models
+    "router.long_query_words": 12, # /ask questions this long go to the largest model
+    "router.long_answer_tokens": 512, # ...as do ones expected to need an answer this long
+    "router.short_answer_tokens": 256, # Expected answer for a short, closed /ask question
+    # Retrieval
+    "searxng.url": "http://127.0.0.1:8888/search",
+    "timeouts.search": 5.0, # Seconds: SearXNG web search and the DuckDuckGo fallback
+    "timeouts.navigation": 3.0,
+    "timeouts.enrichment": 4.0, # Person/place lookups and Wikipedia summaries
+    "context.web_candidates": 10, # SearXNG results considered for /ask context before reranking
+    "context.web_tokens": 384, # Prompt budget for web context, in model tokens
+    "context.local_tokens": 512, # Prompt budget for local file chunks
+    "context.local_min_score": 0.25, # Chunks less similar than this to the question are left out
+    "session.memory_mb": 512, # Saved /ask KV states are dropped, least recently used first, above this
+    "entities.path": os.path.expanduser("~/.cache/omni/entities.db"), # Person/place store (see entity_store.py)
+    "entities.max_age_days": 30, # Looked-up entries older than this are re-fetched in the background
+    "install.min_score": 0.6, # Below this the best catalog match is a guess, not the app that was asked for
+    # Launcher. Debounce per background tier: [min, max, before any measurements] in ms
+    "launcher.delay.files": [60, 250, 120],
+    "launcher.delay.search": [120, 600, 250],
+    "launcher.delay.action": [200, 900, 400],
+    "launcher.max_apps": 9,
+    "launcher.timeout.search": 5, # Seconds per brain request
+    "launcher.timeout.action": 60,
+    "launcher.timeout.ask": 120,
+    "launcher.timeout.speculate": 2,
+    # Logging: keep 1 in N records (1 keeps all; warnings and errors are always kept)
+    "llm.log_sample": 1, # Brain: prompts and model output, /tmp/llm_output.log
+    "person.log_sample": 10, # Brain: person lookups, /tmp/person_debug.log
+    "request.log_sample": 10, # Launcher: brain request start/finish lines
+}
+RESTART_KEYS = {"model.path", "model.n_ctx", "model.n_threads", "model.n_gpu_layers", "db.path", "brain.port",
+                "entities.path"}
+
+_lock = threading.Lock()
+_values = None
+_sources = {}
+_mtime = None
+_checked = 0.0
+
+def env_name(key):
+    return ENV_PREFIX + key.replace(".", "_").upper()
+
+def _coerce(value, default):
+    if isinstance(default, bool):
+        word = value.strip().lower() if isinstance(value, str) else value
+        if word in (True, 1, "1", "true", "yes", "on"): return True
+        if word in (False, 0, "0", "false", "no", "off", ""): return False
+        raise ValueError("expected true or false")
+    if isinstance(default, (list, dict)):
+        value = json.loads(value) if isinstance(value, str) else value
+        if not isinstance(value, type(default)): raise ValueError(f"expected a JSON {type(default).__name__}")
+        return value
+    if isinstance(value, bool): raise ValueError(f"expected a number, not {value}")
+    if isinstance(default, int):
+        # "8" and 8.0 are fine; 8.5 is refused rather than truncated
+        if isinstance(value, str):
+            try: return int(value.strip())
+            except ValueError: value = float(value)
+        if isinstance(value, float) and not value.is_integer(): raise ValueError(f"expected a whole number, not {value}")
+        return int(value)
+    if isinstance(default, float):
+        value = float(value)
+        if not math.isfinite(value): raise ValueError(f"expected a finite number, not {value}")
+        return value
+    return type(default)(value)
+
+def _read_file(path):
+    try:
+        with open(path) as f:
+            loaded = json.load(f)
+    except OSError:
+        return {}
+    except ValueError as e:
+        logging.warning(f"Settings: ignoring {path}: {e}")
+        return {}
+    if not isinstance(loaded, dict):
+        logging.warning(f"Settings: ignoring {path}: expected a JSON object")
+        return {}
+    return loaded
+
+def _load(path):
+    values, sources = dict(DEFAULTS), dict.fromkeys(DEFAULTS, "default")
+    layers = [("file", _read_file(path)),
+              ("env", {k: os.environ[env_name(k)] for k in DEFAULTS if env_name(k) in os.environ})]
+    for source, layer in layers:
+        for key, value in layer.items():
+            if key not in DEFAULTS:
+                logging.warning(f"Settings: unknown key {key!r} in {path}")
+                continue
+            try: values[key] = _coerce(value, DEFAULTS[key])
+            except (TypeError, ValueError) as e:
+                logging.warning(f"Settings: ignoring {source} value for {key}: {value!r} ({e})")
+                continue
+            sources[key] = source
+    return values, sources
+
+def _refresh(path=SETTINGS_PATH):
+    global _values, _sources, _mtime, _checked
+    now = time.monotonic()
+    if _values is not None and now - _checked < RELOAD_INTERVAL: return
+    with _lock:
+        _checked = now
+        try: mtime = os.stat(path).st_mtime
+        except OSError: mtime = None
+        if _values is not None and mtime == _mtime: return
+        values, sources = _load(path)
+        if _values is not None:
+            logging.info(f"Settings: reloaded {path}")
+            for key in sorted(RESTART_KEYS):
+                if values[key] != _values[key]:
+                    logging.warning(f"Settings: {key} changed to {values[key]!r}; it applies after a restart")
+        _values, _sources, _mtime = values, sources, mtime
+
+def get(key):
+    _refresh()
+    return _values[key]
+
+def snapshot():
+    """Current values and where each one came from ("default", "file" or "env")."""
+    _refresh()
+    return {"path": SETTINGS_PATH, "values": dict(_values), "sources": dict(_sources),
+            "restart_keys": sorted(RESTART_KEYS)}
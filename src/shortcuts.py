@@ -0,0 +1,59 @@
+"""Launcher shortcut aliases ("yt" -> YouTube), shared by the launcher and the brain.
+
+The built-in table below is merged with the user's own aliases from SHORTCUTS_PATH, a JSON
+object of alias -> URL:
+
+    {"hn": "https://news.ycombinator.com", "mail": "https://mail.proton.me", "x": null}
+
+A user entry overrides the built-in one of the same name; null removes it. Both processes read
+the file directly and reload it when it changes, so a new alias works without a restart.
+"""
+import json
+import os
+
+SHORTCUTS_PATH = os.path.expanduser("~/.config/omni/shortcuts.json")
+
+DEFAULT_SHORTCUTS = {
+    "yt": "https://www.youtube.com",
+    "gh": "https://github.com",
+    "x": "https://x.com",
+    "red": "https://reddit.com",
+    "map": "https://www.google.com/maps",
+    "chat": "https://chatgpt.com"
+}
+_table = None
+_table_mtime = None
+
+def load(path=SHORTCUTS_PATH):
+    """alias -> URL: the built-ins merged with the user's file; reloaded when the file changes."""
+    global _table, _table_mtime
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        mtime = None
+    if _table is None or mtime != _table_mtime:
+        table = dict(DEFAULT_SHORTCUTS)
+        if mtime is not None:
+            try:
+                with open(path) as f:
+                    user = json.load(f)
+                if isinstance(user, dict):
+                    for alias, url in user.items():
+                        alias = str(alias).strip().lower()
+                        if url is None: table.pop(alias, None)
+                        elif isinstance(url, str) and url.strip(): table[alias] = url.strip()
+            except (OSError, ValueError):
+                pass
+        _table, _table_mtime = table, mtime
+    return _table
+
+def link_action(query):
+    """The "link" action for an exact alias, or None."""
+    url = load().get(query.strip().lower())
+    if not url: return None
+    return {
+        "type": "link",
+        "url": url,
+        "title": url.replace("https://", "").replace("http://", "").replace("www.", "").split('/')[0].title(),
+        "description": "Direct Shortcut"
+    }
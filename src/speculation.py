@@ -0,0 +1,216 @@
+"""Speculative /action work on partial queries.
+
+While the user types, the launcher posts each partial query to /speculate. The brain guesses
+the action the finished query will ask for and starts the slow parts early:
+  - rule-based guesses for unambiguous prefixes ("who is ada lov" -> PERSON:ada lov)
+  - otherwise the fast model itself, but only when its lock is free
+  - the enrichment fetch for the guess (SearXNG person/place lookup, app website)
+
+The real /action then reuses what is ready. The model output is reused when the final query
+matches exactly. An enrichment is reused when its argument matches, or when a partial argument's
+finished result already names the final one. Speculation never delays real requests:
+  - it runs on a small pool and is skipped, not queued, when the pool is busy
+  - it never waits for the model lock
+  - it abandons a generation as soon as a real request wants the model
+Outcomes are counted so /metrics can report the hit rate.
+"""
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, InvalidStateError, ThreadPoolExecutor
+from contextlib import contextmanager
+
+import tracing
+
+WORKERS = 2 # Concurrent speculative jobs; more are dropped
+TTL = 60 # Seconds a speculative result stays reusable
+MAX_ENTRIES = 256
+MIN_QUERY = 3
+WAIT_INFLIGHT = 5.0 # Longest a real request waits for a matching speculation already generating
+
+# Prefixes whose action is clear before the query is finished: (pattern, action kind)
+RULES = [
+    (re.compile(r"^(?:who is|who was|who's)\s+(.{3,})$", re.I), "PERSON"),
+    (re.compile(r"^(?:where is|where's|directions to)\s+(.{3,})$", re.I), "PLACE"),
+    (re.compile(r"^(.{3,}?)\s+map$", re.I), "PLACE"),
+    (re.compile(r"^install\s+(.{2,})$", re.I), "INSTALL"),
+]
+
+def normalize(text):
+    return " ".join(text.lower().split())
+
+def rule_predictions(query):
+    for pattern, kind in RULES:
+        m = pattern.match(query.strip())
+        if m: return [(kind, m.group(1).strip())]
+    return []
+
+def split_apps(value):
+    """"gimp, vlc and spotify" -> ["gimp", "vlc", "spotify"]"""
+    return [a.strip() for a in re.split(r",|\band\b|&", value) if a.strip()]
+
+def action_lines(text):
+    """(kind, argument) pairs from the fast model's action output."""
+    out = []
+    for line in text.split("\n"):
+        kind, sep, arg = line.strip().partition(":")
+        if sep and kind in ("PERSON", "PLACE", "INSTALL", "SEARCH", "CALC", "OPEN") and arg.strip():
+            out.append((kind, arg.strip()))
+    return out
+
+def _names(result):
+    if not isinstance(result, dict): return ""
+    return normalize(" ".join(str(result.get(k) or "") for k in ("name", "title")))
+
+class Speculator:
+    def __init__(self, run_model, enrichers, workers=WORKERS):
+        """run_model(query, should_stop, started) -> action text or None, calling started() once it
+        holds the model and giving up if that returns False; enrichers: {kind: fn(arg)}."""
+        self.run_model = run_model
+        self.enrichers = enrichers
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="omni-speculate")
+        self.slots = threading.Semaphore(workers)
+        self.lock = threading.Lock()
+        self.model_text = OrderedDict() # normalized query -> (created, Future[text or None])
+        self.enriched = OrderedDict() # (kind, normalized arg) -> (created, Future[result])
+        self.waiting = 0 # Real requests that want the model
+        self.counts = {}
+
+    # --- Bookkeeping ---
+    def _count(self, name, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counts[key] = self.counts.get(key, 0) + 1
+        tracing.metrics.inc(name, **labels)
+
+    def _put(self, cache, key, future):
+        with self.lock:
+            cache[key] = (time.monotonic(), future)
+            cache.move_to_end(key)
+            while len(cache) > MAX_ENTRIES: cache.popitem(last=False)
+
+    def _get(self, cache, key):
+        with self.lock:
+            item = cache.get(key)
+            if item and time.monotonic() - item[0] > TTL:
+                del cache[key]
+                item = None
+            return item[1] if item else None
+
+    @contextmanager
+    def priority(self):
+        """Held by real requests around their model use; running speculation yields to them."""
+        with self.lock: self.waiting += 1
+        try: yield
+        finally:
+            with self.lock: self.waiting -= 1
+
+    def should_stop(self):
+        return self.waiting > 0
+
+    # --- Speculating ---
+    def speculate(self, query):
+        """Starts background work for a partial query. Returns False when it was skipped."""
+        query = query.strip()
+        if len(query) < MIN_QUERY or self.waiting: return False
+        if not self.slots.acquire(blocking=False):
+            self._count("omni_speculation_jobs_total", outcome="skipped")
+            return False
+        self._count("omni_speculation_jobs_total", outcome="started")
+        try:
+            self.pool.submit(self._job, query)
+        except RuntimeError:
+            self.slots.release()
+            return False
+        return True
+
+    def _job(self, query):
+        try:
+            predictions = rule_predictions(query)
+            if not predictions:
+                key = normalize(query)
+                future = self._get(self.model_text, key)
+                if future is None:
+                    future = Future()
+                    self._put(self.model_text, key, future)
+                    text = None
+                    try: text = self.run_model(query, self.should_stop, future.set_running_or_notify_cancel)
+                    finally:
+                        try: future.set_result(text)
+                        except InvalidStateError: pass # Cancelled by the real request
+                    if text is None:
+                        self._count("omni_speculation_jobs_total", outcome="yielded")
+                        with self.lock: self.model_text.pop(key, None)
+                text = future.result() if future.done() and not future.cancelled() else None
+                predictions = action_lines(text or "")
+            for kind, arg in predictions:
+                if kind not in self.enrichers: continue
+                for item in (split_apps(arg) if kind == "INSTALL" else [arg]):
+                    if self.should_stop(): return
+                    self._enrich(kind, item)
+        except Exception as e:
+            logging.warning(f"Speculation for {query!r} failed: {e}")
+        finally:
+            self.slots.release()
+
+    def _enrich(self, kind, arg):
+        key = (kind, normalize(arg))
+        if self._get(self.enriched, key) is not None: return
+        future = Future()
+        self._put(self.enriched, key, future)
+        try: future.set_result(self.enrichers[kind](arg))
+        except Exception as e: future.set_exception(e)
+
+    # --- Reuse on the real request ---
+    def model_result(self, query):
+        """Speculated action text for exactly this query, or None. Only a finished result or a
+        generation already under way is waited for; one that has not started yet is cancelled
+        so it cannot take the model ahead of the caller."""
+        future = self._get(self.model_text, normalize(query))
+        if future is None or future.cancel():
+            self._count("omni_speculation_lookups_total", stage="model", result="miss")
+            return None
+        result = "hit" if future.done() else "inflight"
+        try: text = future.result(timeout=WAIT_INFLIGHT)
+        except Exception: text = None
+        self._count("omni_speculation_lookups_total", stage="model", result=result if text else "miss")
+        return text
+
+    def enrichment(self, kind, arg, fn):
+        """fn(arg), or the speculated result for it when one is usable."""
+        norm = normalize(arg)
+        future = self._get(self.enriched, (kind, norm))
+        result = "hit" if future and future.done() else "inflight" if future else "miss"
+        if future is None:
+            # A fetch for a prefix of the final argument counts when its result names the final argument
+            with self.lock:
+                partials = [f for (k, a), (_, f) in self.enriched.items()
+                            if k == kind and norm.startswith(a) and f.done() and not f.exception()]
+            future = next((f for f in reversed(partials) if norm in _names(f.result())), None)
+            if future: result = "prefix_hit"
+        if future is not None:
+            try:
+                value = future.result(timeout=WAIT_INFLIGHT)
+                self._count("omni_speculation_lookups_total", stage=kind.lower(), result=result)
+                return value
+            except Exception:
+                pass
+        self._count("omni_speculation_lookups_total", stage=kind.lower(), result="miss")
+        return fn(arg)
+
+    def stats(self):
+        """Lookup outcomes per stage and the overall hit rate."""
+        with self.lock:
+            counts = dict(self.counts)
+        stages = {}
+        for (name, labels), n in counts.items():
+            labels = dict(labels)
+            if name == "omni_speculation_lookups_total":
+                stages.setdefault(labels["stage"], {})[labels["result"]] = n
+            elif name == "omni_speculation_jobs_total":
+                stages.setdefault("jobs", {})[labels["outcome"]] = n
+        hits = sum(n for stage, c in stages.items() if stage != "jobs" for r, n in c.items() if r != "miss")
+        lookups = sum(n for stage, c in stages.items() if stage != "jobs" for n in c.values())
+        return {"stages": stages, "hit_rate": round(hits / lookups, 3) if lookups else None}
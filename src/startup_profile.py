@@ -0,0 +1,87 @@
+"""Startup profiling shared by omni.py and brain.py (`--profile-startup`).
+
+The entry point re-runs itself under `python -X importtime` with OMNI_PROFILE_CHILD set.
+The child prints `milestone <name> <ms>` lines as it reaches each startup stage, and the
+parent combines those milestones with the slowest imports into one report.
+
+Import this module first: its import time is the zero point for every milestone.
+"""
+import os
+import sys
+import time
+
+# Everything else is imported inside profile() so normal startups only pay for os/sys/time
+_T0 = time.perf_counter()
+PROFILE_ENV = "OMNI_PROFILE_CHILD"
+REPORT_PATH = "/tmp/omni_startup_profile.json"
+IMPORT_LINE = r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)"
+
+def milestone(name):
+    """Reports a startup stage to the profiling parent. A no-op in normal runs."""
+    if os.environ.get(PROFILE_ENV):
+        print(f"milestone {name} {(time.perf_counter() - _T0) * 1000:.1f}", flush=True)
+
+def parse_importtime(stderr):
+    """Parses `-X importtime` output into dicts of module, self_ms, cumulative_ms, depth."""
+    import re
+    pattern = re.compile(IMPORT_LINE)
+    modules = []
+    for line in stderr.splitlines():
+        m = pattern.match(line)
+        if not m: continue
+        self_us, cumulative_us, indent, module = m.groups()
+        modules.append({
+            "module": module,
+            "self_ms": int(self_us) / 1000,
+            "cumulative_ms": int(cumulative_us) / 1000,
+            "depth": (len(indent) - 1) // 2,
+        })
+    return modules
+
+def profile(script, child_args, top=25, report_path=REPORT_PATH, timeout=60):
+    """Runs `script child_args` under -X importtime and prints a startup report.
+
+    The child is expected to exit on its own once its last milestone is reached."""
+    import json
+    import subprocess
+    env = dict(os.environ, **{PROFILE_ENV: "1"})
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", script, *child_args],
+                          capture_output=True, text=True, env=env, timeout=timeout)
+    wall_ms = (time.perf_counter() - start) * 1000
+
+    milestones = []
+    for line in proc.stdout.splitlines():
+        parts = line.split()
+        if len(parts) == 3 and parts[0] == "milestone":
+            milestones.append({"name": parts[1], "ms": float(parts[2])})
+
+    modules = parse_importtime(proc.stderr)
+    top_level = [m for m in modules if m["depth"] == 0]
+    slowest = sorted(top_level, key=lambda m: m["cumulative_ms"], reverse=True)[:top]
+
+    print(f"Startup profile: {os.path.basename(script)} {' '.join(child_args)}")
+    print(f"  wall time (process spawn -> exit): {wall_ms:.1f} ms, exit code {proc.returncode}")
+    print(f"  top-level imports: {sum(m['cumulative_ms'] for m in top_level):.1f} ms across {len(modules)} modules")
+    print("\nMilestones (ms since the entry point started importing):")
+    for m in milestones:
+        print(f"  {m['ms']:8.1f}  {m['name']}")
+    print("\nSlowest top-level imports (cumulative / self ms):")
+    for m in slowest:
+        print(f"  {m['cumulative_ms']:8.1f} {m['self_ms']:8.1f}  {m['module']}")
+
+    report = {
+        "script": os.path.basename(script),
+        "args": child_args,
+        "wall_ms": round(wall_ms, 1),
+        "returncode": proc.returncode,
+        "milestones": milestones,
+        "imports": slowest,
+    }
+    try:
+        with open(report_path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {report_path}")
+    except OSError as e:
+        print(f"\nCould not write {report_path}: {e}")
+    return report
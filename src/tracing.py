@@ -0,0 +1,250 @@
+"""Per-request stage tracing and metrics for the brain.
+
+Each Flask request gets a trace (begin/finish); code on the request path wraps its stages in
+`span("searxng")`, `timed_lock(main_lock, "main")`, or reports a streamed generation through
+`record_generation`. Durations land in in-memory counters and histograms served by /metrics.
+When OMNI_TRACE_FILE is set, finished traces are also queued to a background thread that
+appends them as JSON lines to a size-rotated file; the request thread never touches the disk.
+"""
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+LATENCY_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+TOKENS_PER_SECOND_BUCKETS = (1, 2, 5, 10, 20, 30, 50, 75, 100, 150, 250)
+
+TRACE_FILE = os.environ.get("OMNI_TRACE_FILE") # Unset: no trace file
+TRACE_MAX_BYTES = int(os.environ.get("OMNI_TRACE_MAX_BYTES", 10 * 1024 * 1024))
+TRACE_BACKUPS = 3
+TRACE_QUEUE_SIZE = 10000
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def cumulative(self):
+        total, out = 0, []
+        for bound, n in zip(self.buckets, self.counts):
+            total += n
+            out.append((bound, total))
+        return out
+
+    def quantile(self, q):
+        """Bucket upper bound that covers quantile q (coarse, but cheap)."""
+        if not self.count: return None
+        target = q * self.count
+        for bound, total in self.cumulative():
+            if total >= target: return bound
+        return float("inf")
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def _label_text(key):
+    if not key: return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in key) + "}"
+
+class Metrics:
+    """Thread-safe registry of counters and histograms keyed by name and labels."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS_MS, **labels):
+        key = (name, _label_key(labels))
+        with self.lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = Histogram(buckets)
+            hist.observe(value)
+
+    def render_prometheus(self):
+        lines = []
+        with self.lock:
+            for name in sorted({n for n, _ in self.counters}):
+                lines.append(f"# TYPE {name} counter")
+                for (n, key), value in sorted(self.counters.items()):
+                    if n == name: lines.append(f"{name}{_label_text(key)} {value}")
+            for name in sorted({n for n, _ in self.histograms}):
+                lines.append(f"# TYPE {name} histogram")
+                for (n, key), hist in sorted(self.histograms.items(), key=lambda item: item[0]):
+                    if n != name: continue
+                    for bound, total in hist.cumulative():
+                        lines.append(f"{name}_bucket{_label_text(key + (('le', str(bound)),))} {total}")
+                    lines.append(f"{name}_bucket{_label_text(key + (('le', '+Inf'),))} {hist.count}")
+                    lines.append(f"{name}_sum{_label_text(key)} {round(hist.sum, 3)}")
+                    lines.append(f"{name}_count{_label_text(key)} {hist.count}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """JSON-friendly view with count/mean/p50/p95/p99 per histogram."""
+        with self.lock:
+            counters = [{"name": n, "labels": dict(key), "value": v} for (n, key), v in sorted(self.counters.items())]
+            histograms = []
+            for (n, key), hist in sorted(self.histograms.items(), key=lambda item: item[0]):
+                histograms.append({
+                    "name": n, "labels": dict(key), "count": hist.count,
+                    "mean": round(hist.sum / hist.count, 3) if hist.count else None,
+                    "p50": hist.quantile(0.5), "p95": hist.quantile(0.95), "p99": hist.quantile(0.99),
+                })
+        return {"counters": counters, "histograms": histograms}
+
+metrics = Metrics()
+
+class TraceWriter(threading.Thread):
+    """Appends trace records to a JSONL file from its own thread, rotating by size."""
+
+    def __init__(self, path, max_bytes=TRACE_MAX_BYTES, backups=TRACE_BACKUPS):
+        super().__init__(daemon=True, name="omni-trace-writer")
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.queue = queue.Queue(maxsize=TRACE_QUEUE_SIZE)
+
+    def submit(self, record):
+        try: self.queue.put_nowait(record)
+        except queue.Full: metrics.inc("omni_trace_dropped_total")
+
+    def _rotate(self):
+        for i in range(self.backups - 1, 0, -1):
+            src = f"{self.path}.{i}"
+            if os.path.exists(src): os.replace(src, f"{self.path}.{i + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
+    def run(self):
+        while True:
+            batch = [self.queue.get()]
+            # Drain whatever else is waiting so a burst costs one open/write
+            while len(batch) < 500:
+                try: batch.append(self.queue.get_nowait())
+                except queue.Empty: break
+            try:
+                if os.path.exists(self.path) and os.path.getsize(self.path) >= self.max_bytes:
+                    self._rotate()
+                with open(self.path, "a") as f:
+                    f.write("".join(json.dumps(r, separators=(",", ":")) + "\n" for r in batch))
+            except OSError as e:
+                logging.warning(f"Trace writer: {e}")
+
+_writer = None
+_local = threading.local()
+
+def start_writer(path=TRACE_FILE):
+    global _writer
+    if path and _writer is None:
+        _writer = TraceWriter(path)
+        _writer.start()
+        logging.info(f"Tracing requests to {path}")
+    return _writer
+
+# --- Request traces ---
+def begin(route):
+    _local.trace = {"route": route, "ts": time.time(), "start": time.perf_counter(), "spans": [], "attrs": {}}
+
+def current():
+    return getattr(_local, "trace", None)
+
+def annotate(**attrs):
+    trace = current()
+    if trace is not None: trace["attrs"].update(attrs)
+
+def finish(status):
+    trace = current()
+    _local.trace = None
+    if trace is None: return
+    total_ms = (time.perf_counter() - trace.pop("start")) * 1000
+    route = trace["route"]
+    metrics.inc("omni_requests_total", route=route, status=status)
+    metrics.observe("omni_request_duration_ms", total_ms, route=route)
+    if _writer:
+        trace.update(status=status, total_ms=round(total_ms, 2))
+        _writer.submit(trace)
+
+def stage_totals():
+    """Milliseconds spent per stage in the current request so far (repeated stages summed)."""
+    trace = current()
+    totals = {}
+    for s in trace["spans"] if trace else []:
+        totals[s["stage"]] = round(totals.get(s["stage"], 0) + s["ms"], 2)
+    return totals
+
+def _record_span(stage, ms, attrs):
+    trace = current()
+    route = trace["route"] if trace else "background"
+    metrics.observe("omni_stage_duration_ms", ms, stage=stage, route=route)
+    if trace is not None:
+        trace["spans"].append(dict(attrs, stage=stage, ms=round(ms, 2)))
+
+@contextmanager
+def span(stage, **attrs):
+    """Times the enclosed block as one stage of the current request."""
+    start = time.perf_counter()
+    try:
+        yield attrs
+    finally:
+        _record_span(stage, (time.perf_counter() - start) * 1000, attrs)
+
+@contextmanager
+def timed_lock(lock, name, held=False):
+    """`with lock:` that records how long the request queued for it. held: the caller already
+    acquired it (recorded as no wait); it is still released on exit."""
+    start = time.perf_counter()
+    if not held: lock.acquire()
+    _record_span("lock_wait", (time.perf_counter() - start) * 1000, {"lock": name})
+    try:
+        yield
+    finally:
+        lock.release()
+
+def record_generation(model, prefill_ms, decode_ms, prompt_tokens, completion_tokens):
+    """Reports one llama.cpp completion: prefill = time to first token, decode = the rest."""
+    tps = completion_tokens / (decode_ms / 1000) if decode_ms > 0 and completion_tokens > 1 else None
+    _record_span("prefill", prefill_ms, {"model": model, "prompt_tokens": prompt_tokens})
+    _record_span("decode", decode_ms, {"model": model, "completion_tokens": completion_tokens,
+                                       "tokens_per_s": round(tps, 1) if tps else None})
+    route = current()["route"] if current() else "background"
+    metrics.inc("omni_llm_tokens_total", prompt_tokens, model=model, kind="prompt")
+    metrics.inc("omni_llm_tokens_total", completion_tokens, model=model, kind="completion")
+    if tps:
+        metrics.observe("omni_llm_tokens_per_second", tps, buckets=TOKENS_PER_SECOND_BUCKETS, model=model, route=route)
+
+def drain_generation(chunks, text_of, model, prompt_tokens=0):
+    """Consumes a streamed llama.cpp completion and returns its text, recording the timings."""
+    start = time.perf_counter()
+    first = None
+    parts = []
+    n = 0
+    for chunk in chunks:
+        if first is None: first = time.perf_counter()
+        text = text_of(chunk)
+        if text is None: continue # Chat streams open with a role-only delta
+        parts.append(text)
+        n += 1
+    end = time.perf_counter()
+    first = first or end
+    record_generation(model, (first - start) * 1000, (end - first) * 1000, prompt_tokens, n)
+    return "".join(parts)
@@ -17,5 +17,6 @@ if ! pgrep -f "src/brain.py" > /dev/null; then
     systemctl --user start omni-brain 2>/dev/null || true
 fi
 
-# Launch UI instantly
-python3 src/omni.py
+# Launch UI instantly: toggle the resident launcher if it is already warm,
+# otherwise start it in daemon mode (it stays resident for the next Super press)
+python3 src/omni_ctl.py toggle || exec python3 src/omni.py --daemon
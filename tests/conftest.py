@@ -0,0 +1,12 @@
+"""Puts src/ on sys.path (the modules import each other by bare name, as under start.sh) and
+keeps the user's settings file and environment out of the tests."""
+import os
+import sys
+import tempfile
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+sys.path.insert(0, SRC)
+
+os.environ["OMNI_SETTINGS"] = os.path.join(tempfile.mkdtemp(prefix="omni-tests-"), "settings.json") # Absent unless a test writes it
+for name in [n for n in os.environ if n.startswith("OMNI_") and n != "OMNI_SETTINGS"]:
+    del os.environ[name]
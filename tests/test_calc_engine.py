@@ -0,0 +1,67 @@
+import pytest
+
+import calc_engine
+
+@pytest.fixture(autouse=True)
+def default_rates(monkeypatch):
+    monkeypatch.setattr(calc_engine, "load_rates", lambda path=None: calc_engine.DEFAULT_RATES)
+
+@pytest.mark.parametrize("query, result, kind", [
+    ("2+2", "4", "arithmetic"),
+    ("(3^2 + 4^2)^0.5", "5", "arithmetic"),
+    ("12 x 7", "84", "arithmetic"),
+    ("10 mod 3", "1", "arithmetic"),
+    ("5!", "120", "arithmetic"),
+    ("1/3", "0.333333333333", "arithmetic"),
+    ("what is 2*3", "6", "arithmetic"),
+    ("0b1010 + 1", "11", "arithmetic"),
+    ("10**25", "1e+25", "arithmetic"),
+    ("-(10**30)+1", "-9.99999999999e+29", "arithmetic"),
+    ("2**4000", "1.31820409343e+1204", "arithmetic"),
+    ("15% of 80", "12", "percent"),
+    ("80 + 15%", "92", "percent"),
+    ("200 - 10%", "180", "percent"),
+    ("50%", "0.5", "percent"),
+    ("5 km to mi", "3.10685596119 mi", "unit"),
+    ("70 f in c", "21.1111111111 c", "unit"),
+    ("2.5 gib to mb", "2684.35456 mb", "unit"),
+    ("90 km/h to mph", "55.9234073014 mph", "unit"),
+    ("255 to hex", "0xff", "base"),
+    ("0xff to dec", "255", "base"),
+    ("42 in binary", "0b101010", "base"),
+    ("100 usd to eur", "96 EUR", "currency"),
+    ("€20 in pln", "85.42 PLN", "currency"),
+])
+def test_evaluate(query, result, kind):
+    answer = calc_engine.evaluate(query)
+    assert answer is not None
+    assert (answer["result"], answer["kind"]) == (result, kind)
+
+@pytest.mark.parametrize("query", [
+    "", "hello world", "42", "route 66", "__import__(1)", "(1).real",
+    # Errors and results that cannot be shown are None, never an exception
+    "1/0", "sqrt(-1)", "171!", "2**100000", "9**9**9", "1e308*10", "1e308*10 km to mi",
+    "(10**3000)*(10**3000)", "(10**3000)*(10**3000) to dec", "2**1025 to hex", "1.5 to hex",
+    "1 + " * 60 + "1",
+])
+def test_evaluate_rejects(query):
+    assert calc_engine.evaluate(query) is None
+
+FORMATS = [
+    (0, "0"),
+    (10 ** 20, "100000000000000000000"),
+    (10 ** 21, "1e+21"),
+    (-(10 ** 21), "-1e+21"),
+    (123456789 * 10 ** 5000, "1.23456789e+5008"), # Past the interpreter's int-to-str digit limit
+    (0.1 + 0.2, "0.3"),
+    (2.0, "2"),
+]
+
+@pytest.mark.parametrize("value, text", FORMATS, ids=[text for _, text in FORMATS])
+def test_format_number(value, text):
+    assert calc_engine.format_number(value) == text
+
+@pytest.mark.parametrize("value", [float("inf"), float("-inf"), float("nan")])
+def test_format_number_rejects_non_finite(value):
+    with pytest.raises(ValueError):
+        calc_engine.format_number(value)
@@ -0,0 +1,71 @@
+import pytest
+
+import context_builder
+
+def count_words(text):
+    return len(text.split())
+
+def render(passage, text):
+    return f"Source: {passage['title']}\n{text}"
+
+# Toy embedding: one dimension per keyword
+KEYWORDS = ("kernel", "module", "pasta", "linux")
+
+def encode(texts):
+    return [[text.lower().count(k) for k in KEYWORDS] for text in texts]
+
+def passage(title, text, **extra):
+    return dict({"title": title, "text": text}, **extra)
+
+def test_rank_without_encoder_keeps_search_order():
+    ranked = context_builder.rank("q", [passage("a", "x"), passage("b", "y")])
+    assert [(p["title"], p["score"]) for p in ranked] == [("a", 1.0), ("b", 0.5)]
+
+def test_rank_by_similarity_and_precomputed_vectors():
+    passages = [passage("cooking", "boil the pasta"), passage("kmod", "a kernel module for linux"),
+                passage("cached", "no words here", vector=[1, 1, 0, 0])]
+    ranked = context_builder.rank("linux kernel module", passages, encode)
+    assert [(p["title"], p["score"]) for p in ranked] == [("kmod", 1.0), ("cached", 0.816), ("cooking", 0.0)]
+    assert all("vector" not in p for p in ranked)
+
+def test_rank_with_query_vector_encodes_only_passages():
+    seen = []
+    def recording(texts):
+        seen.extend(texts)
+        return encode(texts)
+    context_builder.rank("ignored", [passage("kmod", "kernel module")], recording, query_vector=[1, 0, 0, 0])
+    assert seen == ["kmod\nkernel module"]
+
+@pytest.mark.parametrize("texts, kept", [
+    (["the quick brown fox jumps", "the quick brown fox jumps"], 1),
+    (["the quick brown fox jumps over", "The quick brown fox jumps over!"], 1),
+    (["the quick brown fox", "a lazy dog sleeps all day"], 2),
+    (["", "..."], 0),
+])
+def test_dedupe(texts, kept):
+    assert len(context_builder.dedupe([passage(str(i), t) for i, t in enumerate(texts)])) == kept
+
+@pytest.mark.parametrize("budget, expected", [
+    (100, "One two three. Four five six. Seven eight."),
+    (6, "One two three. Four five six."),
+    (4, "One two three."),
+    (2, ""),
+])
+def test_trim_cuts_at_sentence_boundaries(budget, expected):
+    assert context_builder.trim("One two three. Four five six. Seven eight.", budget, count_words) == expected
+
+def test_pack_stops_when_the_budget_is_spent():
+    long_text = " ".join(["word"] * 30) + "."
+    passages = [passage("a", long_text), passage("b", long_text), passage("c", long_text)]
+    blocks, used = context_builder.pack(passages, 70, count_words, render)
+    assert [b.split("\n")[0] for b in blocks] == ["Source: a", "Source: b"]
+    assert used == 64
+    assert used <= 70
+
+def test_build_filters_dedupes_and_reports():
+    passages = [passage("kmod", "a kernel module for linux."), passage("mirror", "A kernel module for Linux."),
+                passage("cooking", "boil the pasta.")]
+    blocks, stats = context_builder.build("kernel module", passages, 100, count_words, render,
+                                          encode=encode, min_score=0.5)
+    assert blocks == ["Source: kmod\na kernel module for linux."]
+    assert stats == {"candidates": 3, "unique": 1, "kept": 1, "tokens": 7}
@@ -0,0 +1,121 @@
+import gzip
+import json
+
+import pytest
+
+import entity_store
+
+@pytest.fixture
+def store(tmp_path):
+    s = entity_store.EntityStore(str(tmp_path / "entities.db"))
+    yield s
+    s.stop()
+
+def person(name, **extra):
+    return dict({"type": "person", "name": name, "description": f"About {name}",
+                 "url": f"https://en.wikipedia.org/wiki/{name.replace(' ', '_')}", "image": "thumb.jpg"}, **extra)
+
+@pytest.mark.parametrize("text, expected", [
+    ("Barack Obama", "barack obama"),
+    ("  Ada   Lovelace ", "ada lovelace"),
+    ("Ada Lovelace - Wikipedia", "ada lovelace"),
+    ("Mercury (disambiguation)", "mercury"),
+    ("Mercury (Disambiguation) - Wikipedia", "mercury"),
+    ("Mercury (planet)", "mercury planet"),
+    ("Mercury (element)", "mercury element"),
+    ("Saint-Étienne", "saint étienne"),
+    ("O'Brien, Conan", "o brien conan"),
+    ("", ""),
+])
+def test_key(text, expected):
+    assert entity_store.key(text) == expected
+
+@pytest.mark.parametrize("url, title", [
+    ("https://en.wikipedia.org/wiki/Ada_Lovelace", "Ada Lovelace"),
+    ("https://en.m.wikipedia.org/wiki/S%C3%A3o_Paulo#History", "São Paulo"),
+    ("https://example.com/wiki/Ada_Lovelace", None),
+    (None, None),
+])
+def test_wikipedia_page(url, title):
+    assert entity_store.wikipedia_page(url) == title
+
+def test_page_title_strips_site_suffix():
+    assert entity_store.page_title("Ada Lovelace - Biography.com", None) == "Ada Lovelace"
+    assert entity_store.page_title("Anything", "https://en.wikipedia.org/wiki/Ada_Lovelace") == "Ada Lovelace"
+
+def test_lookup_by_alias_and_title(store):
+    assert store.lookup("person", "obama") is None
+    store.remember("person", "obama", person("Barack Obama"))
+    for query in ("obama", "Barack Obama", "barack  obama"):
+        assert store.lookup("person", query)["name"] == "Barack Obama"
+    assert store.lookup("place", "obama") is None
+    assert store.stats()["hit"] == 3
+
+def test_speculative_fetch_adds_no_alias(store):
+    store.remember("person", "ada lov", person("Ada Lovelace"), alias=False)
+    assert store.lookup("person", "ada lov") is None
+    assert store.lookup("person", "ada lovelace")["name"] == "Ada Lovelace"
+
+def test_parenthetical_titles_stay_apart(store):
+    store.remember("place", "mercury planet", {"name": "Mercury (planet)", "description": "Planet"})
+    store.remember("place", "mercury element", {"name": "Mercury (element)", "description": "Element"})
+    assert store.lookup("place", "Mercury (planet)")["description"] == "Planet"
+    assert store.lookup("place", "Mercury (element)")["description"] == "Element"
+
+@pytest.mark.parametrize("titles, query, found", [
+    (["Barack Obama"], "obama", "Barack Obama"),
+    (["John Lennon", "John Locke"], "john", None), # Ambiguous, and neither is a favourite
+    (["Marie Curie"], "curie marie", "Marie Curie"),
+    (["Johann Sebastian Bach"], "bach", None), # Two words more than the query
+    (["Ada Lovelace"], "ad", None),
+])
+def test_fuzzy_lookup(store, titles, query, found):
+    for title in titles:
+        store.remember("person", title, person(title))
+    result = store.lookup("person", query)
+    assert (result["name"] if result else None) == found
+
+def test_fuzzy_hit_becomes_an_alias(store):
+    store.remember("person", "Barack Obama", person("Barack Obama"))
+    assert store.lookup("person", "obama")["name"] == "Barack Obama"
+    with store.lock:
+        row = store._db().execute("SELECT entity FROM aliases WHERE alias = 'obama'").fetchone()
+    assert row is not None
+
+def test_import_dump_keeps_looked_up_fields(store, tmp_path):
+    store.remember("place", "lisbon", {"name": "Lisbon", "description": "Fetched", "image": "live.jpg",
+                                       "latitude": 38.7, "longitude": -9.1})
+    dump = tmp_path / "summaries.jsonl.gz"
+    with gzip.open(dump, "wt") as f:
+        for data in ({"title": "Lisbon", "extract": "From the dump", "kind": "place"},
+                     {"title": "Porto", "extract": "City in Portugal", "coordinates": {"lat": 41.1, "lon": -8.6}},
+                     {"title": "Fernando Pessoa", "extract": "Poet", "thumbnail": {"source": "pessoa.jpg"}}):
+            f.write(json.dumps(data) + "\n")
+        f.write("not json\n")
+    assert store.import_dump(str(dump)) == 3
+    assert store.lookup("place", "lisbon")["description"] == "Fetched"
+    assert store.lookup("place", "porto")["latitude"] == 41.1
+    # Untyped entries serve either kind, but one with coordinates is never a person
+    assert store.lookup("person", "porto") is None
+    assert store.lookup("person", "fernando pessoa")["image"] == "pessoa.jpg"
+
+def test_refresh_fills_missing_images(tmp_path):
+    fetched = []
+    def fetch(title):
+        fetched.append(title)
+        return {"title": title, "extract": "Refreshed", "thumbnail": {"source": "new.jpg"}}
+    store = entity_store.EntityStore(str(tmp_path / "entities.db"), fetch=fetch)
+    store.remember("person", "ada", person("Ada Lovelace", image=None))
+    assert [e["title"] for e in store.due()] == ["Ada Lovelace"]
+    assert store.refresh_once() == 1
+    assert fetched == ["Ada Lovelace"]
+    assert store.lookup("person", "ada")["image"] == "new.jpg"
+    assert store.due() == []
+
+def test_fresh_lookup_is_not_due_until_stale(tmp_path):
+    max_age = [30]
+    store = entity_store.EntityStore(str(tmp_path / "entities.db"), max_age_days=lambda: max_age[0])
+    store.remember("person", "ada", person("Ada Lovelace"))
+    assert store.due() == []
+    max_age[0] = -1 # Everything fetched before tomorrow is stale
+    assert [e["title"] for e in store.due()] == ["Ada Lovelace"]
@@ -0,0 +1,60 @@
+import time
+
+import pytest
+
+import local_rag
+
+class Encoder:
+    def __init__(self):
+        self.encoded = 0
+
+    def __call__(self, texts):
+        self.encoded += len(texts)
+        return [[float(len(text))] for text in texts]
+
+def write(tmp_path, name, words):
+    path = tmp_path / name
+    path.write_text(" ".join(f"{name}{i}" for i in range(words)))
+    return (name, str(path))
+
+def wait_warm(cache):
+    deadline = time.monotonic() + 5
+    while cache.stats()["warming"] and time.monotonic() < deadline: time.sleep(0.01)
+
+@pytest.mark.parametrize("words, chunks", [(0, 0), (50, 1), (120, 1), (121, 2), (100000, local_rag.MAX_CHUNKS_PER_FILE)])
+def test_chunk_count(words, chunks):
+    assert len(local_rag.chunk(" ".join(["w"] * words))) == chunks
+
+def test_chunks_overlap():
+    first, second = local_rag.chunk(" ".join(str(i) for i in range(200)))
+    assert first.split()[-20:] == second.split()[:20]
+
+def test_cache_reuses_until_file_changes(tmp_path):
+    encode, cache = Encoder(), local_rag.ChunkCache()
+    _, path = write(tmp_path, "notes", 300)
+    entries = cache.get(path, encode)
+    assert cache.get(path, encode) is entries and encode.encoded == len(entries)
+    with open(path, "a") as f: f.write(" more words")
+    cache.get(path, encode)
+    assert cache.stats()["misses"] == 2
+
+def test_cold_question_embeds_within_budget(tmp_path):
+    encode, cache = Encoder(), local_rag.ChunkCache()
+    files = [write(tmp_path, f"doc{i}", 2000) for i in range(5)] # 20 chunks each
+    out = local_rag.passages(files, cache, encode, max_cold_chunks=50)
+    # Two files fit the budget; the other three are embedded in the background
+    assert {p["title"] for p in out} == {"doc0", "doc1"}
+    wait_warm(cache)
+    assert encode.encoded == 100
+    warm = local_rag.passages(files, cache, encode, max_cold_chunks=50)
+    assert len({p["title"] for p in warm}) == 5 and encode.encoded == 100
+
+def test_file_larger_than_budget_is_warmed(tmp_path):
+    encode, cache = Encoder(), local_rag.ChunkCache()
+    files = [write(tmp_path, "big", 20000)]
+    assert local_rag.passages(files, cache, encode, max_cold_chunks=8) == []
+    wait_warm(cache)
+    assert len(local_rag.passages(files, cache, encode, max_cold_chunks=8)) == local_rag.MAX_CHUNKS_PER_FILE
+
+def test_missing_file_has_no_passages(tmp_path):
+    assert local_rag.passages([("gone", str(tmp_path / "gone"))], local_rag.ChunkCache(), Encoder()) == []
@@ -0,0 +1,145 @@
+import threading
+import time
+
+import pytest
+
+import model_registry
+import settings
+
+MB = 1024 * 1024
+
+@pytest.fixture
+def configure(monkeypatch):
+    """Replaces settings with the defaults plus the given overrides."""
+    def apply(**overrides):
+        values = dict(settings.DEFAULTS, **{k.replace("__", "."): v for k, v in overrides.items()})
+        monkeypatch.setattr(settings, "get", lambda key: values[key])
+    return apply
+
+THREE_TIERS = {"large": {"path": "/m/large.gguf", "memory_mb": 4000},
+               "small": {"path": "/m/small.gguf", "memory_mb": 1000},
+               "medium": {"path": "/m/medium.gguf", "memory_mb": 2000}}
+
+class FakeModel:
+    def __init__(self, spec):
+        self.spec = spec
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+def test_specs_sorted_by_size_with_defaults(configure):
+    configure(models__registry=THREE_TIERS)
+    specs = model_registry.specs()
+    assert list(specs) == ["small", "medium", "large"]
+    assert specs["small"]["bytes"] == 1000 * MB
+    assert specs["small"]["n_ctx"] == settings.DEFAULTS["model.n_ctx"]
+
+def test_single_default_model_without_registry(configure):
+    configure(model__path="/m/only.gguf")
+    assert list(model_registry.specs()) == ["default"]
+
+@pytest.mark.parametrize("route, query, model", [
+    ("action", "explain how a kernel scheduler works in detail", "small"),
+    ("speculate", "who is ada lov", "small"),
+    ("ask", "capital of portugal", "medium"),
+    ("ask", "why is the sky blue", "large"),
+    ("ask", "Explain ext4 journaling", "large"),
+    ("ask", "what is the boiling point of ethanol at sea level in degrees celsius please", "large"),
+])
+def test_route_by_intent(configure, route, query, model):
+    configure(models__registry=THREE_TIERS)
+    router = model_registry.Router(model_registry.ModelRegistry(FakeModel))
+    assert router.route(route, query)[0] == model
+
+@pytest.mark.parametrize("registry, ask_model", [
+    ({}, "default"),
+    ({"a": {"path": "/m/a", "memory_mb": 1}, "b": {"path": "/m/b", "memory_mb": 2}}, "b"),
+])
+def test_medium_tier_with_fewer_models(configure, registry, ask_model):
+    configure(models__registry=registry)
+    router = model_registry.Router(model_registry.ModelRegistry(FakeModel))
+    assert router.route("ask", "capital of portugal")[0] == ask_model
+
+def test_requested_tokens_pick_the_large_tier(configure):
+    configure(models__registry=THREE_TIERS)
+    router = model_registry.Router(model_registry.ModelRegistry(FakeModel))
+    assert router.route("ask", "capital of portugal", requested_tokens=1024) == ("large", "large")
+
+def test_record_and_stats(configure):
+    configure(models__registry=THREE_TIERS)
+    router = model_registry.Router(model_registry.ModelRegistry(FakeModel))
+    for outcome in ("ok", "ok", "ok", "truncated"):
+        router.record("ask", "medium", 100, outcome)
+    stats = router.stats()["ask"]["medium"]
+    assert stats["n"] == 4
+    assert stats["outcomes"] == {"ok": 3, "truncated": 1}
+    assert stats["ok_rate"] == 0.75
+
+def test_eviction_is_least_recently_used_first(configure):
+    configure(models__registry=THREE_TIERS, models__memory_mb=6500)
+    registry = model_registry.ModelRegistry(FakeModel)
+    with registry.checkout("small") as small: pass
+    with registry.checkout("medium") as medium: pass
+    with registry.checkout("small"): pass
+    # 3000 MB loaded, large needs 4000 of the 6500: medium was used longest ago
+    with registry.checkout("large"): pass
+    assert list(registry.loaded) == ["small", "large"]
+    assert medium.model.closed and not small.model.closed
+    assert registry.stats()["evictions"] == 1
+
+def test_models_in_use_are_not_evicted(configure):
+    configure(models__registry=THREE_TIERS, models__memory_mb=3000)
+    registry = model_registry.ModelRegistry(FakeModel)
+    with registry.checkout("small") as small, registry.checkout("medium"):
+        # Over budget, but both loaded models are checked out
+        with registry.checkout("large"): pass
+        assert list(registry.loaded) == ["small", "medium", "large"]
+        assert not small.model.closed
+
+def test_models_dropped_from_the_registry_go_first(configure):
+    configure(models__registry=THREE_TIERS, models__memory_mb=100000)
+    registry = model_registry.ModelRegistry(FakeModel)
+    with registry.checkout("large"): pass
+    configure(models__registry={k: v for k, v in THREE_TIERS.items() if k != "large"}, models__memory_mb=100000)
+    with registry.checkout("small"): pass
+    assert list(registry.loaded) == ["small"]
+
+def test_failed_load_is_reported(configure):
+    configure(models__registry=THREE_TIERS)
+    def broken(spec): raise RuntimeError("no such file")
+    registry = model_registry.ModelRegistry(broken)
+    with registry.checkout("small") as entry:
+        assert entry is None
+    assert registry.errors["small"] == "no such file"
+    with registry.checkout("missing") as entry:
+        assert entry is None
+
+def test_borrow_never_loads(configure):
+    configure(models__registry=THREE_TIERS)
+    registry = model_registry.ModelRegistry(FakeModel)
+    with registry.borrow("small") as entry:
+        assert entry is None
+    with registry.checkout("small"): pass
+    with registry.borrow("small") as entry:
+        assert entry.name == "small"
+
+def test_eviction_stops_batch_engines_outside_the_lock(configure):
+    configure(models__registry=THREE_TIERS, models__memory_mb=4500)
+    registry = model_registry.ModelRegistry(FakeModel)
+    stopping = threading.Event()
+    class SlowEngine:
+        def stop(self):
+            stopping.set()
+            time.sleep(0.5)
+        def stats(self):
+            return {}
+    with registry.checkout("small") as entry:
+        entry.batch = SlowEngine()
+    loader = threading.Thread(target=lambda: registry.checkout("large").__enter__())
+    loader.start()
+    assert stopping.wait(2)
+    start = time.perf_counter()
+    registry.stats()
+    assert time.perf_counter() - start < 0.25
+    loader.join()
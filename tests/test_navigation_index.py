@@ -0,0 +1,91 @@
+import json
+
+import pytest
+
+import navigation_index
+
+# (url, title, visits, typed, bookmarked), as the browser readers yield them
+ROWS = [
+    ("https://github.com/", "GitHub", 120, 30, True),
+    ("https://github.com/torvalds/linux", "torvalds/linux: Linux kernel source tree", 8, 0, False),
+    ("https://docs.python.org/3/", "3.12 Documentation", 40, 5, False),
+    ("https://docs.python.org/3/library/bisect.html", "bisect — Array bisection algorithm", 12, 0, False),
+    ("https://www.google.com/", "Google", 300, 100, False),
+    ("https://go.dev/", "The Go Programming Language", 6, 1, False),
+    ("https://news.ycombinator.com/", "Hacker News", 90, 40, True),
+    ("https://github.com/search?q=x", "Search", 50, 0, False), # Query URLs are not pages
+    ("ftp://files.example.com/", "FTP", 10, 0, False),
+    ("not a url", None, 1, 0, False),
+]
+
+@pytest.fixture
+def index(tmp_path):
+    idx = navigation_index.NavigationIndex(firefox_globs=[], chromium_globs=[],
+                                           learned_path=str(tmp_path / "navigations.json"))
+    idx._build(ROWS, "test")
+    return idx
+
+@pytest.mark.parametrize("host, labels", [
+    ("docs.python.org", ["docs", "python"]),
+    ("www.github.com", ["github"]),
+    ("m.wikipedia.org", ["wikipedia"]),
+    ("localhost", ["localhost"]),
+])
+def test_host_labels(host, labels):
+    assert navigation_index.host_labels(host) == labels
+
+def test_build_skips_non_web_urls(index):
+    hosts = {e["host"] for e in index.entries}
+    assert hosts == {"github.com", "docs.python.org", "www.google.com", "go.dev", "news.ycombinator.com"}
+    assert not any("search?q" in e["url"] for e in index.entries)
+
+@pytest.mark.parametrize("query, url", [
+    ("github", "https://github.com/"),
+    ("git", "https://github.com/"),
+    ("GitHub", "https://github.com/"),
+    ("python docs", "https://docs.python.org/"), # The site, not its most visited page
+    ("pyth", "https://docs.python.org/"),
+    ("python bisect", "https://docs.python.org/3/library/bisect.html"),
+    ("torvalds linux", "https://github.com/torvalds/linux"),
+    ("hacker news", "https://news.ycombinator.com/"),
+    ("ycomb", "https://news.ycombinator.com/"),
+    ("go", "https://go.dev/"), # Short words only count whole: not google
+    ("goog", "https://www.google.com/"),
+    ("githib", "https://github.com/"), # Fuzzy, single word
+])
+def test_lookup(index, query, url):
+    result = index.lookup(query)
+    assert result is not None
+    assert result["url"] == url
+
+@pytest.mark.parametrize("query", ["", "g", "wikipedia", "python cooking recipes", "gx", "pyhton docs"])
+def test_lookup_misses(index, query):
+    assert index.lookup(query) is None
+
+def test_bookmarks_are_described(index):
+    assert index.lookup("github")["description"] == "From your bookmarks"
+    assert index.lookup("python docs")["description"] == "From your history"
+
+def test_learned_navigation_wins_and_persists(index, tmp_path):
+    index.record("python docs", "https://docs.python.org/3/tutorial/", "The Python Tutorial")
+    assert index.lookup("Python  docs")["url"] == "https://docs.python.org/3/tutorial/"
+    # Matched by what the user typed too, when the model rewrote the query
+    assert index.lookup("python documentation", typed="python docs")["description"] == "Opened before"
+    with open(tmp_path / "navigations.json") as f:
+        assert json.load(f)["python docs"]["count"] == 1
+    reloaded = navigation_index.NavigationIndex(firefox_globs=[], chromium_globs=[],
+                                                learned_path=str(tmp_path / "navigations.json"))
+    assert reloaded.lookup("python docs")["title"] == "The Python Tutorial"
+
+@pytest.mark.parametrize("url", ["javascript:alert(1)", "file:///etc/passwd", ""])
+def test_record_ignores_non_web_urls(index, url):
+    index.record("anything", url)
+    assert index.stats()["learned"] == 0
+
+def test_stats(index):
+    index.lookup("github")
+    index.lookup("githib")
+    index.lookup("nothing here")
+    stats = index.stats()
+    assert (stats["hit"], stats["fuzzy"], stats["miss"]) == (1, 1, 1)
+    assert stats["entries"] == len(index.entries)
@@ -0,0 +1,131 @@
+import gzip
+import os
+
+import pytest
+
+import package_catalog
+
+APT_LIST = """\
+Package: firefox
+Version: 128.0
+Description: Safe and easy web browser from Mozilla
+
+Package: vlc
+Description: multimedia player and streamer
+
+Package: libvlc-dev
+Description: development files for libvlc
+
+Package: gimp
+Description: GNU Image Manipulation Program
+
+Package: vlc
+Description: multimedia player and streamer (duplicate from another pocket)
+
+Package: ripgrep
+Description: Recursively searches directories for a regex pattern
+"""
+
+APPSTREAM = """\
+<?xml version="1.0" encoding="UTF-8"?>
+<components version="0.8">
+  <component type="desktop">
+    <id>org.videolan.VLC.desktop</id>
+    <name>VLC</name>
+    <name xml:lang="de">VLC Medienspieler</name>
+    <summary>VLC media player, the open-source multimedia framework</summary>
+    <bundle type="flatpak">app/org.videolan.VLC/x86_64/stable</bundle>
+  </component>
+  <component type="desktop">
+    <id>com.spotify.Client</id>
+    <name>Spotify</name>
+    <summary>Online music streaming service</summary>
+  </component>
+</components>
+"""
+
+@pytest.fixture
+def sources(tmp_path):
+    apt = tmp_path / "lists" / "deb.example.org_dists_stable_main_binary-amd64_Packages"
+    apt.parent.mkdir()
+    apt.write_text(APT_LIST)
+    appstream = tmp_path / "appstream" / "flathub" / "x86_64" / "active" / "appstream.xml.gz"
+    appstream.parent.mkdir(parents=True)
+    with gzip.open(appstream, "wt") as f:
+        f.write(APPSTREAM)
+    return str(apt), str(appstream)
+
+@pytest.fixture
+def catalog(sources, tmp_path):
+    apt, appstream = sources
+    c = package_catalog.PackageCatalog([apt], [appstream], cache_path=str(tmp_path / "cache" / "catalog.json"))
+    c.refresh()
+    return c
+
+def test_parse_apt_list(sources):
+    entries = package_catalog.parse_apt_list(sources[0])
+    assert [e["id"] for e in entries] == ["firefox", "vlc", "libvlc-dev", "gimp", "vlc", "ripgrep"]
+    assert entries[0] == {"source": "apt", "id": "firefox", "name": "firefox",
+                          "summary": "Safe and easy web browser from Mozilla"}
+
+def test_parse_appstream(sources):
+    entries = package_catalog.parse_appstream(sources[1])
+    assert entries == [
+        {"source": "flatpak", "id": "org.videolan.VLC", "name": "VLC", "remote": "flathub",
+         "summary": "VLC media player, the open-source multimedia framework"},
+        {"source": "flatpak", "id": "com.spotify.Client", "name": "Spotify", "remote": "flathub",
+         "summary": "Online music streaming service"},
+    ]
+
+def test_refresh_dedupes_and_caches(catalog, sources, tmp_path):
+    assert len(catalog.entries) == 7
+    assert catalog.refresh() is False # Nothing changed
+    cached = package_catalog.PackageCatalog([sources[0]], [sources[1]], cache_path=catalog.cache_path)
+    cached.refresh()
+    assert [(e["source"], e["id"]) for e in cached.entries] == [(e["source"], e["id"]) for e in catalog.entries]
+    os.utime(sources[0], (0, 0))
+    assert catalog.refresh() is True
+
+@pytest.mark.parametrize("query, first", [
+    ("firefox", "firefox"),
+    ("Firefox", "firefox"),
+    ("firfox", "firefox"), # Typo
+    ("fire", "firefox"),
+    ("spotify", "com.spotify.Client"),
+    ("vlc", "vlc"), # Exact on both sources: the shorter id breaks the tie
+    ("vlc media", "org.videolan.VLC"),
+    ("image manipulation", "gimp"), # Summary match
+    ("qz", None),
+    ("xyzzy", None),
+])
+def test_search(catalog, query, first):
+    results = catalog.search(query)
+    assert (results[0]["id"] if results else None) == first
+
+def test_short_queries_match_names_only(catalog):
+    # "rg" is in "org.videolan.VLC" but is no typo of ripgrep, and summaries are not searched
+    assert [r["id"] for r in catalog.search("rg")] == ["org.videolan.VLC"]
+
+def test_search_ranks_noise_packages_last(catalog):
+    ids = [r["id"] for r in catalog.search("vlc")]
+    assert ids.index("libvlc-dev") > ids.index("vlc")
+    assert all("key" not in r and "score" in r for r in catalog.search("vlc"))
+
+@pytest.mark.parametrize("entries, command", [
+    ([{"source": "apt", "id": "gimp"}], "pkexec sh -c 'apt-get install -y gimp'"),
+    ([{"source": "flatpak", "id": "com.spotify.Client", "remote": "flathub"}],
+     "flatpak install -y flathub com.spotify.Client"),
+    ([{"source": "apt", "id": "gimp"}, {"source": "apt", "id": "vlc"},
+      {"source": "flatpak", "id": "com.spotify.Client", "remote": "flathub"}],
+     "pkexec sh -c 'apt-get install -y gimp vlc && flatpak install -y flathub com.spotify.Client'"),
+])
+def test_batch_install_command(entries, command):
+    assert package_catalog.batch_install_command(entries) == command
+
+@pytest.mark.parametrize("entry, command", [
+    ({"source": "apt", "id": "gimp"}, "pkexec apt-get install -y gimp"),
+    ({"source": "flatpak", "id": "org.videolan.VLC", "remote": "flathub"}, "flatpak install -y flathub org.videolan.VLC"),
+    ({"source": "flatpak", "id": "org.videolan.VLC"}, "flatpak install -y org.videolan.VLC"),
+])
+def test_install_command(entry, command):
+    assert package_catalog.install_command(entry) == command
@@ -0,0 +1,111 @@
+import json
+import os
+
+import pytest
+
+import settings
+
+@pytest.fixture
+def fresh(monkeypatch):
+    """Settings re-read from scratch, with no file and the reload interval disabled."""
+    def reset():
+        monkeypatch.setattr(settings, "_values", None)
+        monkeypatch.setattr(settings, "_checked", 0.0)
+    monkeypatch.setattr(settings, "RELOAD_INTERVAL", 0)
+    reset()
+    yield reset
+    if os.path.exists(settings.SETTINGS_PATH): os.remove(settings.SETTINGS_PATH)
+
+def write(values, mtime):
+    with open(settings.SETTINGS_PATH, "w") as f:
+        json.dump(values, f)
+    os.utime(settings.SETTINGS_PATH, (mtime, mtime))
+
+@pytest.mark.parametrize("value, default, expected", [
+    ("8", 1, 8),
+    (" 8 ", 1, 8),
+    ("8.0", 1, 8),
+    (8.0, 1, 8),
+    ("1e3", 1, 1000),
+    ("-1", 1, -1),
+    ("0.5", 0.1, 0.5),
+    (3, 0.1, 3.0),
+    ("yes", False, True),
+    ("On", False, True),
+    (1, False, True),
+    ("off", True, False),
+    ("0", True, False),
+    ("", True, False),
+    ("http://x", "", "http://x"),
+    ("[1, 2, 3]", [], [1, 2, 3]),
+    ({"a": {"path": "x"}}, {}, {"a": {"path": "x"}}),
+])
+def test_coerce(value, default, expected):
+    result = settings._coerce(value, default)
+    assert result == expected
+    assert type(result) is type(expected)
+
+@pytest.mark.parametrize("value, default", [
+    ("8.5", 1), # Refused, not truncated to 8
+    (8.5, 1),
+    (True, 1),
+    ("many", 1),
+    ("nan", 0.1),
+    ("inf", 0.1),
+    ("maybe", True),
+    (2, True),
+    ("{}", []),
+    ("not json", {}),
+])
+def test_coerce_rejects(value, default):
+    with pytest.raises((TypeError, ValueError)):
+        settings._coerce(value, default)
+
+def test_layers_and_sources(fresh, monkeypatch):
+    write({"ask.max_tokens": 256, "action.temperature": 0.3, "launcher.delay.action": [150, 700, 300]}, 1000)
+    monkeypatch.setenv("OMNI_ASK_MAX_TOKENS", "512")
+    snap = settings.snapshot()
+    assert snap["values"]["ask.max_tokens"] == 512
+    assert snap["values"]["action.temperature"] == 0.3
+    assert snap["values"]["launcher.delay.action"] == [150, 700, 300]
+    assert snap["values"]["action.max_tokens"] == settings.DEFAULTS["action.max_tokens"]
+    assert {k: snap["sources"][k] for k in ("ask.max_tokens", "action.temperature", "action.max_tokens")} == \
+        {"ask.max_tokens": "env", "action.temperature": "file", "action.max_tokens": "default"}
+
+def test_bad_values_fall_back(fresh, monkeypatch):
+    write({"ask.max_tokens": 8.5, "no.such.key": 1, "ask.local_context": "sometimes"}, 1000)
+    monkeypatch.setenv("OMNI_BATCHING_SLOTS", "lots")
+    for key in ("ask.max_tokens", "ask.local_context", "batching.slots"):
+        assert settings.get(key) == settings.DEFAULTS[key]
+
+@pytest.mark.parametrize("content", ["{not json", "[1, 2]"])
+def test_unreadable_file_is_ignored(fresh, content):
+    with open(settings.SETTINGS_PATH, "w") as f:
+        f.write(content)
+    assert settings.get("ask.max_tokens") == settings.DEFAULTS["ask.max_tokens"]
+
+def test_reload_on_change(fresh):
+    write({"ask.temperature": 0.2}, 1000)
+    assert settings.get("ask.temperature") == 0.2
+    write({"ask.temperature": 0.9}, 2000)
+    assert settings.get("ask.temperature") == 0.9
+    os.remove(settings.SETTINGS_PATH)
+    assert settings.get("ask.temperature") == settings.DEFAULTS["ask.temperature"]
+
+def test_reload_waits_for_the_interval(fresh, monkeypatch):
+    write({"ask.temperature": 0.2}, 1000)
+    assert settings.get("ask.temperature") == 0.2
+    monkeypatch.setattr(settings, "RELOAD_INTERVAL", 3600)
+    write({"ask.temperature": 0.9}, 2000)
+    assert settings.get("ask.temperature") == 0.2
+
+def test_restart_keys_are_logged(fresh, caplog):
+    write({"model.n_ctx": 2048}, 1000)
+    settings.get("model.n_ctx")
+    write({"model.n_ctx": 8192}, 2000)
+    assert settings.get("model.n_ctx") == 8192
+    assert "model.n_ctx changed to 8192; it applies after a restart" in caplog.text
+
+def test_env_names():
+    assert settings.env_name("ask.max_tokens") == "OMNI_ASK_MAX_TOKENS"
+    assert settings.env_name("session.memory_mb") == "OMNI_SESSION_MEMORY_MB"